@@ -0,0 +1,10 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+
+:File Name: __init__.py
+:Author: xufeng
+:Date: 2021-08-12 2:10 PM
+:Version: v.1.0
+:Description:
+"""
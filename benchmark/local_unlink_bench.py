@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: local_unlink_bench
+:Author: xufeng
+:Date: 2021-08-17 4:30 PM
+:Version: v.1.0
+:Description: compare path based remove with directory fd relative unlink
+    run in project root: python -m benchmark.local_unlink_bench
+"""
+import os
+import shutil
+import tempfile
+import time
+
+FILE_COUNT = 20000
+DIR_DEPTH = 16
+
+
+def build_dir(root):
+    dir_path = os.path.join(root, *[f'level_{i}' for i in range(DIR_DEPTH)])
+    os.makedirs(dir_path)
+    for i in range(FILE_COUNT):
+        with open(os.path.join(dir_path, f'app_{i}.log'), 'w'):
+            pass
+    return dir_path
+
+
+def path_remove(dir_path):
+    begin = time.perf_counter()
+    with os.scandir(dir_path) as it:
+        for entry in it:
+            os.remove(os.path.join(dir_path, entry.name))
+    return time.perf_counter() - begin
+
+
+def dir_fd_unlink(dir_path):
+    begin = time.perf_counter()
+    dir_fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        with os.scandir(dir_fd) as it:
+            for entry in it:
+                os.unlink(entry.name, dir_fd=dir_fd)
+    finally:
+        os.close(dir_fd)
+    return time.perf_counter() - begin
+
+
+def main():
+    print(f"remove {FILE_COUNT} files in directory of depth {DIR_DEPTH}")
+    for name, func in (('path remove', path_remove), ('dir fd unlink', dir_fd_unlink)):
+        root = tempfile.mkdtemp()
+        try:
+            cost = func(build_dir(root))
+            print(f"{name:<20}{cost:.4f}s")
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: local_walk_bench
+:Author: xufeng
+:Date: 2021-08-12 2:10 PM
+:Version: v.1.0
+:Description: compare os.walk with recursive handle dir and single pass scandir walker on deep directory tree
+    run in project root: python -m benchmark.local_walk_bench
+"""
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from common.logger_adaptor import LogAdaptor
+from component.local_data_cleaner import LocalDataCleaner
+
+FILE_PER_DIR = 5
+MAX_OS_WALK_DEPTH = 12
+
+
+class OsWalkLocalDataCleaner(LocalDataCleaner):
+    """
+    the old walk implement: os.walk and walk every sub directory again
+    """
+
+    def clean(self):
+        self._check_and_update_param()
+        for path in self._clear_local_paths:
+            self._handle_dir(path)
+
+    def _handle_dir(self, dir_path):
+        for root, dirs, files in os.walk(dir_path):
+
+            for f in files:
+                file_path = os.path.join(root, f)
+                if self._can_delete(file_path):
+                    self._exec_del(file_path, self.DEL_TYPE_FILE)
+
+            for d in dirs:
+                self._handle_dir(os.path.join(root, d))
+
+        if not os.listdir(dir_path):
+            self._exec_del(dir_path, self.DEL_TYPE_DIR)
+
+
+def build_tree(root, depth):
+    dir_path = root
+    for level in range(depth):
+        dir_path = os.path.join(dir_path, f'd{level}')
+        os.makedirs(dir_path)
+        for i in range(FILE_PER_DIR):
+            with open(os.path.join(dir_path, f'f{i}.log'), 'w') as f:
+                f.write('x')
+
+
+def bench(cleaner_cls, root):
+    logger = logging.getLogger('local_walk_bench')
+    logger.setLevel(logging.WARNING)
+    cleaner = cleaner_cls(LogAdaptor(logger), root, default_suffix=['.log'])
+    cleaner.test = True
+
+    begin = time.perf_counter()
+    cleaner.clean()
+    return time.perf_counter() - begin
+
+
+def main():
+    print(f"{'depth':>8}{'os.walk(s)':>14}{'scandir(s)':>14}")
+    for depth in (4, 8, 12, 100, 200, 400, 800):
+        root = tempfile.mkdtemp()
+        try:
+            build_tree(root, depth)
+            # os.walk cost grows exponentially with depth, skip it on deep tree
+            walk_cost = f'{bench(OsWalkLocalDataCleaner, root):.4f}' if depth <= MAX_OS_WALK_DEPTH else '-'
+            scandir_cost = bench(LocalDataCleaner, root)
+            print(f"{depth:>8}{walk_cost:>14}{scandir_cost:>14.4f}")
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: ls_parse_bench
+:Author: xufeng
+:Date: 2021-08-24 11:00 AM
+:Version: v.1.0
+:Description: parse a synthetic `hadoop fs -ls` listing by fixed columns
+    run in project root: python -m benchmark.ls_parse_bench [line count, default 1000000]
+"""
+import sys
+import time
+
+from common.ls_parser import parse_ls_lines
+
+
+def build_lines(count):
+    return [f'-rw-r--r--   3 proj hive {i * 7:>10} 2021-07-{i % 28 + 1:02d} {i % 24:02d}:{i % 60:02d} '
+            f'/user/proj/data/dt=2021{i % 12 + 1:02d}01/part-{i:08d}.parquet' for i in range(count)]
+
+
+def main(count=1000000):
+    lines = build_lines(count)
+
+    begin = time.perf_counter()
+    entries = parse_ls_lines(lines)
+    seconds = time.perf_counter() - begin
+
+    assert len(entries) == count
+    print(f"parse {count} ls lines in {seconds:.2f}s, {count / seconds:,.0f} lines per second")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
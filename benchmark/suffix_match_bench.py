@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: suffix_match_bench
+:Author: xufeng
+:Date: 2021-08-13 11:20 AM
+:Version: v.1.0
+:Description: compare the python loop suffix check with compiled file name matcher
+    run in project root: python -m benchmark.suffix_match_bench
+"""
+import random
+import timeit
+
+from common.file_matcher import FileNameMatcher
+
+NAME_COUNT = 200000
+SUFFIXES = ['.log', '.out', '.gc', '.hprof', '.err', '.trace', '.dump', '.stat', '.audit', '.access'] + \
+           [f'.log.2021{month:02d}' for month in range(1, 13)] + \
+           [f'.out.{i}' for i in range(1, 11)]
+
+
+def loop_match(file_name):
+    for suffix in SUFFIXES:
+        if suffix in file_name:
+            return True
+    return False
+
+
+def build_names():
+    random.seed(0)
+    exts = ['.txt', '.csv', '.parquet', '.jar', '.log', '.out.3', '.log.20210601', '.hprof', '.py', '.conf']
+    return [f'app_{i}_{random.randint(0, 10 ** 6)}{random.choice(exts)}' for i in range(NAME_COUNT)]
+
+
+def bench(match, names):
+    return min(timeit.repeat(lambda: [match(name) for name in names], number=1, repeat=3))
+
+
+def main():
+    names = build_names()
+    contains = FileNameMatcher(SUFFIXES)
+    assert [loop_match(name) for name in names] == [contains.match(name) for name in names]
+
+    print(f"{len(names)} file names, {len(SUFFIXES)} suffixes")
+    print(f"{'python loop':<20}{bench(loop_match, names):.4f}s")
+    print(f"{'contains':<20}{bench(contains.match, names):.4f}s")
+    print(f"{'suffix':<20}{bench(FileNameMatcher(SUFFIXES, FileNameMatcher.MATCH_SUFFIX).match, names):.4f}s")
+    globs = [f'*{suffix}*' for suffix in SUFFIXES]
+    print(f"{'glob':<20}{bench(FileNameMatcher(globs, FileNameMatcher.MATCH_GLOB).match, names):.4f}s")
+
+
+if __name__ == "__main__":
+    main()
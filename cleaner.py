@@ -12,7 +12,11 @@ import traceback
 from logging import Logger
 
 from common.logger_adaptor import LogAdaptor
-from common.utils import ExpireTimeDesc
+from common.file_matcher import FileNameMatcher
+from common.hdfs_fs import WebHdfsFileSystem
+from common.listing_cache import HdfsListingCache
+from common.rate_limiter import RateLimiter
+from common.utils import ExpireTimeDesc, DiskBudgetDesc, HdfsQuotaDesc, HdfsTieringDesc
 from component.hbase_table_cleaner import HbaseTableCleaner
 from component.hdfs_path_cleaner import HDFSPathCleaner
 from component.hive_table_cleaner import HiveTableCleaner
@@ -25,13 +29,39 @@ class ProjectCleanerBuilder:
         self._logger = LogAdaptor(logger)
 
         self._cleaners = []
+        self._rate_limiter = None
+        self._listing_cache = None
 
     def build(self):
         # check cleaner exists
         if not self._cleaners:
             raise Exception("no cleaner found!")
 
-        return ProjectDataLogCleaner(self._logger, self._cleaners)
+        if self._rate_limiter:
+            for cleaner in self._cleaners:
+                cleaner.set_rate_limiter(self._rate_limiter)
+
+        return ProjectDataLogCleaner(self._logger, self._cleaners, self._listing_cache)
+
+    def with_rate_limit(self, ops_per_second, bytes_per_second=None, truncate_chunk_bytes=None):
+        """
+        throttle delete of all cleaners with one shared token bucket, protect services share the disk or namenode
+        :param ops_per_second: max delete operations per second of all cleaners
+        :param bytes_per_second: max deleted bytes per second of all cleaners, default not limit
+        :param truncate_chunk_bytes: local file larger than it is truncated chunk by chunk before unlink,
+            so removing a multi-GB file not stall the file system, default None unlink directly
+        """
+        self._rate_limiter = RateLimiter(ops_per_second, bytes_per_second, truncate_chunk_bytes)
+        return self
+
+    def with_listing_cache(self, ttl_seconds=300, max_bytes=64 * 1024 * 1024):
+        """
+        hdfs listings are cached and shared by cleaners of one run, cached by default
+        :param ttl_seconds: seconds a listing is cached
+        :param max_bytes: max estimated memory of cached listings, least recently used listing is evicted
+        """
+        self._listing_cache = HdfsListingCache(ttl_seconds, max_bytes)
+        return self
 
     def with_local_paths(self,
                          local_paths,
@@ -39,7 +69,14 @@ class ProjectCleanerBuilder:
                          ignore_delete_type=False,
                          default_suffix=None,
                          ignore_update_time=False,
-                         expire_time: ExpireTimeDesc = None):
+                         expire_time: ExpireTimeDesc = None,
+                         max_workers=1,
+                         suffix_match_mode=FileNameMatcher.MATCH_CONTAINS,
+                         index_path=None,
+                         disk_budget: DiskBudgetDesc = None,
+                         compress_after_days=None,
+                         compress_format=LocalDataCleaner.COMPRESS_GZIP,
+                         compress_workers=None):
         """
         :param local_paths: ['/opt/app/logs', 'opt/app/tmp/'] or '/opt/app/xxx.log'
         :param delete_all_file: if delete all file is true,
@@ -50,6 +87,18 @@ class ProjectCleanerBuilder:
             ex: .log, .out , if set .log, xxx.log.202106 also can be delete
         :param ignore_update_time: if set true, file update time will not check
         :param expire_time: if ignore_update_time set true, this param will ignored
+        :param max_workers: thread count to scan and delete in parallel, default 1 run in sequence
+        :param suffix_match_mode: `contains`, `suffix` or `glob`, default `contains`
+            contains: suffix appears in file name, suffix: file name ends with suffix
+            glob: suffix is shell style pattern, ex: *.log.2021*
+        :param index_path: sqlite file keep directory mtime between runs,
+            unchanged directory whose oldest file not expire will be skipped
+        :param disk_budget: DiskBudgetDesc(max_bytes, min_free_percent), after expire files deleted,
+            delete the oldest files until total file bytes under max_bytes and free space above min_free_percent
+        :param compress_after_days: compress files updated before the days in process pool, default not compress,
+            compressed file keeps the mtime of original and is deleted by expire_time
+        :param compress_format: `gzip` or `zstd`, zstd need zstandard installed
+        :param compress_workers: process count to compress, default cpu count
         """
         local_cleaner = LocalDataCleaner(
             self._logger,
@@ -58,7 +107,14 @@ class ProjectCleanerBuilder:
             ignore_delete_type,
             default_suffix,
             ignore_update_time,
-            expire_time)
+            expire_time,
+            max_workers,
+            suffix_match_mode,
+            index_path,
+            disk_budget,
+            compress_after_days,
+            compress_format,
+            compress_workers)
         self._cleaners.append(local_cleaner)
         return self
 
@@ -68,7 +124,14 @@ class ProjectCleanerBuilder:
                        ignore_delete_type=False,
                        default_suffix=None,
                        ignore_update_time=False,
-                       expire_time: ExpireTimeDesc = None
+                       expire_time: ExpireTimeDesc = None,
+                       max_workers=1,
+                       suffix_match_mode=FileNameMatcher.MATCH_CONTAINS,
+                       index_path=None,
+                       disk_budget: DiskBudgetDesc = None,
+                       compress_after_days=None,
+                       compress_format=LocalDataCleaner.COMPRESS_GZIP,
+                       compress_workers=None
                        ):
         default_suffix = ['.log', '.out'] if not default_suffix else default_suffix
         return self.with_local_paths(
@@ -77,31 +140,70 @@ class ProjectCleanerBuilder:
             ignore_delete_type=ignore_delete_type,
             default_suffix=default_suffix,
             ignore_update_time=ignore_update_time,
-            expire_time=expire_time)
+            expire_time=expire_time,
+            max_workers=max_workers,
+            suffix_match_mode=suffix_match_mode,
+            index_path=index_path,
+            disk_budget=disk_budget,
+            compress_after_days=compress_after_days,
+            compress_format=compress_format,
+            compress_workers=compress_workers)
 
     def with_hdfs_dirs(self,
                        hdfs_paths,
                        skip_trash=False,
                        ignore_update_time=False,
-                       hdfs_day_time_pattern=r'\d{4}-\d{2}-\d{2}',
-                       expire_time: ExpireTimeDesc = None):
+                       hdfs_day_time_pattern=None,
+                       expire_time: ExpireTimeDesc = None,
+                       report_size=True,
+                       webhdfs_url=None,
+                       webhdfs_user=None,
+                       spark=None,
+                       max_workers=1,
+                       fsimage_path=None,
+                       quota: HdfsQuotaDesc = None,
+                       tiering: HdfsTieringDesc = None,
+                       tiering_index_path=None):
         """
         delete hdfs path util
         :param hdfs_paths: ['/user/proj/2021/input', 'user/proj/*/tmp' ...]
             if '*' in path, will first use `hadoop fs -ls ...` to list all paths
         :param skip_trash: skip trash flag to remove hadoop file
         :param ignore_update_time: if set true, will delete hadoop files with out check update time
-        :param hdfs_day_time_pattern: the day time pattern in hdfs ls line
-            ex: drwxr-xr-x   - proj hive          0 2021-07-21 18:29 /user/hive/warehouse/proj.db/tb1 => 2021-07-21
+        :param hdfs_day_time_pattern: deprecated, ignored with a DeprecationWarning if set,
+            ls line is split into fixed fields, update time is the day and minute in it
         :param expire_time: if ignore_update_time set true, this param will ignored, default 4 month
+        :param report_size: get bytes of expired paths with one `hadoop fs -du` per parent path
+        :param webhdfs_url: namenode http address, ex: http://namenode:9870,
+            if set, list and delete with WebHDFS over keep alive connections instead of `hadoop fs` command
+        :param webhdfs_user: hdfs user of WebHDFS request, its trash is used if not skip trash
+        :param spark: active SparkSession, if set and webhdfs_url not set,
+            list and delete with hadoop FileSystem in its jvm instead of `hadoop fs` command
+        :param max_workers: max concurrent ls, du and delete commands, default 1 run in sequence
+        :param fsimage_path: file of `hdfs oiv -p Delimited` export, if set, list and du offline from it,
+            only delete goes to the cluster, export it just before clean
+        :param quota: HdfsQuotaDesc(quota_dir, target_ratio), after expired paths deleted,
+            delete the oldest paths until space consumed of quota dir below target ratio of its space quota
+        :param tiering: HdfsTieringDesc(after, replication, storage_policy), paths not expired but not updated
+            since after are set to lower replication or colder storage policy
+        :param tiering_index_path: sqlite file to keep tiered paths between runs, path not updated since is skipped
         """
+        hdfs_fs = WebHdfsFileSystem(self._logger, webhdfs_url, webhdfs_user) if webhdfs_url else None
         hdfs_cleaner = HDFSPathCleaner(
             self._logger,
             hdfs_paths,
             skip_trash,
             ignore_update_time,
             hdfs_day_time_pattern,
-            expire_time
+            expire_time,
+            report_size,
+            hdfs_fs,
+            spark,
+            max_workers,
+            fsimage_path,
+            quota,
+            tiering,
+            tiering_index_path
         )
         self._cleaners.append(hdfs_cleaner)
         return self
@@ -117,8 +219,13 @@ class ProjectCleanerBuilder:
                          ignore_update_time=False,
                          check_time_type=None,
                          partition_field_format='%Y%m%d',
-                         hdfs_day_time_pattern=r'\d{4}-\d{2}-\d{2}',
-                         expire_time: ExpireTimeDesc = None):
+                         hdfs_day_time_pattern=None,
+                         expire_time: ExpireTimeDesc = None,
+                         report_size=True,
+                         ddl_executor=None,
+                         partition_chunk_size=100,
+                         max_workers=1,
+                         scheduler_pool='hive_cleaner'):
         """
         clear hive data util
         if drop partition, support signal partition
@@ -135,8 +242,16 @@ class ProjectCleanerBuilder:
             check time by partition for time sorted partition if partition_field set
             check time by partition updatetime on hdfs if hdfs_update_time set
         :param partition_field_format: datetime format for time sorted partition field
-        :param hdfs_day_time_pattern: the time regular expressions pattern for hdfs ls return
+        :param hdfs_day_time_pattern: deprecated, ignored with a DeprecationWarning if set,
+            update time is read from file status
         :param expire_time:
+        :param report_size: get bytes of expired tables and partitions with `hadoop fs -du`
+        :param ddl_executor: `cli` one hive_cmd per statement (default), `spark` in spark session,
+            `script` all statements with one `hive -f`, or a HiveDdlExecutor like HiveServer2DdlExecutor
+        :param partition_chunk_size: max partitions dropped by one `alter table` statement,
+            partitions of a failed statement are dropped one by one, with `script` after one `hive -f`
+        :param max_workers: max tables checked and dropped concurrently, default 1 one by one
+        :param scheduler_pool: prefix of spark fair scheduler pool of every worker thread, None not set pool
         """
         hive_table_cleaner = HiveTableCleaner(
             self._logger,
@@ -151,7 +266,12 @@ class ProjectCleanerBuilder:
             check_time_type,
             partition_field_format,
             hdfs_day_time_pattern,
-            expire_time
+            expire_time,
+            report_size,
+            ddl_executor,
+            partition_chunk_size,
+            max_workers,
+            scheduler_pool
         )
         self._cleaners.append(hive_table_cleaner)
         return self
@@ -162,8 +282,10 @@ class ProjectCleanerBuilder:
                           clear_tables=None,
                           drop_table: bool = False,
                           ignore_update_time: bool = False,
-                          hdfs_day_time_pattern=r'\d{4}-\d{2}-\d{2}',
-                          expire_time: ExpireTimeDesc = None):
+                          hdfs_day_time_pattern=None,
+                          expire_time: ExpireTimeDesc = None,
+                          report_size=True,
+                          spark=None):
         """
         hbase table cleaner
         :param hbase_namespace:
@@ -176,8 +298,12 @@ class ProjectCleanerBuilder:
             ['tb*'] or 'tb*' will delete the table begin with tb
         :param drop_table: if set true, will execute `drop namespace:table_name`
         :param ignore_update_time: if set true, clear will not check update time
-        :param hdfs_day_time_pattern:
+        :param hdfs_day_time_pattern: deprecated, ignored with a DeprecationWarning if set,
+            ls line is split into fixed fields, update time is the day and minute in it
         :param expire_time: default four month
+        :param report_size: get bytes of expired tables with one `hadoop fs -du` of namespace dir
+        :param spark: active SparkSession, if set, list namespace dir with hadoop FileSystem in its jvm
+            instead of `hadoop fs` command
         """
         hbase_table_cleaner = HbaseTableCleaner(
             self._logger,
@@ -187,7 +313,9 @@ class ProjectCleanerBuilder:
             drop_table,
             ignore_update_time,
             hdfs_day_time_pattern,
-            expire_time
+            expire_time,
+            report_size,
+            spark
         )
         self._cleaners.append(hbase_table_cleaner)
         return self
@@ -198,35 +326,60 @@ class ProjectCleanerBuilder:
 
 class ProjectDataLogCleaner:
 
-    def __init__(self, logger: LogAdaptor, cleaner):
+    def __init__(self, logger: LogAdaptor, cleaner, listing_cache: HdfsListingCache = None):
         self.logger = logger
         self._cleaners = cleaner
 
+        # hdfs listings are shared by cleaners, and by test_clean and clean of the same run
+        self.listing_cache = listing_cache if listing_cache else HdfsListingCache()
+        for it in self._cleaners:
+            it.set_listing_cache(self.listing_cache)
+
     def clean(self):
         """
         clean project data
-        :return:
+        :return: [CleanSummary], summary of the cleaners executed success
         """
+        summaries = []
         for cleaner in self._cleaners:
             try:
                 self.logger.info(f"begin execute cleaner: {cleaner}")
-                cleaner.clean()
+                summaries.append(cleaner.clean())
                 self.logger.info(f"execute cleaner {cleaner} success")
             except Exception:
                 self.logger.error(f"execute cleaner {cleaner} failed: {traceback.format_exc()}")
+        self.logger.info(f"hdfs listing cache: {self.listing_cache}")
+        return summaries
 
     def test_clean(self):
         """
         show all cleaned data
-        :return:
+        :return: [CleanSummary], summary of what would be cleaned
         """
+        summaries = []
         for cleaner in self._cleaners:
             try:
                 self.logger.info(f"begin test cleaner: {cleaner}")
-                cleaner.test_clean()
+                summaries.append(cleaner.test_clean())
                 self.logger.info(f"cleaner {cleaner} test success")
             except Exception:
                 self.logger.error(f"cleaner {cleaner} test failed: {traceback.format_exc()}")
+        self.logger.info(f"hdfs listing cache: {self.listing_cache}")
+        return summaries
+
+    def iter_candidates(self):
+        """
+        lazily yield everything will be cleaned by every cleaner, nothing is deleted
+        :return: (cleaner, CleanCandidate)
+        """
+        for cleaner in self._cleaners:
+            try:
+                for candidate in cleaner.iter_candidates():
+                    yield cleaner, candidate
+            except Exception:
+                self.logger.error(f"cleaner {cleaner} iter candidates failed: {traceback.format_exc()}")
+            finally:
+                cleaner.close()
 
     def set_action_prefix(self, prefix):
         """
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: dir_index
+:Author: xufeng
+:Date: 2021-08-16 3:10 PM
+:Version: v.1.0
+:Description:
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import closing
+
+# dir_mtime: directory st_mtime_ns when scanned
+# oldest_mtime: the oldest mtime of remain files can be deleted by type, None if no such file
+# file_count: count of remain non directory entries
+# sub_dirs: sub directory names
+DirIndexRecord = namedtuple("DirIndexRecord", ['dir_mtime', 'oldest_mtime', 'file_count', 'sub_dirs'])
+
+
+class DirMtimeIndex:
+    """
+    persistent index of local directories on sqlite, keyed by cleaner profile and directory path
+    a directory's entries not change while its mtime not change,
+    so the directory can be skipped if its oldest file is still not expired
+    records are loaded when open and written back together when close
+    """
+
+    def __init__(self, index_path, profile=''):
+        """
+        :param index_path: sqlite file path
+        :param profile: settings decide which file can be deleted, record of other profile is ignored
+        """
+        self._index_path = index_path
+        self._profile = hashlib.md5(profile.encode('utf-8')).hexdigest()
+        self._lock = threading.Lock()
+        self._records = {}
+        self._changed = {}
+        self._removed = set()
+
+    def open(self):
+        index_dir = os.path.dirname(os.path.abspath(self._index_path))
+        os.makedirs(index_dir, exist_ok=True)
+
+        with closing(sqlite3.connect(self._index_path)) as conn, conn:
+            conn.execute(
+                "create table if not exists dir_index ("
+                "profile text, path text, dir_mtime integer, oldest_mtime real, file_count integer, sub_dirs text, "
+                "primary key (profile, path))")
+            rows = conn.execute(
+                "select path, dir_mtime, oldest_mtime, file_count, sub_dirs from dir_index where profile = ?",
+                (self._profile,))
+            self._records = {
+                path: DirIndexRecord(dir_mtime, oldest_mtime, file_count, sub_dirs.split('\0') if sub_dirs else [])
+                for path, dir_mtime, oldest_mtime, file_count, sub_dirs in rows}
+        self._changed = {}
+        self._removed = set()
+        return self
+
+    def close(self):
+        with self._lock, closing(sqlite3.connect(self._index_path)) as conn, conn:
+            conn.executemany(
+                "delete from dir_index where profile = ? and path = ?",
+                [(self._profile, path) for path in self._removed])
+            conn.executemany(
+                "insert or replace into dir_index values (?, ?, ?, ?, ?, ?)",
+                [(self._profile, path, r.dir_mtime, r.oldest_mtime, r.file_count, '\0'.join(r.sub_dirs))
+                 for path, r in self._changed.items()])
+            self._changed = {}
+            self._removed = set()
+
+    def get(self, path) -> DirIndexRecord:
+        with self._lock:
+            return self._records.get(path)
+
+    def put(self, path, record: DirIndexRecord):
+        with self._lock:
+            self._records[path] = record
+            self._changed[path] = record
+            self._removed.discard(path)
+
+    def remove(self, path):
+        with self._lock:
+            if self._records.pop(path, None) is None:
+                return
+            self._changed.pop(path, None)
+            self._removed.add(path)
+
+    @property
+    def record_count(self):
+        return len(self._records)
+
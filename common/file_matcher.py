@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: file_matcher
+:Author: xufeng
+:Date: 2021-08-13 10:20 AM
+:Version: v.1.0
+:Description:
+"""
+import fnmatch
+import re
+
+
+class FileNameMatcher:
+    """
+    match file name with a group of patterns, patterns are compiled once when matcher created
+    match mode:
+        contains: pattern appears in file name, ex: .log match xxx.log and xxx.log.202106
+        suffix: file name ends with pattern, ex: .log only match xxx.log
+        glob: shell style pattern, ex: *.log.2021*
+    """
+
+    MATCH_CONTAINS = 'contains'
+    MATCH_SUFFIX = 'suffix'
+    MATCH_GLOB = 'glob'
+
+    def __init__(self, patterns, match_mode=MATCH_CONTAINS):
+        if isinstance(patterns, str):
+            patterns = [patterns]
+
+        if match_mode not in (self.MATCH_CONTAINS, self.MATCH_SUFFIX, self.MATCH_GLOB):
+            raise Exception(f"file name match mode is invalid:{match_mode}")
+
+        self._patterns = tuple(dict.fromkeys(patterns))
+        self._match_mode = match_mode
+        self.match = self._compile()
+
+    @property
+    def patterns(self):
+        return self._patterns
+
+    @property
+    def match_mode(self):
+        return self._match_mode
+
+    def _compile(self):
+        if not self._patterns:
+            return lambda file_name: False
+
+        if self._match_mode == self.MATCH_SUFFIX:
+            patterns = self._patterns
+            return lambda file_name: file_name.endswith(patterns)
+
+        if self._match_mode == self.MATCH_GLOB:
+            reg = '|'.join(fnmatch.translate(pattern) for pattern in self._patterns)
+            matcher = re.compile(reg).match
+            return lambda file_name: matcher(file_name) is not None
+
+        matcher = re.compile(self._build_trie_reg(self._patterns)).search
+        return lambda file_name: matcher(file_name) is not None
+
+    @classmethod
+    def _build_trie_reg(cls, words):
+        """
+        build regular expression from a trie of words, words with same prefix share one branch
+        ex: ['.log', '.out', '.gc'] => \\.(?:log|out|gc)
+        the regex engine check common prefix only once instead of try every word
+        :param words:
+        :return:
+        """
+        trie = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = {}
+        return cls._trie_node_reg(trie)
+
+    @classmethod
+    def _trie_node_reg(cls, node):
+        # the word end here, shorter word is enough for contains match
+        if '' in node:
+            return ''
+
+        branches = [re.escape(char) + cls._trie_node_reg(child) for char, child in node.items()]
+        if len(branches) == 1:
+            return branches[0]
+        return f"(?:{'|'.join(branches)})"
+
+    def __repr__(self):
+        return f"FileNameMatcher({self._match_mode}: {list(self._patterns)})"
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: fsimage
+:Author: xufeng
+:Date: 2021-08-25 2:40 PM
+:Version: v.1.0
+:Description:
+"""
+import fnmatch
+import getpass
+import itertools
+import mmap
+import os
+import posixpath
+import threading
+import time
+import traceback
+from urllib.parse import urlparse
+
+from common.hdfs_fs import HdfsFileSystem, HdfsFileStatus
+from common.utils import HdfsUtil
+from common.logger_adaptor import LogAdaptor
+
+
+class FsImageIndex:
+    """
+    paths of `hdfs oiv -p Delimited` export under the indexed prefixes, up to max depth
+    size of dir is the total of the files under it, files deeper than max depth only count in sizes
+    """
+
+    # column order of Delimited export without header
+    DEFAULT_COLUMNS = ['Path', 'Replication', 'ModificationTime', 'AccessTime', 'PreferredBlockSize', 'BlocksCount',
+                       'FileSize', 'NSQUOTA', 'DSQUOTA', 'Permission', 'UserName', 'GroupName']
+
+    def __init__(self, prefixes=None, max_depth=None):
+        """
+        :param prefixes: only paths under them are indexed, default all
+        :param max_depth: paths deeper than it are not indexed, default not limit, `/user/proj` depth is 2
+        """
+        self._prefixes = [prefix.rstrip('/') + '/' for prefix in prefixes] if prefixes else None
+        self._max_depth = max_depth
+
+        # {path: [is_dir, modification_time, size]}
+        self._entries = {'/': [True, None, 0]}
+        # {parent path: [child name]}
+        self._children = {}
+        self._mtimes = {}
+
+    def load(self, fsimage_path, delimiter='\t'):
+        """
+        stream the export, memory mapped if possible
+        :param fsimage_path:
+        :param delimiter:
+        :return:
+        """
+        with open(fsimage_path, 'rb') as f:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                mapped = None
+
+            try:
+                self._load_lines(iter(mapped.readline, b'') if mapped else f, delimiter)
+            finally:
+                if mapped:
+                    mapped.close()
+        return self
+
+    def _load_lines(self, lines, delimiter):
+        columns = None
+        for line in lines:
+            fields = line.rstrip(b'\r\n').decode('utf-8', 'replace').split(delimiter)
+            if columns is None:
+                columns = fields if fields[0] == 'Path' else self.DEFAULT_COLUMNS
+                path_idx, time_idx, size_idx, permission_idx = [columns.index(name) for name in (
+                    'Path', 'ModificationTime', 'FileSize', 'Permission')]
+                if fields[0] == 'Path':
+                    continue
+
+            if len(fields) < len(columns):
+                continue
+
+            self.add(fields[path_idx],
+                     fields[permission_idx].startswith('d'),
+                     self._parse_time(fields[time_idx]),
+                     int(fields[size_idx] or 0))
+
+    def add(self, path, is_dir, modification_time, size):
+        if self._prefixes and not any(f'{path}/'.startswith(prefix) or prefix.startswith(f'{path}/')
+                                      for prefix in self._prefixes):
+            return
+
+        names = [name for name in path.split('/') if name]
+        depth = len(names)
+        if self._max_depth is None or depth <= self._max_depth:
+            entry = self._add_path(names)
+            entry[0] = is_dir
+            entry[1] = modification_time
+
+        if not is_dir and size:
+            for i in range(min(depth, self._max_depth if self._max_depth is not None else depth) + 1):
+                self._add_path(names[:i])[2] += size
+
+    def _add_path(self, names):
+        path = '/' + '/'.join(names)
+        entry = self._entries.get(path)
+        if entry is None:
+            entry = self._entries[path] = [True, None, 0]
+            if names:
+                self._add_path(names[:-1])
+                self._children.setdefault(posixpath.dirname(path), []).append(names[-1])
+        return entry
+
+    def get(self, path):
+        """
+        :param path: absolute path
+        :return: HdfsFileStatus, None if not found
+        """
+        entry = self._entries.get(path)
+        return HdfsFileStatus(path, entry[0], entry[1], entry[2]) if entry else None
+
+    def list_children(self, path):
+        return [self.get(posixpath.join(path, name)) for name in sorted(self._children.get(path, []))]
+
+    def glob(self, path):
+        """
+        expand wildcard level by level
+        :param path: absolute path
+        :return: [HdfsFileStatus] of matched paths
+        """
+        matched = ['/']
+        for name in [name for name in path.split('/') if name]:
+            if any(c in name for c in '*?['):
+                matched = [posixpath.join(parent, child) for parent in matched
+                           for child in sorted(self._children.get(parent, [])) if fnmatch.fnmatch(child, name)]
+            else:
+                matched = [posixpath.join(parent, name) for parent in matched
+                           if posixpath.join(parent, name) in self._entries]
+        return [self.get(matched_path) for matched_path in matched]
+
+    def _parse_time(self, time_str):
+        """
+        yyyy-MM-dd HH:mm of local time, parsed once for all paths of the same minute
+        """
+        mtime = self._mtimes.get(time_str)
+        if mtime is None:
+            mtime = self._mtimes[time_str] = time.mktime(time.strptime(time_str, '%Y-%m-%d %H:%M'))
+        return mtime
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FsImageHdfsFileSystem(HdfsFileSystem):
+    """
+    list and du with the index of a fsimage export, no rpc to namenode,
+    delete is executed by the live backend
+    fsimage is a snapshot, path updated after the export is checked with the old update time, export it just before
+    """
+
+    def __init__(self, logger: LogAdaptor, fsimage_path, hdfs_fs: HdfsFileSystem, hdfs_paths=None,
+                 delimiter='\t', user=None):
+        """
+        :param logger:
+        :param fsimage_path: file of `hdfs oiv -p Delimited -i fsimage_xxx -o fsimage.txt`
+        :param hdfs_fs: live backend to delete
+        :param hdfs_paths: paths will be listed, only their prefixes are indexed, default index all
+        :param delimiter: delimiter of export
+        :param user: relative path is relative to /user/{user}, default current user
+        """
+        self._logger = logger
+        self._fsimage_path = fsimage_path
+        self._hdfs_fs = hdfs_fs
+        self._delimiter = delimiter
+        self._user = user if user else getpass.getuser()
+
+        self._prefixes, self._max_depth = None, None
+        if isinstance(hdfs_paths, str):
+            hdfs_paths = [hdfs_paths]
+        if hdfs_paths:
+            paths = [self._get_path(hdfs_path) for hdfs_path in hdfs_paths if hdfs_path]
+            self._prefixes = [self._get_prefix(path) for path in paths]
+            # matched dir of wildcard path is replaced by its children
+            self._max_depth = max(len([name for name in path.split('/') if name]) for path in paths) + 1
+
+        self._index = None
+        self._lock = threading.Lock()
+
+    def list_status(self, hdfs_path) -> list:
+        index = self._get_index()
+        statuses = []
+        for status in index.glob(self._get_path(hdfs_path)):
+            statuses.extend(index.list_children(status.path) if status.is_dir else [status])
+        return [self._to_status(hdfs_path, status) for status in statuses]
+
+    def delete(self, hdfs_path, skip_trash=False):
+        self._hdfs_fs.delete(hdfs_path, skip_trash)
+
+    def delete_many(self, hdfs_paths, skip_trash=False, max_workers=1, acquire=None, max_chunk_paths=None) -> dict:
+        return self._hdfs_fs.delete_many(hdfs_paths, skip_trash, max_workers, acquire, max_chunk_paths)
+
+    def du(self, hdfs_path, summarize=False) -> dict:
+        try:
+            statuses = self._get_index().glob(self._get_path(hdfs_path)) if summarize \
+                else self.list_status(hdfs_path)
+            return {HdfsUtil.normalize_path(self._to_status(hdfs_path, status).path): status.length
+                    for status in statuses}
+        except Exception:
+            self._logger.warning(f"du hdfs path: {hdfs_path} in fsimage failed: {traceback.format_exc()}")
+            return {}
+
+    def set_replication(self, hdfs_path, replication):
+        self._hdfs_fs.set_replication(hdfs_path, replication)
+
+    def set_replication_many(self, hdfs_paths, replication, max_workers=1) -> dict:
+        return self._hdfs_fs.set_replication_many(hdfs_paths, replication, max_workers)
+
+    def set_storage_policy(self, hdfs_path, policy):
+        self._hdfs_fs.set_storage_policy(hdfs_path, policy)
+
+    def set_storage_policy_many(self, hdfs_paths, policy, max_workers=1) -> dict:
+        return self._hdfs_fs.set_storage_policy_many(hdfs_paths, policy, max_workers)
+
+    def get_space_quota(self, hdfs_path) -> (int, int, int):
+        # consumed space in fsimage is out of date after deletes, ask the live backend
+        return self._hdfs_fs.get_space_quota(hdfs_path)
+
+    def get_namespace(self) -> str:
+        # listing of an export differs from the live backend and other exports
+        return f'fsimage:{os.path.abspath(self._fsimage_path)}:{self._user}'
+
+    def close(self):
+        self._hdfs_fs.close()
+
+    def _get_index(self) -> FsImageIndex:
+        with self._lock:
+            if self._index is None:
+                begin = time.time()
+                self._index = FsImageIndex(self._prefixes, self._max_depth).load(self._fsimage_path, self._delimiter)
+                self._logger.info(f"load fsimage {self._fsimage_path}, {len(self._index)} paths indexed "
+                                  f"in {time.time() - begin:.1f}s")
+                if os.path.getmtime(self._fsimage_path) < time.time() - 24 * 3600:
+                    self._logger.warning(f"fsimage {self._fsimage_path} is exported one day ago!")
+            return self._index
+
+    def _get_path(self, hdfs_path):
+        """
+        hdfs://nameservice1/user/proj ==> /user/proj, proj/tmp ==> /user/{user}/proj/tmp
+        """
+        path = urlparse(hdfs_path).path or '/'
+        if not path.startswith('/'):
+            path = posixpath.join(f'/user/{self._user}', path)
+        return posixpath.normpath(path)
+
+    @staticmethod
+    def _get_prefix(path):
+        """
+        parent of path before the first level has wildcard, /user/*/tmp ==> /user, /user/proj ==> /user
+        """
+        names = [name for name in path.split('/') if name]
+        literal_names = list(itertools.takewhile(lambda name: not any(c in name for c in '*?['), names))
+        if len(literal_names) == len(names):
+            literal_names = literal_names[:-1]
+        return '/' + '/'.join(literal_names)
+
+    @staticmethod
+    def _to_status(hdfs_path, status: HdfsFileStatus) -> HdfsFileStatus:
+        # path is printed with scheme and authority only if they are in the requested path, same as `hadoop fs -ls`
+        parsed = urlparse(hdfs_path)
+        if not parsed.scheme:
+            return status
+        return HdfsFileStatus(f'{parsed.scheme}://{parsed.netloc}{status.path}',
+                              status.is_dir, status.modification_time, status.length)
@@ -0,0 +1,747 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: hdfs_fs
+:Author: xufeng
+:Date: 2021-08-20 2:15 PM
+:Version: v.1.0
+:Description:
+"""
+import abc
+import fnmatch
+import http.client
+import json
+import os
+import posixpath
+import queue
+import re
+import shlex
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urlencode, quote
+
+from common.ls_parser import parse_ls_lines
+from common.utils import ShellUtil, HdfsUtil
+from common.logger_adaptor import LogAdaptor
+
+
+class HdfsFileStatus:
+    """
+    path: full path of file or dir
+    is_dir:
+    modification_time: epoch seconds, None if unknown
+    length: bytes of file, 0 for dir
+    """
+    __slots__ = ('path', 'is_dir', 'modification_time', 'length')
+
+    def __init__(self, path, is_dir=False, modification_time=None, length=0):
+        self.path = path
+        self.is_dir = is_dir
+        self.modification_time = modification_time
+        self.length = length
+
+    def __repr__(self):
+        return f"HdfsFileStatus({self.path}, is_dir={self.is_dir}, " \
+            f"modification_time={self.modification_time}, length={self.length})"
+
+
+def _run_in_order(func, items, max_workers=1) -> dict:
+    """
+    call func of every item with thread pool, merge the returned dicts in order of items
+    :param func: return dict
+    :param items: iterable, consumed lazily as items are submitted
+    :param max_workers:
+    :return:
+    """
+    result = {}
+    if max_workers <= 1:
+        for item in items:
+            result.update(func(item))
+        return result
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(func, item) for item in items]
+        for future in futures:
+            result.update(future.result())
+    return result
+
+
+class HdfsFileSystem(metaclass=abc.ABCMeta):
+    """
+    hdfs operations used by cleaners, semantics follow `hadoop fs` commands
+    """
+
+    @abc.abstractmethod
+    def list_status(self, hdfs_path) -> list:
+        """
+        same as `hadoop fs -ls`, path can have wildcard,
+        every matched dir is replaced by its children, matched file is returned itself
+        error will raise if list failed
+        :param hdfs_path:
+        :return: [HdfsFileStatus]
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete(self, hdfs_path, skip_trash=False):
+        """
+        same as `hadoop fs -rm -r [-skipTrash]`, error will raise if delete failed
+        :param hdfs_path:
+        :param skip_trash:
+        :return:
+        """
+        raise NotImplementedError
+
+    def delete_many(self, hdfs_paths, skip_trash=False, max_workers=1, acquire=None, max_chunk_paths=None) -> dict:
+        """
+        delete paths one by one, backend can delete them in batch
+        :param hdfs_paths: iterable of hdfs path, consumed lazily
+        :param skip_trash:
+        :param max_workers: thread count to delete in parallel
+        :param acquire: acquire([hdfs path]) is called just before the paths deleted, blocks to limit the rate
+        :param max_chunk_paths: max paths deleted by one batch, default not limit
+        :return: {hdfs path: error message} of paths failed to delete, in order of paths
+        """
+        return self._call_many(lambda hdfs_path: self.delete(hdfs_path, skip_trash), hdfs_paths, max_workers,
+                               acquire)
+
+    def set_replication(self, hdfs_path, replication):
+        """
+        same as `hadoop fs -setrep`, replication of all files under path is set, error will raise if failed
+        :param hdfs_path:
+        :param replication:
+        :return:
+        """
+        raise NotImplementedError
+
+    def set_replication_many(self, hdfs_paths, replication, max_workers=1) -> dict:
+        """
+        :return: {hdfs path: error message} of paths failed, in order of paths
+        """
+        return self._call_many(lambda hdfs_path: self.set_replication(hdfs_path, replication), hdfs_paths,
+                               max_workers)
+
+    def set_storage_policy(self, hdfs_path, policy):
+        """
+        same as `hdfs storagepolicies -setStoragePolicy`, blocks are moved by `hdfs mover` later
+        :param hdfs_path:
+        :param policy: HOT, WARM, COLD, ALL_SSD, ONE_SSD, LAZY_PERSIST
+        :return:
+        """
+        raise NotImplementedError
+
+    def set_storage_policy_many(self, hdfs_paths, policy, max_workers=1) -> dict:
+        """
+        :return: {hdfs path: error message} of paths failed, in order of paths
+        """
+        return self._call_many(lambda hdfs_path: self.set_storage_policy(hdfs_path, policy), hdfs_paths, max_workers)
+
+    @staticmethod
+    def _call_many(func, hdfs_paths, max_workers, acquire=None) -> dict:
+        def call_one(hdfs_path):
+            if acquire:
+                acquire([hdfs_path])
+            try:
+                func(hdfs_path)
+                return {}
+            except Exception:
+                return {hdfs_path: traceback.format_exc()}
+
+        return _run_in_order(call_one, hdfs_paths, max_workers)
+
+    @abc.abstractmethod
+    def du(self, hdfs_path, summarize=False) -> dict:
+        """
+        same as `hadoop fs -du [-s]`
+        :param hdfs_path:
+        :param summarize:
+        :return: {normalized path: bytes}, empty if du failed
+        """
+        raise NotImplementedError
+
+    def get_space_quota(self, hdfs_path) -> (int, int, int):
+        """
+        same as `hadoop fs -count -q`, error will raise if failed
+        :param hdfs_path: dir path without wildcard
+        :return: (space quota, space consumed with replicas, bytes of files), quota and consumed is None if no quota
+        """
+        raise NotImplementedError
+
+    def get_namespace(self) -> str:
+        """
+        backends with the same namespace list the same paths, listing cache is shared by them
+        :return: default is unique of the backend object
+        """
+        return f'{type(self).__name__}@{id(self)}'
+
+    def close(self):
+        pass
+
+
+class ShellHdfsFileSystem(HdfsFileSystem):
+    """
+    execute `hadoop fs` command in shell, every command starts a jvm
+    """
+
+    # command is passed to `sh -c` as one argument, linux limits one argument to 128K besides ARG_MAX
+    MAX_ARG_STRLEN = 131072
+
+    def __init__(self, logger: LogAdaptor, max_command_length=None):
+        """
+        :param logger:
+        :param max_command_length: max length of one batched `hadoop fs -rm` command,
+            default is computed from ARG_MAX and size of environment
+        """
+        self._logger = logger
+        self._max_command_length = max_command_length if max_command_length else self._get_max_command_length()
+
+    def get_namespace(self) -> str:
+        # `hadoop fs` of one process uses the same configuration and user
+        return 'shell'
+
+    def list_status(self, hdfs_path) -> list:
+        lines = ShellUtil.exec_shell_with_result(f"hadoop fs -ls {hdfs_path}", self._logger)
+        return [HdfsFileStatus(entry.path, entry.is_dir, entry.mtime, entry.size) for entry in parse_ls_lines(lines)]
+
+    def delete(self, hdfs_path, skip_trash=False):
+        skip_trash = '-skipTrash' if skip_trash else ''
+        ShellUtil.exec_shell_with_result(f"hadoop fs -rm -r {skip_trash} {hdfs_path}", self._logger)
+
+    def delete_many(self, hdfs_paths, skip_trash=False, max_workers=1, acquire=None, max_chunk_paths=None) -> dict:
+        """
+        delete with `hadoop fs -rm -r [-skipTrash] p1 p2 ... pN`, paths are chunked by max command length
+        and max chunk paths, chunks are executed in parallel with max workers, acquire is called once per chunk
+        """
+        command = f"hadoop fs -rm -r{' -skipTrash' if skip_trash else ''}"
+        return _run_in_order(lambda chunk: self._exec_chunk(command, chunk, 'rm: ', acquire),
+                             self._iter_chunks(command, hdfs_paths, max_chunk_paths),
+                             max_workers)
+
+    def set_replication(self, hdfs_path, replication):
+        ShellUtil.exec_shell_with_result(f"hadoop fs -setrep {int(replication)} {shlex.quote(hdfs_path)}", self._logger)
+
+    def set_replication_many(self, hdfs_paths, replication, max_workers=1) -> dict:
+        """
+        set with `hadoop fs -setrep n p1 p2 ... pN`, paths are chunked as delete
+        """
+        command = f"hadoop fs -setrep {int(replication)}"
+        return _run_in_order(lambda chunk: self._exec_chunk(command, chunk, 'setrep: '),
+                             self._iter_chunks(command, hdfs_paths),
+                             max_workers)
+
+    def set_storage_policy(self, hdfs_path, policy):
+        # storagepolicies command takes only one path
+        ShellUtil.exec_shell_with_result(
+            f"hdfs storagepolicies -setStoragePolicy -path {shlex.quote(hdfs_path)} -policy {policy}", self._logger)
+
+    def _iter_chunks(self, command, hdfs_paths, max_chunk_paths=None):
+        chunk, chunk_length = [], len(command)
+        for hdfs_path in hdfs_paths:
+            arg_length = len(shlex.quote(hdfs_path)) + 1
+            if chunk and (chunk_length + arg_length > self._max_command_length
+                          or (max_chunk_paths and len(chunk) >= max_chunk_paths)):
+                yield chunk
+                chunk, chunk_length = [], len(command)
+            chunk.append(hdfs_path)
+            chunk_length += arg_length
+
+        if chunk:
+            yield chunk
+
+    def _exec_chunk(self, command, hdfs_paths, error_prefix, acquire=None) -> dict:
+        """
+        `hadoop fs -rm` and `-setrep` go on after a path failed, and print `rm: ...` error line with the path
+        :param command:
+        :param hdfs_paths:
+        :param error_prefix: error lines start with it
+        :param acquire: called with the paths before the command executed
+        :return: {hdfs path: error message} of paths failed
+        """
+        if acquire:
+            acquire(hdfs_paths)
+
+        shell_cmd = ' '.join([command] + [shlex.quote(hdfs_path) for hdfs_path in hdfs_paths])
+        return_code, lines = ShellUtil.exec_shell_with_return_code(shell_cmd, self._logger)
+        if return_code == 0:
+            return {}
+
+        error_lines = [line for line in lines if line.startswith(error_prefix)]
+        errors = {}
+        for hdfs_path in hdfs_paths:
+            path_pattern = re.compile(re.escape(HdfsUtil.normalize_path(hdfs_path)) + r"/?(?=['`:\s]|$)")
+            path_errors = [line for line in error_lines if path_pattern.search(line)]
+            if path_errors:
+                errors[hdfs_path] = '\n'.join(path_errors)
+
+        # error not about any path, such as jvm failed to start, the whole chunk failed
+        if not errors:
+            error_msg = '\n'.join(lines)
+            errors = {hdfs_path: error_msg for hdfs_path in hdfs_paths}
+        return errors
+
+    def _get_max_command_length(self):
+        try:
+            arg_max = os.sysconf('SC_ARG_MAX')
+        except (ValueError, OSError):
+            arg_max = self.MAX_ARG_STRLEN
+
+        # environment is copied to `sh` and `hadoop`, leave room for the arguments `hadoop` script adds
+        env_length = sum(len(key) + len(value) + 2 for key, value in os.environ.items())
+        return max(min(arg_max - env_length, self.MAX_ARG_STRLEN) - 4096, 4096)
+
+    def du(self, hdfs_path, summarize=False) -> dict:
+        return HdfsUtil.du(hdfs_path, self._logger, summarize)
+
+    def get_space_quota(self, hdfs_path) -> (int, int, int):
+        """
+        QUOTA REMAINING_QUOTA SPACE_QUOTA REMAINING_SPACE_QUOTA DIR_COUNT FILE_COUNT CONTENT_SIZE PATHNAME
+        none inf 1099511627776 824633720832 10 200 91625968981 /user/proj
+        """
+        lines = ShellUtil.exec_shell_with_result(f"hadoop fs -count -q {shlex.quote(hdfs_path)}", self._logger)
+        for line in lines:
+            fields = line.split(None, 7)
+            if len(fields) == 8 and fields[6].isdigit():
+                if not fields[2].isdigit():
+                    return None, None, int(fields[6])
+                space_quota = int(fields[2])
+                return space_quota, space_quota - int(fields[3]), int(fields[6])
+        raise Exception(f"count quota of hdfs path: {hdfs_path} failed: {lines}")
+
+
+class _HttpConnectionPool:
+    """
+    keep alive http connections, connection is taken by one request at a time and put back after response read
+    """
+
+    def __init__(self, url, pool_size=8, timeout=30):
+        parsed = urlparse(url)
+        self._connection_class = http.client.HTTPSConnection if parsed.scheme == 'https' \
+            else http.client.HTTPConnection
+        self._host = parsed.hostname
+        self._port = parsed.port
+        self._timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+
+    def request(self, method, url) -> (int, bytes):
+        """
+        :param method:
+        :param url: path and query
+        :return: (status, body)
+        """
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            conn = self._new_connection()
+            reused = False
+
+        try:
+            status, body, will_close = self._request(conn, method, url)
+        except (http.client.HTTPException, OSError):
+            conn.close()
+            # idle connection may be closed by server, retry once with new connection
+            if not reused:
+                raise
+            conn = self._new_connection()
+            status, body, will_close = self._request(conn, method, url)
+
+        if will_close:
+            conn.close()
+        else:
+            self._put_back(conn)
+        return status, body
+
+    def _new_connection(self):
+        return self._connection_class(self._host, self._port, timeout=self._timeout)
+
+    @staticmethod
+    def _request(conn, method, url):
+        conn.request(method, url)
+        response = conn.getresponse()
+        return response.status, response.read(), response.will_close
+
+    def _put_back(self, conn):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class WebHdfsFileSystem(HdfsFileSystem):
+    """
+    talk to namenode with WebHDFS REST api over keep alive connections, no jvm started
+    only simple authentication with `user.name` is supported
+    delete with trash moves path to trash of user like `hadoop fs -rm`
+    """
+
+    WEBHDFS_PREFIX = '/webhdfs/v1'
+
+    def __init__(self, logger: LogAdaptor, namenode_url, user=None, pool_size=8, timeout=30):
+        """
+        :param logger:
+        :param namenode_url: namenode http address, ex: http://namenode:9870
+        :param user: hdfs user, trash is /user/{user}/.Trash/Current,
+            if not specified, relative path is under home dir from GETHOMEDIRECTORY of namenode
+        :param pool_size: max idle connections kept
+        :param timeout: seconds of connect and read timeout
+        """
+        self._logger = logger
+        self._namenode_url = namenode_url
+        self._user = user
+        self._pool = _HttpConnectionPool(namenode_url, pool_size, timeout)
+
+    def list_status(self, hdfs_path) -> list:
+        statuses = []
+        for status in self._glob(self._get_path(hdfs_path)):
+            statuses.extend(self._list_status(status.path) if status.is_dir else [status])
+        return statuses
+
+    def delete(self, hdfs_path, skip_trash=False):
+        statuses = self._glob(self._get_path(hdfs_path))
+        if not statuses:
+            raise Exception(f"delete hdfs path: {hdfs_path}: No such file or directory")
+
+        for status in statuses:
+            if skip_trash:
+                if not self._call('DELETE', status.path, 'DELETE', recursive='true')['boolean']:
+                    raise Exception(f"delete hdfs path: {status.path} failed")
+                continue
+
+            self._move_to_trash(status.path)
+
+    def du(self, hdfs_path, summarize=False) -> dict:
+        try:
+            statuses = self._glob(self._get_path(hdfs_path)) if summarize else self.list_status(hdfs_path)
+            return {HdfsUtil.normalize_path(status.path): self._get_content_length(status)
+                    for status in statuses}
+        except Exception:
+            self._logger.warning(f"du hdfs path: {hdfs_path} failed: {traceback.format_exc()}")
+            return {}
+
+    def set_replication(self, hdfs_path, replication):
+        # SETREPLICATION only works on file, files under dir are set one by one
+        statuses = self._glob(self._get_path(hdfs_path))
+        if not statuses:
+            raise Exception(f"set replication of hdfs path: {hdfs_path}: No such file or directory")
+
+        while statuses:
+            status = statuses.pop()
+            if status.is_dir:
+                statuses.extend(self._list_status(status.path))
+            elif not self._call('PUT', status.path, 'SETREPLICATION', replication=int(replication))['boolean']:
+                raise Exception(f"set replication of hdfs path: {status.path} failed")
+
+    def set_storage_policy(self, hdfs_path, policy):
+        for status in self._glob(self._get_path(hdfs_path)):
+            self._call('PUT', status.path, 'SETSTORAGEPOLICY', storagepolicy=policy)
+
+    def get_space_quota(self, hdfs_path) -> (int, int, int):
+        summary = self._call('GET', self._get_path(hdfs_path), 'GETCONTENTSUMMARY')['ContentSummary']
+        if summary.get('spaceQuota', -1) < 0:
+            return None, None, summary['length']
+        return summary['spaceQuota'], summary['spaceConsumed'], summary['length']
+
+    def get_namespace(self) -> str:
+        return f'webhdfs:{self._namenode_url.rstrip("/")}:{self._user}'
+
+    def close(self):
+        self._pool.close()
+
+    def _move_to_trash(self, hdfs_path):
+        if not self._user:
+            raise Exception(f"webhdfs user is not specified, can not move {hdfs_path} to trash")
+
+        trash_path = f"/user/{self._user}/.Trash/Current{hdfs_path}"
+        self._call('PUT', posixpath.dirname(trash_path), 'MKDIRS')
+        if self._call('PUT', hdfs_path, 'RENAME', destination=trash_path)['boolean']:
+            return
+
+        # path with same name already in trash
+        trash_path = f"{trash_path}{int(time.time() * 1000)}"
+        if not self._call('PUT', hdfs_path, 'RENAME', destination=trash_path)['boolean']:
+            raise Exception(f"move hdfs path: {hdfs_path} to trash: {trash_path} failed")
+
+    def _get_content_length(self, status: HdfsFileStatus):
+        if not status.is_dir:
+            return status.length
+        return self._call('GET', status.path, 'GETCONTENTSUMMARY')['ContentSummary']['length']
+
+    def _glob(self, hdfs_path) -> list:
+        """
+        expand wildcard in path level by level
+        :param hdfs_path: absolute path
+        :return: [HdfsFileStatus] of matched paths, empty if not found
+        """
+        if not any(c in hdfs_path for c in '*?['):
+            status = self._get_file_status(hdfs_path)
+            return [status] if status else []
+
+        matched = [HdfsFileStatus('/', True)]
+        for name in [name for name in hdfs_path.split('/') if name]:
+            next_matched = []
+            for parent in matched:
+                if not parent.is_dir:
+                    continue
+
+                if not any(c in name for c in '*?['):
+                    status = self._get_file_status(posixpath.join(parent.path, name))
+                    next_matched.extend([status] if status else [])
+                    continue
+
+                next_matched.extend(status for status in self._list_status(parent.path)
+                                    if fnmatch.fnmatchcase(posixpath.basename(status.path), name))
+            matched = next_matched
+        return matched
+
+    def _list_status(self, hdfs_path) -> list:
+        result = self._call('GET', hdfs_path, 'LISTSTATUS')
+        return [self._to_status(hdfs_path, file_status) for file_status in result['FileStatuses']['FileStatus']]
+
+    def _get_file_status(self, hdfs_path):
+        try:
+            return self._to_status(hdfs_path, self._call('GET', hdfs_path, 'GETFILESTATUS')['FileStatus'])
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _to_status(parent_path, file_status: dict) -> HdfsFileStatus:
+        path_suffix = file_status.get('pathSuffix')
+        return HdfsFileStatus(posixpath.join(parent_path, path_suffix) if path_suffix else parent_path,
+                              file_status['type'] == 'DIRECTORY',
+                              file_status['modificationTime'] / 1000,
+                              file_status.get('length', 0))
+
+    def _call(self, method, hdfs_path, op, **params) -> dict:
+        """
+        :param method:
+        :param hdfs_path:
+        :param op: webhdfs operation
+        :param params:
+        :return: response json
+        """
+        if self._user:
+            params['user.name'] = self._user
+        url = f"{self.WEBHDFS_PREFIX}{quote(hdfs_path)}?{urlencode(dict(op=op, **params))}"
+        self._logger.debug(f"webhdfs request: {method} {url}")
+
+        status, body = self._pool.request(method, url)
+        result = json.loads(body) if body else {}
+        if status == 200:
+            return result
+
+        exception = result.get('RemoteException', {})
+        message = f"webhdfs {op} {hdfs_path} failed: {status} {exception.get('message', body)}"
+        if exception.get('exception') == 'FileNotFoundException':
+            raise FileNotFoundError(message)
+        raise Exception(message)
+
+    def _get_path(self, hdfs_path):
+        """
+        hdfs://nameservice1/user/proj ==> /user/proj
+        relative path is relative to home dir of user, proj/tmp ==> /user/{user}/proj/tmp
+        """
+        path = urlparse(hdfs_path).path or '/'
+        if not path.startswith('/'):
+            path = posixpath.join(self._get_home_directory(), path)
+        return path
+
+    def _get_home_directory(self):
+        """
+        /user/{user}, asked from namenode with GETHOMEDIRECTORY if user is not specified
+        """
+        if not hasattr(self, 'home_directory'):
+            home_directory = f'/user/{self._user}' if self._user \
+                else self._call('GET', '/', 'GETHOMEDIRECTORY')['Path']
+            setattr(self, 'home_directory', home_directory)
+        return getattr(self, 'home_directory')
+
+
+class SparkHdfsFileSystem(HdfsFileSystem):
+    """
+    call org.apache.hadoop.fs.FileSystem in the jvm of active SparkSession with its hadoop configuration,
+    no jvm started for every operation
+    delete with trash uses Trash.moveToAppropriateTrash like `hadoop fs -rm`
+    """
+
+    def __init__(self, logger: LogAdaptor, spark):
+        """
+        :param logger:
+        :param spark: active SparkSession
+        """
+        self._logger = logger
+        self._jvm = spark._jvm
+        self._conf = spark._jsc.hadoopConfiguration()
+
+    def list_status(self, hdfs_path) -> list:
+        fs, j_statuses = self._glob_status(hdfs_path)
+        statuses = []
+        for j_status in j_statuses:
+            if j_status.isDirectory():
+                statuses.extend(self._to_status(hdfs_path, s) for s in fs.listStatus(j_status.getPath()))
+            else:
+                statuses.append(self._to_status(hdfs_path, j_status))
+        return statuses
+
+    def delete(self, hdfs_path, skip_trash=False):
+        fs, j_statuses = self._glob_status(hdfs_path)
+        if not j_statuses:
+            raise Exception(f"delete hdfs path: {hdfs_path}: No such file or directory")
+
+        for j_status in j_statuses:
+            j_path = j_status.getPath()
+
+            # trash disabled, path is deleted directly as `hadoop fs -rm`
+            if not skip_trash and self._jvm.org.apache.hadoop.fs.Trash.moveToAppropriateTrash(fs, j_path, self._conf):
+                continue
+
+            if not fs.delete(j_path, True):
+                raise Exception(f"delete hdfs path: {j_path.toString()} failed")
+
+    def du(self, hdfs_path, summarize=False) -> dict:
+        try:
+            fs, j_statuses = self._glob_status(hdfs_path)
+            if not summarize:
+                j_statuses = [s for j_status in j_statuses
+                              for s in (fs.listStatus(j_status.getPath()) if j_status.isDirectory() else [j_status])]
+
+            sizes = {}
+            for j_status in j_statuses:
+                size = fs.getContentSummary(j_status.getPath()).getLength() if j_status.isDirectory() \
+                    else j_status.getLen()
+                sizes[HdfsUtil.normalize_path(self._to_status(hdfs_path, j_status).path)] = size
+            return sizes
+        except Exception:
+            self._logger.warning(f"du hdfs path: {hdfs_path} failed: {traceback.format_exc()}")
+            return {}
+
+    def set_replication(self, hdfs_path, replication):
+        fs, j_statuses = self._glob_status(hdfs_path)
+        if not j_statuses:
+            raise Exception(f"set replication of hdfs path: {hdfs_path}: No such file or directory")
+
+        for j_status in j_statuses:
+            files = fs.listFiles(j_status.getPath(), True)
+            while files.hasNext():
+                fs.setReplication(files.next().getPath(), int(replication))
+
+    def set_storage_policy(self, hdfs_path, policy):
+        fs, j_statuses = self._glob_status(hdfs_path)
+        for j_status in j_statuses:
+            fs.setStoragePolicy(j_status.getPath(), policy)
+
+    def get_space_quota(self, hdfs_path) -> (int, int, int):
+        j_path = self._jvm.org.apache.hadoop.fs.Path(hdfs_path)
+        summary = j_path.getFileSystem(self._conf).getContentSummary(j_path)
+        if summary.getSpaceQuota() < 0:
+            return None, None, summary.getLength()
+        return summary.getSpaceQuota(), summary.getSpaceConsumed(), summary.getLength()
+
+    def get_namespace(self) -> str:
+        return f"spark:{self._conf.get('fs.defaultFS')}"
+
+    def _glob_status(self, hdfs_path):
+        """
+        :param hdfs_path:
+        :return: (FileSystem of path, [FileStatus] of matched paths)
+        """
+        j_path = self._jvm.org.apache.hadoop.fs.Path(hdfs_path)
+        fs = j_path.getFileSystem(self._conf)
+        j_statuses = fs.globStatus(j_path)
+        return fs, list(j_statuses) if j_statuses else []
+
+    @staticmethod
+    def _to_status(hdfs_path, j_status) -> HdfsFileStatus:
+        # path is printed with scheme and authority only if they are in the requested path, same as `hadoop fs -ls`
+        j_path = j_status.getPath()
+        path = j_path.toString() if urlparse(hdfs_path).scheme else j_path.toUri().getPath()
+        return HdfsFileStatus(path,
+                              j_status.isDirectory(),
+                              j_status.getModificationTime() / 1000,
+                              j_status.getLen())
+
+
+class CachedHdfsFileSystem(HdfsFileSystem):
+    """
+    cache list status of backend in HdfsListingCache shared by cleaners of one run,
+    cached listings are invalidated by delete
+    """
+
+    def __init__(self, hdfs_fs: HdfsFileSystem, listing_cache):
+        """
+        :param hdfs_fs: backend
+        :param listing_cache: HdfsListingCache
+        """
+        self._hdfs_fs = hdfs_fs
+        self._listing_cache = listing_cache
+        self._namespace = hdfs_fs.get_namespace()
+
+    @classmethod
+    def wrap(cls, hdfs_fs: HdfsFileSystem, listing_cache):
+        """
+        cache backend in listing cache, backend already cached is unwrapped first, caches are never nested
+        :param hdfs_fs:
+        :param listing_cache:
+        :return:
+        """
+        if isinstance(hdfs_fs, cls):
+            hdfs_fs = hdfs_fs._hdfs_fs
+        return cls(hdfs_fs, listing_cache)
+
+    def list_status(self, hdfs_path) -> list:
+        statuses = self._listing_cache.get(self._namespace, hdfs_path)
+        if statuses is None:
+            statuses = self._hdfs_fs.list_status(hdfs_path)
+            self._listing_cache.put(self._namespace, hdfs_path, statuses)
+        return statuses
+
+    def delete(self, hdfs_path, skip_trash=False):
+        try:
+            self._hdfs_fs.delete(hdfs_path, skip_trash)
+        finally:
+            self._listing_cache.invalidate(hdfs_path)
+
+    def delete_many(self, hdfs_paths, skip_trash=False, max_workers=1, acquire=None, max_chunk_paths=None) -> dict:
+        deleted_paths = []
+
+        def iter_paths():
+            for hdfs_path in hdfs_paths:
+                deleted_paths.append(hdfs_path)
+                yield hdfs_path
+
+        try:
+            return self._hdfs_fs.delete_many(iter_paths(), skip_trash, max_workers, acquire, max_chunk_paths)
+        finally:
+            for hdfs_path in deleted_paths:
+                self._listing_cache.invalidate(hdfs_path)
+
+    def du(self, hdfs_path, summarize=False) -> dict:
+        return self._hdfs_fs.du(hdfs_path, summarize)
+
+    def set_replication(self, hdfs_path, replication):
+        self._hdfs_fs.set_replication(hdfs_path, replication)
+
+    def set_replication_many(self, hdfs_paths, replication, max_workers=1) -> dict:
+        return self._hdfs_fs.set_replication_many(hdfs_paths, replication, max_workers)
+
+    def set_storage_policy(self, hdfs_path, policy):
+        self._hdfs_fs.set_storage_policy(hdfs_path, policy)
+
+    def set_storage_policy_many(self, hdfs_paths, policy, max_workers=1) -> dict:
+        return self._hdfs_fs.set_storage_policy_many(hdfs_paths, policy, max_workers)
+
+    def get_space_quota(self, hdfs_path) -> (int, int, int):
+        return self._hdfs_fs.get_space_quota(hdfs_path)
+
+    def get_namespace(self) -> str:
+        return self._hdfs_fs.get_namespace()
+
+    def close(self):
+        self._hdfs_fs.close()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: hive_ddl
+:Author: xufeng
+:Date: 2021-08-26 4:20 PM
+:Version: v.1.0
+:Description:
+"""
+import abc
+import os
+import queue
+import shlex
+import tempfile
+
+from common.utils import ShellUtil
+from common.logger_adaptor import LogAdaptor
+
+
+class HiveDdlExecutor(metaclass=abc.ABCMeta):
+    """
+    execute `drop table` and `alter table ... drop partition` statements of hive cleaner
+    """
+
+    # statements are executed on flush, instead of in execute
+    deferred = False
+
+    @abc.abstractmethod
+    def execute(self, statement):
+        """
+        error will raise if failed
+        :param statement: hive sql without ending `;`
+        :return:
+        """
+        pass
+
+    def flush(self) -> dict:
+        """
+        execute the statements deferred, called after all statements of a clean
+        :return: {statement: error message} of deferred statements failed or not executed
+        """
+        return {}
+
+    def close(self):
+        pass
+
+
+class HiveCliDdlExecutor(HiveDdlExecutor):
+    """
+    one `hive -e` process per statement, the hive cli starts in about 10 seconds
+    """
+
+    def __init__(self, logger: LogAdaptor, hive_cmd='hive -e'):
+        """
+        :param logger:
+        :param hive_cmd: execute hive command in shell
+        """
+        self._logger = logger
+        self._hive_cmd = hive_cmd
+
+    def execute(self, statement):
+        exec_cmd = statement if self._hive_cmd in statement else f'{self._hive_cmd} "{statement}"'
+        code, errmsg = ShellUtil.exec_shell_with_status(exec_cmd, self._logger)
+        if not code:
+            raise Exception(errmsg)
+
+
+class SparkDdlExecutor(HiveDdlExecutor):
+    """
+    statements executed in the SparkSession, no process started, catalog cache of session is refreshed together
+    """
+
+    def __init__(self, logger: LogAdaptor, spark):
+        """
+        :param logger:
+        :param spark: active SparkSession with hive support
+        """
+        self._logger = logger
+        self._spark = spark
+
+    def execute(self, statement):
+        self._spark.sql(statement)
+
+
+class HiveServer2DdlExecutor(HiveDdlExecutor):
+    """
+    statements executed over pooled HiveServer2 connections, connection is taken by one statement at a time
+    """
+
+    def __init__(self, logger: LogAdaptor, connect, pool_size=4):
+        """
+        :param logger:
+        :param connect: function returns a DB-API connection to HiveServer2,
+            ex: lambda: pyhive.hive.connect(host, 10000, username='proj')
+        :param pool_size: max idle connections kept
+        """
+        self._logger = logger
+        self._connect = connect
+        self._idle = queue.LifoQueue(maxsize=pool_size)
+
+    def execute(self, statement):
+        try:
+            conn = self._idle.get_nowait()
+            reused = True
+        except queue.Empty:
+            conn = self._connect()
+            reused = False
+
+        try:
+            self._execute(conn, statement)
+        except Exception:
+            self._close(conn)
+            # idle connection may be closed by server, retry once with new connection
+            if not reused:
+                raise
+            conn = self._connect()
+            try:
+                self._execute(conn, statement)
+            except Exception:
+                self._close(conn)
+                raise
+
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self._close(conn)
+
+    @staticmethod
+    def _execute(conn, statement):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            self._logger.warning("close hive server2 connection failed, ignored")
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class HiveScriptDdlExecutor(HiveDdlExecutor):
+    """
+    statements are deferred and executed together with one `hive -f` on flush,
+    hive stops at the first failed statement, the statements after it are not executed
+    """
+
+    deferred = True
+
+    def __init__(self, logger: LogAdaptor, hive_cmd='hive', script_dir=None):
+        """
+        :param logger:
+        :param hive_cmd: hive cli without `-e`
+        :param script_dir: dir of the script file, default system temp dir
+        """
+        self._logger = logger
+        self._hive_cmd = hive_cmd
+        self._script_dir = script_dir
+        self._statements = []
+
+    def execute(self, statement):
+        self._statements.append(statement)
+
+    def flush(self) -> dict:
+        if not self._statements:
+            return {}
+
+        statements, self._statements = self._statements, []
+        fd, script_path = tempfile.mkstemp(prefix='hive_cleaner_', suffix='.sql', dir=self._script_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(''.join(f'{statement};\n' for statement in statements))
+
+            return_code, lines = ShellUtil.exec_shell_with_return_code(
+                f"{self._hive_cmd} -f {shlex.quote(script_path)}", self._logger)
+        finally:
+            os.remove(script_path)
+
+        if return_code == 0:
+            self._logger.info(f"execute hive script of {len(statements)} statements success!")
+            return {}
+
+        # hive prints `OK` after every statement succeeded
+        executed = sum(1 for line in lines if line == 'OK')
+        if executed >= len(statements):
+            executed = 0
+        error_msg = '\n'.join(line for line in lines if line.startswith('FAILED')) or '\n'.join(lines)
+        self._logger.error(f"execute hive script failed at statement {executed + 1} of {len(statements)}: "
+                           f"{statements[executed]}, {error_msg}")
+
+        errors = {statements[executed]: error_msg}
+        for statement in statements[executed + 1:]:
+            errors[statement] = f"not executed after statement failed: {statements[executed]}"
+        return errors
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: hive_metastore
+:Author: xufeng
+:Date: 2021-08-26 10:30 AM
+:Version: v.1.0
+:Description:
+"""
+import re
+import time
+import traceback
+
+from common.logger_adaptor import LogAdaptor
+
+
+class SparkHiveMetastore:
+    """
+    hive metadata through the external catalog of SparkSession, calls go to metastore directly, no spark job launched
+    partitions are filtered by metastore with the predicate pushed down, only matched partitions come back
+    """
+
+    # chars escaped in partition dir name, same as ExternalCatalogUtils.charToEscape of spark
+    _ESCAPE_PATTERN = re.compile('[\u0001-\u001f"#%\'*/:=?\\\\\u007f{\\[\\]^]')
+
+    def __init__(self, logger: LogAdaptor, spark):
+        """
+        :param logger:
+        :param spark: active SparkSession with hive support
+        """
+        self._logger = logger
+        self._spark = spark
+        self._jvm = spark._jvm
+        self._catalog = spark._jsparkSession.sharedState().externalCatalog()
+
+        # {'db.table': seconds spent on its partitions}
+        self.timings = {}
+
+    def list_tables(self, db_name) -> list:
+        """
+        :param db_name:
+        :return: [table name]
+        """
+        return self._to_list(self._catalog.listTables(db_name))
+
+    def get_partition_columns(self, db_name, table_names) -> dict:
+        """
+        tables are fetched from metastore in one call
+        :param db_name:
+        :param table_names:
+        :return: {table name: [partition column]}, empty list for table not partitioned
+        """
+        table_names = list(table_names)
+        if not table_names:
+            return {}
+
+        try:
+            j_tables = self._to_list(self._catalog.getTablesByName(db_name, self._to_seq(table_names)))
+        except Exception:
+            # getTablesByName is added in spark 3.0
+            self._logger.warning(f"get tables of {db_name} in batch failed, get one by one: {traceback.format_exc()}")
+            j_tables = [self._catalog.getTable(db_name, table_name) for table_name in table_names]
+
+        return {j_table.identifier().table(): self._to_list(j_table.partitionColumnNames()) for j_table in j_tables}
+
+    def list_partitions(self, db_name, table_name, partition_columns, predicate=None) -> list:
+        """
+        same as `show partitions`, listed by metastore with predicate pushed down
+        :param db_name:
+        :param table_name:
+        :param partition_columns: partition columns of table, in order
+        :param predicate: sql predicate on partition columns, ex: dt < '20210401', default all partitions
+        :return: ['dt=20210401/hour=00', ...]
+        """
+        begin = time.time()
+        predicates = [self._resolve_predicate(db_name, table_name, predicate)] if predicate else []
+        j_partitions = self._catalog.listPartitionsByFilter(db_name,
+                                                            table_name,
+                                                            self._to_seq(predicates),
+                                                            self._spark.conf.get('spark.sql.session.timeZone'))
+
+        partitions = []
+        for j_partition in self._to_list(j_partitions):
+            spec = j_partition.spec()
+            partitions.append('/'.join(f'{self._escape(column)}={self._escape(spec.apply(column))}'
+                                       for column in partition_columns))
+        partitions.sort()
+
+        elapsed = time.time() - begin
+        self.timings[f'{db_name}.{table_name}'] = elapsed
+        self._logger.info(f"list partitions of {db_name}.{table_name} by filter: {predicate}, "
+                          f"{len(partitions)} partitions in {elapsed:.2f}s")
+        return partitions
+
+    def _resolve_predicate(self, db_name, table_name, predicate):
+        """
+        analyze predicate against the table, only metadata is read
+        :return: catalyst Expression with attributes of table
+        """
+        return self._spark.table(f'{db_name}.{table_name}').filter(predicate)\
+            ._jdf.queryExecution().analyzed().condition()
+
+    def _to_seq(self, items):
+        j_list = self._jvm.java.util.ArrayList()
+        for item in items:
+            j_list.add(item)
+        return self._jvm.scala.collection.JavaConverters.asScalaBufferConverter(j_list).asScala().toSeq()
+
+    @staticmethod
+    def _to_list(j_seq) -> list:
+        items = []
+        iterator = j_seq.iterator()
+        while iterator.hasNext():
+            items.append(iterator.next())
+        return items
+
+    @classmethod
+    def _escape(cls, name):
+        return cls._ESCAPE_PATTERN.sub(lambda m: f'%{ord(m.group()):02X}', name)
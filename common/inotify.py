@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: inotify
+:Author: xufeng
+:Date: 2021-08-18 2:20 PM
+:Version: v.1.0
+:Description:
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+from collections import namedtuple
+
+# wd: watch descriptor the event belongs to
+# mask: event mask
+# cookie: relate IN_MOVED_FROM and IN_MOVED_TO
+# name: entry name in watched directory, empty for the watched path itself
+InotifyEvent = namedtuple("InotifyEvent", ['wd', 'mask', 'cookie', 'name'])
+
+
+class Inotify:
+    """
+    minimal linux inotify binding on ctypes
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+
+    IN_ONLYDIR = 0x01000000
+    IN_DONTFOLLOW = 0x02000000
+    IN_ISDIR = 0x40000000
+
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+
+    EVENT_HEADER = struct.Struct('iIII')
+    READ_BUFFER_SIZE = 64 * 1024
+
+    _libc = None
+
+    def __init__(self):
+        libc = self._load_libc()
+        if not libc:
+            raise Exception("inotify is not supported on this platform")
+
+        self._fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify init failed: {os.strerror(errno)}")
+
+    @classmethod
+    def _load_libc(cls):
+        if cls._libc is None:
+            lib_name = ctypes.util.find_library('c')
+            libc = ctypes.CDLL(lib_name, use_errno=True) if lib_name else None
+            cls._libc = libc if libc and hasattr(libc, 'inotify_init1') else False
+        return cls._libc
+
+    @classmethod
+    def is_supported(cls) -> bool:
+        return bool(cls._load_libc())
+
+    def add_watch(self, path, mask) -> int:
+        """
+        :param path:
+        :param mask: events to watch
+        :return: watch descriptor, OSError raised if failed, ex: ENOSPC for max_user_watches reached
+        """
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"inotify add watch failed: {os.strerror(errno)}", path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def read_events(self, timeout=None) -> list:
+        """
+        wait until events ready or timeout
+        :param timeout: seconds, None wait forever
+        :return: [InotifyEvent], empty if timeout
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            buf = os.read(self._fd, self.READ_BUFFER_SIZE)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(buf):
+            wd, mask, cookie, name_len = self.EVENT_HEADER.unpack_from(buf, offset)
+            offset += self.EVENT_HEADER.size
+            name = buf[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+            events.append(InotifyEvent(wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
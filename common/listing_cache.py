@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: listing_cache
+:Author: xufeng
+:Date: 2021-08-23 3:10 PM
+:Version: v.1.0
+:Description:
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+
+class HdfsListingCache:
+    """
+    hdfs listings of one clean run, shared by cleaners, thread safe
+    entry expires after ttl, least recently used entries are evicted when estimated memory exceeds max bytes
+    entries of a path and the paths around it are invalidated when the path is deleted
+    """
+
+    # estimated bytes of one HdfsFileStatus without its path
+    STATUS_BYTES = 120
+
+    def __init__(self, ttl_seconds=300, max_bytes=64 * 1024 * 1024):
+        """
+        :param ttl_seconds: seconds a listing is cached
+        :param max_bytes: max estimated memory of cached listings
+        """
+        if ttl_seconds <= 0:
+            raise Exception(f"listing cache ttl seconds:{ttl_seconds} is invalid!")
+
+        if max_bytes <= 0:
+            raise Exception(f"listing cache max bytes:{max_bytes} is invalid!")
+
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # {(namespace, normalized path): (expire time, estimated bytes, statuses)}
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, namespace, hdfs_path):
+        """
+        :param namespace: listings of different backends are cached separately
+        :param hdfs_path:
+        :return: [HdfsFileStatus], None if not cached or expired
+        """
+        key = (namespace, self.normalize_path(hdfs_path))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] < time.monotonic():
+                self._remove(key)
+                entry = None
+
+            if not entry:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[2])
+
+    def put(self, namespace, hdfs_path, statuses):
+        """
+        :param namespace:
+        :param hdfs_path:
+        :param statuses: [HdfsFileStatus]
+        :return:
+        """
+        key = (namespace, self.normalize_path(hdfs_path))
+        size = sum(self.STATUS_BYTES + len(status.path) for status in statuses) + self.STATUS_BYTES
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, size, list(statuses))
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, hdfs_path):
+        """
+        remove listings of the path, its ancestors, its descendants,
+        and the wildcard paths may match them, in all namespaces
+        :param hdfs_path: deleted path
+        :return:
+        """
+        deleted_path = self._get_literal_prefix(self.normalize_path(hdfs_path))
+        with self._lock:
+            for key in list(self._entries):
+                cached_path = self._get_literal_prefix(key[1])
+                if self._is_prefix(cached_path, deleted_path) or self._is_prefix(deleted_path, cached_path):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    @staticmethod
+    def normalize_path(hdfs_path: str):
+        """
+        hdfs://nameservice1//user/proj/ ==> hdfs://nameservice1/user/proj
+        """
+        parsed = urlparse(hdfs_path)
+        path = re.sub('/+', '/', parsed.path if parsed.scheme else hdfs_path)
+        path = path.rstrip('/') or path
+        return f'{parsed.scheme}://{parsed.netloc}{path}' if parsed.scheme else path
+
+    @staticmethod
+    def _get_literal_prefix(hdfs_path):
+        """
+        path part before the first level has wildcard, scheme and authority removed
+        /user/*/tmp ==> /user
+        """
+        names = []
+        parsed = urlparse(hdfs_path)
+        for name in (parsed.path if parsed.scheme else hdfs_path).split('/'):
+            if any(c in name for c in '*?['):
+                break
+            names.append(name)
+        return '/'.join(names)
+
+    @staticmethod
+    def _is_prefix(parent_path, hdfs_path):
+        return hdfs_path == parent_path or hdfs_path.startswith(parent_path.rstrip('/') + '/')
+
+    def __repr__(self):
+        return f"HdfsListingCache(hits={self.hits}, misses={self.misses}, evictions={self.evictions}, " \
+            f"entries={len(self._entries)}, bytes={self._bytes})"
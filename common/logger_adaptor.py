@@ -8,6 +8,7 @@
 :Version: v.1.0
 :Description:
 """
+import threading
 from logging import Logger
 
 
@@ -35,4 +36,27 @@ class LogAdaptor:
             return
 
         func = getattr(self._logger, func_attr)
-        func(msg)
\ No newline at end of file
+        func(msg)
+
+
+class BufferedLogAdaptor(LogAdaptor):
+    """
+    keep log in memory and write to the wrapped log adaptor together when flush,
+    so the log of one task will not interleave with log of other threads
+    """
+
+    _flush_lock = threading.Lock()
+
+    def __init__(self, log_adaptor: LogAdaptor):
+        super().__init__()
+        self._log_adaptor = log_adaptor
+        self._buffer = []
+
+    def _echo_log(self, msg, func_attr):
+        self._buffer.append((msg, func_attr))
+
+    def flush(self):
+        with self._flush_lock:
+            for msg, func_attr in self._buffer:
+                self._log_adaptor._echo_log(msg, func_attr)
+        self._buffer = []
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: ls_parser
+:Author: xufeng
+:Date: 2021-08-24 10:20 AM
+:Version: v.1.0
+:Description:
+"""
+import time
+
+
+class LsEntry:
+    """
+    one line of `hadoop fs -ls`:
+    drwxr-xr-x   - proj hive          0 2021-07-21 18:29 /user/hive/warehouse/proj.db/tb1
+    replication is None for dir, mtime is epoch seconds of the local time printed
+    """
+    __slots__ = ('permission', 'replication', 'owner', 'group', 'size', 'mtime', 'path')
+
+    def __init__(self, permission, replication, owner, group, size, mtime, path):
+        self.permission = permission
+        self.replication = replication
+        self.owner = owner
+        self.group = group
+        self.size = size
+        self.mtime = mtime
+        self.path = path
+
+    @property
+    def is_dir(self):
+        return self.permission[0] == 'd'
+
+    def __repr__(self):
+        return f"LsEntry({self.permission} {self.replication} {self.owner} {self.group} {self.size} " \
+            f"{self.mtime} {self.path})"
+
+
+# permission, replication, owner, group, size, date, time, path, path may have spaces
+LS_FIELD_COUNT = 8
+
+
+def parse_ls_lines(lines) -> list:
+    """
+    parse `hadoop fs -ls` output, `Found n items` and lines not of a file or dir are skipped
+    time string is parsed once for all lines of the same minute
+    :param lines: output lines without line break
+    :return: [LsEntry]
+    """
+    entries = []
+    append = entries.append
+    mtimes = {}
+    for line in lines:
+        fields = line.split(None, LS_FIELD_COUNT - 1)
+        if len(fields) != LS_FIELD_COUNT or fields[0][0] not in '-dl':
+            continue
+
+        permission, replication, owner, group, size, day, minute, path = fields
+        try:
+            mtime = mtimes.get((day, minute))
+            if mtime is None:
+                mtime = mtimes[(day, minute)] = time.mktime(time.strptime(f'{day} {minute}', '%Y-%m-%d %H:%M'))
+
+            append(LsEntry(permission,
+                           None if replication == '-' else int(replication),
+                           owner,
+                           group,
+                           int(size),
+                           mtime,
+                           path))
+        except ValueError:
+            continue
+    return entries
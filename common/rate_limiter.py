@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: rate_limiter
+:Author: xufeng
+:Date: 2021-08-19 10:20 AM
+:Version: v.1.0
+:Description:
+"""
+import threading
+import time
+
+
+class _TokenBucket:
+    """
+    token bucket refilled at rate per second, burst up to one second of rate
+    token can be borrowed, the borrower waits until the debt is refilled
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = rate
+        self.tokens = rate
+        self.last_time = time.monotonic()
+
+    def reserve(self, amount, now) -> float:
+        """
+        take amount tokens
+        :param amount:
+        :param now: monotonic time
+        :return: seconds to wait before the tokens can be used
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_time) * self.rate)
+        self.last_time = now
+        self.tokens -= amount
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class RateLimiter:
+    """
+    limit delete operations and bytes per second, thread safe, can be shared by cleaners
+    """
+
+    def __init__(self, ops_per_second, bytes_per_second=None, truncate_chunk_bytes=None):
+        """
+        :param ops_per_second: max delete operations per second
+        :param bytes_per_second: max deleted bytes per second, default None not limit
+        :param truncate_chunk_bytes: local file larger than it is truncated chunk by chunk before unlink,
+            every chunk is limited by bytes_per_second, default None unlink directly
+        """
+        if not ops_per_second or ops_per_second <= 0:
+            raise Exception(f"rate limiter ops per second:{ops_per_second} is invalid!")
+
+        if bytes_per_second is not None and bytes_per_second <= 0:
+            raise Exception(f"rate limiter bytes per second:{bytes_per_second} is invalid!")
+
+        if truncate_chunk_bytes is not None and truncate_chunk_bytes <= 0:
+            raise Exception(f"rate limiter truncate chunk bytes:{truncate_chunk_bytes} is invalid!")
+
+        self.ops_per_second = ops_per_second
+        self.bytes_per_second = bytes_per_second
+        self.truncate_chunk_bytes = truncate_chunk_bytes
+
+        self._ops_bucket = _TokenBucket(ops_per_second)
+        self._bytes_bucket = _TokenBucket(bytes_per_second) if bytes_per_second else None
+        self._lock = threading.Lock()
+
+    def acquire(self, ops=1, nbytes=None):
+        """
+        block until the operations and bytes allowed
+        :param ops:
+        :param nbytes: bytes of the operations, None if unknown
+        :return:
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait_seconds = self._ops_bucket.reserve(ops, now) if ops else 0
+            if self._bytes_bucket and nbytes:
+                wait_seconds = max(wait_seconds, self._bytes_bucket.reserve(nbytes, now))
+
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+    def __repr__(self):
+        return f"RateLimiter(ops_per_second={self.ops_per_second}, bytes_per_second={self.bytes_per_second}, " \
+            f"truncate_chunk_bytes={self.truncate_chunk_bytes})"
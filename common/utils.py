@@ -7,6 +7,7 @@
 :Version: v.1.0
 :Description:
 """
+import re
 import subprocess
 import tempfile
 import traceback
@@ -18,6 +19,20 @@ from common.logger_adaptor import LogAdaptor
 
 ExpireTimeDesc = namedtuple("ExpireTimeDesc", ['year', 'month', 'day'])
 
+# max_bytes: max total bytes of files can be deleted under path
+# min_free_percent: min free space percent of the file system which path on
+# None means not limit, if both set, delete until both satisfied
+DiskBudgetDesc = namedtuple("DiskBudgetDesc", ['max_bytes', 'min_free_percent'])
+
+# quota_dir: hdfs dir has space quota, usually the project dir
+# target_ratio: after clean, space consumed / space quota of quota dir should be below it, ex: 0.8
+HdfsQuotaDesc = namedtuple("HdfsQuotaDesc", ['quota_dir', 'target_ratio'])
+
+# after: ExpireTimeDesc, paths not updated since it and not expired yet are tiered
+# replication: lower replication of files under path, ex: 2, None not change
+# storage_policy: hdfs storage policy of path, ex: COLD, None not change, blocks are moved by `hdfs mover`
+HdfsTieringDesc = namedtuple("HdfsTieringDesc", ['after', 'replication', 'storage_policy'])
+
 
 class DateUtil:
 
@@ -29,6 +44,10 @@ class DateUtil:
     def str_2_datetime(time_str, fmt='%Y-%m-%d'):
         return datetime.strptime(time_str, fmt)
 
+    @staticmethod
+    def str_2_timestamp(time_str, fmt='%Y-%m-%d'):
+        return datetime.strptime(time_str, fmt).timestamp() if time_str else None
+
     @staticmethod
     def get_expire_time(expire_time: ExpireTimeDesc):
         years = expire_time.year
@@ -37,6 +56,25 @@ class DateUtil:
         ret_time = datetime.now() + relativedelta(years=-years, months=-months, days=-days)
         return ret_time
 
+    @staticmethod
+    def get_day_begin_timestamp(day_time: datetime):
+        return datetime.combine(day_time.date(), datetime.min.time()).timestamp()
+
+    @staticmethod
+    def get_expire_at_timestamp(update_timestamp, expire_time: ExpireTimeDesc):
+        """
+        the time data updated at update timestamp become expired,
+        data updated before the day of get_expire_time is expired
+        :param update_timestamp:
+        :param expire_time:
+        :return:
+        """
+        update_day = datetime.combine(datetime.fromtimestamp(update_timestamp).date(), datetime.min.time())
+        expire_at = update_day + relativedelta(years=expire_time.year,
+                                               months=expire_time.month,
+                                               days=expire_time.day + 1)
+        return expire_at.timestamp()
+
     @staticmethod
     def compare_date(update_time: datetime, expire_time: datetime):
         return update_time.date() >= expire_time.date()
@@ -53,6 +91,21 @@ class ShellUtil:
         :param logger:
         :return:
         """
+        return_code, out_lines = ShellUtil.exec_shell_with_return_code(shell_cmd, logger)
+        if return_code == 0:
+            return out_lines
+
+        error_msg = '\n'.join(out_lines)
+        raise Exception(f"command: [{shell_cmd}], execute failed: {error_msg}")
+
+    @staticmethod
+    def exec_shell_with_return_code(shell_cmd: str, logger: LogAdaptor) -> (int, list):
+        """
+        execute shell script and get the return code and output, error will not raise if execute failed
+        :param shell_cmd:
+        :param logger:
+        :return: (return code, output lines of stdout and stderr)
+        """
         logger.info(f"shell command is: {shell_cmd}")
         out_temp = tempfile.SpooledTemporaryFile()
         file_no = out_temp.fileno()
@@ -64,12 +117,7 @@ class ShellUtil:
 
             out_temp.seek(0)
             out_lines = [line.decode('unicode-escape').strip() for line in out_temp.readlines()]
-
-            if p.returncode == 0:
-                return out_lines
-
-            error_msg = '\n'.join(out_lines)
-            raise Exception(f"command: [{shell_cmd}], execute failed: {error_msg}")
+            return p.returncode, out_lines
         finally:
             if out_temp:
                 out_temp.close()
@@ -99,3 +147,38 @@ class ShellUtil:
         :return:
         """
         ShellUtil.exec_shell_with_status(shell_cmd, logger)
+
+
+class HdfsUtil:
+
+    # hadoop 2.7+: size disk_space_consumed path, older: size path
+    DU_LINE_PATTERN = re.compile(r'^(\d+)\s+(?:\d+\s+)?(\S.*)$')
+
+    @staticmethod
+    def du(hdfs_path: str, logger: LogAdaptor, summarize=False) -> dict:
+        """
+        get bytes of paths with one `hadoop fs -du` call
+        without summarize, return bytes of every child of hdfs path
+        with summarize, return total bytes of every path hdfs path matched, hdfs path can have wildcard
+        :param hdfs_path:
+        :param logger:
+        :param summarize:
+        :return: {path: bytes}, empty if du failed
+        """
+        shell_cmd = f"hadoop fs -du {'-s ' if summarize else ''}{hdfs_path}"
+        try:
+            lines = ShellUtil.exec_shell_with_result(shell_cmd, logger)
+        except Exception:
+            logger.warning(f"du hdfs path: {hdfs_path} failed: {traceback.format_exc()}")
+            return {}
+
+        sizes = {}
+        for line in lines:
+            match = HdfsUtil.DU_LINE_PATTERN.match(line.strip())
+            if match:
+                sizes[HdfsUtil.normalize_path(match.group(2))] = int(match.group(1))
+        return sizes
+
+    @staticmethod
+    def normalize_path(hdfs_path: str):
+        return hdfs_path.rstrip('/') or hdfs_path
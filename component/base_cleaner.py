@@ -9,21 +9,163 @@
 :Description:
 """
 import abc
+import threading
+import warnings
+
+
+class CleanCandidate:
+    """
+    one target will be cleaned by cleaner
+    target: file path, hdfs path, table name etc.
+    kind: one of the KIND_* below
+    timestamp: update time of target in epoch seconds, None if not checked
+    size: bytes of target, None if unknown
+    root: the configured path, table or namespace target belongs to
+    """
+    __slots__ = ('target', 'kind', 'timestamp', 'size', 'root')
+
+    KIND_FILE = 'file'
+    KIND_DIR = 'dir'
+    KIND_HDFS_PATH = 'hdfs_path'
+    KIND_HIVE_TABLE = 'hive_table'
+    KIND_HIVE_PARTITION = 'hive_partition'
+    KIND_HBASE_TABLE = 'hbase_table'
+
+    def __init__(self, target, kind, timestamp=None, size=None, root=None):
+        self.target = target
+        self.kind = kind
+        self.timestamp = timestamp
+        self.size = size
+        self.root = root
+
+    def __repr__(self):
+        return f"CleanCandidate({self.kind}: {self.target}, timestamp={self.timestamp}, size={self.size})"
+
+
+class CleanSummary:
+    """
+    count and bytes of targets cleaned by cleaner, grouped by root
+    in test clean, it is what clean will free
+    """
+
+    def __init__(self, cleaner):
+        self.cleaner = cleaner
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def add(self, root, size=None):
+        with self._lock:
+            group = self._groups.setdefault(root, [0, 0])
+            group[0] += 1
+            group[1] += size or 0
+
+    def merge(self, other):
+        for root, (count, size) in other.groups.items():
+            with self._lock:
+                group = self._groups.setdefault(root, [0, 0])
+                group[0] += count
+                group[1] += size
+
+    @property
+    def groups(self) -> dict:
+        """
+        :return: {root: (count, bytes)}
+        """
+        with self._lock:
+            return {root: tuple(group) for root, group in self._groups.items()}
+
+    @property
+    def count(self):
+        return sum(count for count, _ in self.groups.values())
+
+    @property
+    def bytes(self):
+        return sum(size for _, size in self.groups.values())
+
+    @staticmethod
+    def format_bytes(size):
+        for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+            if size < 1024 or unit == 'TB':
+                return f"{size:.1f}{unit}" if unit != 'B' else f"{size}B"
+            size /= 1024
+
+    def __repr__(self):
+        lines = [f"{self.cleaner} clean {self.count} targets, {self.format_bytes(self.bytes)}"]
+        for root, (count, size) in self.groups.items():
+            lines.append(f"    {root}: {count} targets, {self.format_bytes(size)}")
+        return '\n'.join(lines)
 
 
 class BaseCleaner(metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
-    def clean(self):
+    def clean(self) -> CleanSummary:
+        """
+        clean and return the summary of cleaned targets
+        :return:
+        """
+        raise NotImplementedError
+
+    def iter_candidates(self):
+        """
+        lazily yield CleanCandidate of everything clean will delete, nothing is deleted
+        candidates are yielded as listing goes on
+        :return:
+        """
         raise NotImplementedError
 
-    def test_clean(self):
+    def test_clean(self) -> CleanSummary:
         self.test = True
-        self.clean()
+        return self.clean()
+
+    def close(self):
+        """
+        release connections held by the cleaner, they are opened again if the cleaner is used after
+        :return:
+        """
+        pass
+
+    @staticmethod
+    def _warn_deprecated_param(name, value):
+        """
+        warn the caller of cleaner that a deprecated param is set, the param is ignored
+        :param name:
+        :param value:
+        :return:
+        """
+        if value is not None:
+            warnings.warn(f"{name} is deprecated and ignored", DeprecationWarning, stacklevel=3)
 
     def set_action_log_prefix(self, prefix: str = '====='):
         self.action_prefix = prefix
 
+    def set_rate_limiter(self, rate_limiter):
+        """
+        :param rate_limiter: RateLimiter shared by cleaners, delete is blocked by it
+        :return:
+        """
+        self.rate_limiter = rate_limiter
+
+    def _acquire_rate_limit(self, ops=1, nbytes=None):
+        if self.rate_limiter:
+            self.rate_limiter.acquire(ops, nbytes)
+
+    def set_listing_cache(self, listing_cache):
+        """
+        :param listing_cache: HdfsListingCache shared by cleaners of one run, hdfs cleaners list through it
+        :return:
+        """
+        self.listing_cache = listing_cache
+
+    def _invalidate_listing(self, hdfs_path):
+        """
+        invalidate cached listings around the hdfs path removed not by hdfs fs, such as drop table
+        :param hdfs_path:
+        :return:
+        """
+        if self.listing_cache:
+            self.listing_cache.invalidate(hdfs_path)
+
     @property
     def description(self) -> str:
         raise NotImplementedError
@@ -48,5 +190,25 @@ class BaseCleaner(metaclass=abc.ABCMeta):
     def action_prefix(self, prefix='====='):
         setattr(self, '_action_prefix', prefix)
 
+    @property
+    def rate_limiter(self):
+        if hasattr(self, '_rate_limiter'):
+            return self._rate_limiter
+        return None
+
+    @rate_limiter.setter
+    def rate_limiter(self, rate_limiter=None):
+        setattr(self, '_rate_limiter', rate_limiter)
+
+    @property
+    def listing_cache(self):
+        if hasattr(self, '_listing_cache'):
+            return self._listing_cache
+        return None
+
+    @listing_cache.setter
+    def listing_cache(self, listing_cache=None):
+        setattr(self, '_listing_cache', listing_cache)
+
     def __repr__(self):
         return self.description
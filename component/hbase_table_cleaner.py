@@ -11,8 +11,9 @@ import os
 import re
 import traceback
 
-from component.base_cleaner import BaseCleaner
+from component.base_cleaner import BaseCleaner, CleanCandidate, CleanSummary
 from common.utils import ExpireTimeDesc, DateUtil, ShellUtil
+from common.hdfs_fs import ShellHdfsFileSystem, SparkHdfsFileSystem, CachedHdfsFileSystem
 from common.logger_adaptor import LogAdaptor
 
 
@@ -27,8 +28,10 @@ class HbaseTableCleaner(BaseCleaner):
                  clear_tables=None,
                  drop_table: bool = False,
                  ignore_update_time: bool = False,
-                 hdfs_day_time_pattern=r'\d{4}-\d{2}-\d{2}',
-                 expire_time: ExpireTimeDesc = None):
+                 hdfs_day_time_pattern=None,
+                 expire_time: ExpireTimeDesc = None,
+                 report_size=True,
+                 spark=None):
         """
         hbase table cleaner
         :param logger:
@@ -42,20 +45,27 @@ class HbaseTableCleaner(BaseCleaner):
             ['tb*'] or 'tb*' will delete the table begin with tb
         :param drop_table: if set true, will execute `drop namespace:table_name`
         :param ignore_update_time: if set true, clear will not check update time
-        :param hdfs_day_time_pattern:
+        :param hdfs_day_time_pattern: deprecated, ignored with a DeprecationWarning if set,
+            ls line is split into fixed fields, update time is the day and minute in it
         :param expire_time: default four month
+        :param report_size: get bytes of expired tables with one `hadoop fs -du` of namespace dir
+        :param spark: active SparkSession, if set, list namespace dir with hadoop FileSystem in its jvm
+            instead of `hadoop fs` command
         """
+        self._warn_deprecated_param('hdfs_day_time_pattern', hdfs_day_time_pattern)
         self._logger = logger
         self._hbase_namespace = hbase_namespace
         self._hbase_data_dir = hbase_data_dir
         self._clear_tables = clear_tables
         self._drop_table = drop_table
         self._ignore_update_time = ignore_update_time
-        self._hdfs_day_time_pattern = hdfs_day_time_pattern
         self._expire_time = expire_time
+        self._report_size = report_size
+        self._hdfs_fs = SparkHdfsFileSystem(logger, spark) if spark else ShellHdfsFileSystem(logger)
 
         self._namespace_tables = None
         self._table_hdfs_update_time = None
+        self._table_sizes = None
 
     def _check_and_update_param(self):
 
@@ -75,26 +85,46 @@ class HbaseTableCleaner(BaseCleaner):
     def description(self) -> str:
         return "hbase table cleaner"
 
-    def clean(self):
+    def set_listing_cache(self, listing_cache):
+        super().set_listing_cache(listing_cache)
+        self._hdfs_fs = CachedHdfsFileSystem.wrap(self._hdfs_fs, listing_cache)
+
+    def clean(self) -> CleanSummary:
+        summary = CleanSummary(self)
+        try:
+            for candidate in self.iter_candidates():
+                if self._exec_del(candidate.target):
+                    summary.add(candidate.root, candidate.size)
+
+            self._logger.info(f"{self.action_prefix}{summary}")
+            return summary
+        finally:
+            self.close()
+
+    def close(self):
+        self._hdfs_fs.close()
+
+    def iter_candidates(self):
         self._check_and_update_param()
+        self._table_sizes = None
         self._get_all_table_in_namespace()
         self._get_table_update_time_on_hdfs()
 
         if '*' in self._clear_tables:
             self._logger.info(f"{self} handle all table in namespace: {self._hbase_namespace}")
-            self._handle_all_table()
+            yield from self._iter_all_table_candidates()
             return
 
         for table_name in self._clear_tables:
             if '*' in table_name:
-                self._handle_wildcard_table(table_name)
+                yield from self._iter_wildcard_table_candidates(table_name)
                 continue
 
             if table_name not in self._namespace_tables:
                 self._logger.warning(f"{self} found table {table_name} not in namespace!")
                 continue
 
-            self._handle_single_table(table_name)
+            yield from self._iter_single_table_candidates(table_name)
 
     def _get_all_table_in_namespace(self):
         lines = self._exec_hbase_shell('list')
@@ -114,44 +144,43 @@ class HbaseTableCleaner(BaseCleaner):
         if self._ignore_update_time:
             return
 
-        namespace_dir = os.path.join(self._hbase_data_dir, self._hbase_namespace)
-        if namespace_dir[-1] != '/':
-            namespace_dir = f'{namespace_dir}/'
-        shell_cmd = f"hadoop fs -ls {namespace_dir}"
+        namespace_dir = self._get_namespace_dir()
         try:
-            ls_lines = ShellUtil.exec_shell_with_result(shell_cmd, self._logger)
-            info = {}
-            for line in ls_lines:
-                if namespace_dir in line:
-                    update_date_time, _ = self._get_ls_time_and_path(line)
-                    table_name = line.strip().split(namespace_dir)[-1]
-                    info[table_name] = update_date_time
-            self._table_hdfs_update_time = info
+            statuses = self._hdfs_fs.list_status(namespace_dir)
+            self._table_hdfs_update_time = {
+                os.path.basename(status.path.rstrip('/')): status.modification_time for status in statuses}
             self._logger.info(
                 f"{self} namespace: {self._hbase_namespace}, table update time is:{self._table_hdfs_update_time}")
         except Exception:
             self._logger.error(f"{self} ls warehouse dir error:{traceback.format_exc()}")
             raise
 
-    def _get_ls_time_and_path(self, dfs_ls_line):
+    def _get_namespace_dir(self):
+        namespace_dir = os.path.join(self._hbase_data_dir, self._hbase_namespace)
+        if namespace_dir[-1] != '/':
+            namespace_dir = f'{namespace_dir}/'
+        return namespace_dir
+
+    def _get_table_size(self, table_name):
         """
-        drwxr-xr-x   - proj hive          0 2021-07-21 18:29 /user/hive/warehouse/proj.db/tb1
-        will return: 2021-07-21, /user/hive/warehouse/proj.db/tb1
-        :param dfs_ls_line:
-        :return:
+        bytes of table data dir, du namespace dir only once for all tables
+        :param table_name:
+        :return: None if not report size or size not found
         """
-        time_pattern = re.search(self._hdfs_day_time_pattern, dfs_ls_line)
-        time_str = '' if not time_pattern else time_pattern.group(0)
-        hdfs_path = '' if not time_str else dfs_ls_line.strip().split(' ')[-1]
+        if not self._report_size:
+            return None
 
-        self._logger.debug(f"ls line is: {dfs_ls_line}, ret is:{time_str}, {hdfs_path}")
-        return time_str, hdfs_path
+        namespace_dir = self._get_namespace_dir()
+        if self._table_sizes is None:
+            self._table_sizes = {os.path.basename(path): size
+                                 for path, size in self._hdfs_fs.du(namespace_dir).items()}
+        return self._table_sizes.get(table_name)
 
-    def _handle_all_table(self):
+    def _iter_all_table_candidates(self):
         for table in self._namespace_tables:
-            self._handle_single_table(table)
+            yield from self._iter_single_table_candidates(table)
 
-    def _handle_wildcard_table(self, wildcard_table_name):
+    def _iter_wildcard_table_candidates(self, wildcard_table_name):
         reg = wildcard_table_name.replace('*', r'[\w]*?')
         self._logger.info(f"{self}: {wildcard_table_name} reg is:{reg}")
 
@@ -164,14 +193,19 @@ class HbaseTableCleaner(BaseCleaner):
         self._logger.info(f"{self}: {wildcard_table_name} found table:{tables}")
 
         for table_name in tables:
-            self._handle_single_table(table_name)
+            yield from self._iter_single_table_candidates(table_name)
 
-    def _handle_single_table(self, table_name):
+    def _iter_single_table_candidates(self, table_name):
         if not self._is_expire(table_name):
             self._logger.info(f"{self} table: {table_name} not expire, do nothing")
             return
 
-        self._exec_del(table_name)
+        update_timestamp = self._table_hdfs_update_time.get(table_name) if self._table_hdfs_update_time else None
+        yield CleanCandidate(table_name,
+                             CleanCandidate.KIND_HBASE_TABLE,
+                             update_timestamp,
+                             self._get_table_size(table_name),
+                             self._hbase_namespace)
 
     def _is_expire(self, table_name):
         if self._ignore_update_time:
@@ -180,16 +214,13 @@ class HbaseTableCleaner(BaseCleaner):
         if not self._expire_time:
             return True
 
-        update_time_str = self._table_hdfs_update_time.get(table_name, None)
-        if not update_time_str:
+        update_timestamp = self._table_hdfs_update_time.get(table_name, None)
+        if update_timestamp is None:
             self._logger.warning(f"{self} hbase table:{table_name}, not found update time")
             return False
 
-        update_time = DateUtil.str_2_datetime(update_time_str)
-        expire_time = self._get_expire_time()
-        if DateUtil.compare_date(update_time, expire_time):
-            return False
-        return True
+        # same as DateUtil.compare_date, table updated before the expire day is expired
+        return update_timestamp < self._get_expire_timestamp()
 
     def _get_expire_time(self):
         if not hasattr(self, 'expire_time'):
@@ -197,6 +228,12 @@ class HbaseTableCleaner(BaseCleaner):
             setattr(self, 'expire_time', expire_time)
         return getattr(self, 'expire_time')
 
+    def _get_expire_timestamp(self):
+        if not hasattr(self, 'expire_timestamp'):
+            expire_timestamp = DateUtil.get_day_begin_timestamp(self._get_expire_time())
+            setattr(self, 'expire_timestamp', expire_timestamp)
+        return getattr(self, 'expire_timestamp')
+
     def _exec_hbase_shell(self, shell_commands):
         """
         execute hbase shell command, if error happened, exception will raise directly
@@ -236,6 +273,7 @@ class HbaseTableCleaner(BaseCleaner):
 
     def _exec_del_test(self, table_name):
         self._logger.info(f"{self.action_prefix}{self} test clear table: {table_name}, drop table:{self._drop_table}")
+        return True
 
     def _real_exec_del(self, table_name):
         name_space_table = f'{self._hbase_namespace}:{table_name}'
@@ -245,8 +283,12 @@ class HbaseTableCleaner(BaseCleaner):
 
         try:
             self._exec_hbase_shell(commands)
+            if self._drop_table:
+                self._invalidate_listing(os.path.join(self._get_namespace_dir(), table_name))
             self._logger.info(f"{self.action_prefix}{self} clear table:{name_space_table} success")
+            return True
         except Exception:
             self._logger.error(f"{self.action_prefix}{self} clear "
                                f"table:{name_space_table} failed:{traceback.format_exc()}")
+            return False
 
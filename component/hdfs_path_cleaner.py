@@ -7,11 +7,16 @@
 :Version: v.1.0
 :Description:
 """
-import re
+import posixpath
 import traceback
-
-from component.base_cleaner import BaseCleaner
-from common.utils import ExpireTimeDesc, DateUtil, ShellUtil
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from component.base_cleaner import BaseCleaner, CleanCandidate, CleanSummary
+from common.utils import ExpireTimeDesc, DateUtil, HdfsUtil, HdfsQuotaDesc, HdfsTieringDesc
+from common.hdfs_fs import HdfsFileSystem, ShellHdfsFileSystem, SparkHdfsFileSystem, CachedHdfsFileSystem
+from common.fsimage import FsImageHdfsFileSystem
+from common.dir_index import DirMtimeIndex, DirIndexRecord
 from common.logger_adaptor import LogAdaptor
 
 
@@ -25,8 +30,16 @@ class HDFSPathCleaner(BaseCleaner):
                  hdfs_paths,
                  skip_trash=False,
                  ignore_update_time=False,
-                 hdfs_day_time_pattern=r'\d{4}-\d{2}-\d{2}',
-                 expire_time: ExpireTimeDesc = None):
+                 hdfs_day_time_pattern=None,
+                 expire_time: ExpireTimeDesc = None,
+                 report_size=True,
+                 hdfs_fs: HdfsFileSystem = None,
+                 spark=None,
+                 max_workers=1,
+                 fsimage_path=None,
+                 quota: HdfsQuotaDesc = None,
+                 tiering: HdfsTieringDesc = None,
+                 tiering_index_path=None):
         """
         delete hdfs path util
         :param logger:
@@ -34,16 +47,47 @@ class HDFSPathCleaner(BaseCleaner):
             if '*' in path, will first use `hadoop fs -ls ...` to list all paths
         :param skip_trash: skip trash flag to remove hadoop file
         :param ignore_update_time: if set true, will delete hadoop files with out check update time
-        :param hdfs_day_time_pattern: the day time pattern in hdfs ls line
-            ex: drwxr-xr-x   - proj hive          0 2021-07-21 18:29 /user/hive/warehouse/proj.db/tb1 => 2021-07-21
+        :param hdfs_day_time_pattern: deprecated, ignored with a DeprecationWarning if set,
+            ls line is split into fixed fields, update time is the day and minute in it
         :param expire_time: if ignore_update_time set true, this param will ignored, default 4 month
+        :param report_size: get bytes of expired paths with one `hadoop fs -du` per parent path
+        :param hdfs_fs: backend to list and delete hdfs path, default ShellHdfsFileSystem execute `hadoop fs`
+            WebHdfsFileSystem talks to namenode with WebHDFS, update time is exact instead of day in ls line
+        :param spark: active SparkSession, if set and hdfs_fs not set, use hadoop FileSystem in its jvm
+        :param max_workers: max concurrent ls, du and delete commands, limit the load on namenode,
+            default 1 run in sequence, results are merged in order of paths
+        :param fsimage_path: file of `hdfs oiv -p Delimited` export, if set, paths are listed and sized offline
+            from it without rpc to namenode, only delete is executed by hdfs_fs
+        :param quota: after expired paths, delete the oldest not expired paths until space consumed of quota dir
+            below target ratio of its space quota, ex: HdfsQuotaDesc('/user/proj', 0.8), sizes are always reported
+        :param tiering: after deleted, lower replication or set storage policy of the paths left which not updated
+            since tiering after, ex: HdfsTieringDesc(ExpireTimeDesc(0, 1, 0), 2, 'COLD')
+        :param tiering_index_path: sqlite file to keep update time of tiered paths between runs,
+            path not updated since tiered is skipped, default every aging path is tiered again in every run
         """
+        self._warn_deprecated_param('hdfs_day_time_pattern', hdfs_day_time_pattern)
         self._logger = logger
         self._hdfs_paths = hdfs_paths
         self._skip_trash = skip_trash
         self._ignore_update_time = ignore_update_time
-        self._hdfs_day_time_pattern = hdfs_day_time_pattern
         self._expire_time = expire_time if expire_time else self.DEFAULT_EXPIRE_TIME
+        self._report_size = report_size
+        if not hdfs_fs:
+            hdfs_fs = SparkHdfsFileSystem(logger, spark) if spark else ShellHdfsFileSystem(logger)
+        if fsimage_path:
+            hdfs_fs = FsImageHdfsFileSystem(logger, fsimage_path, hdfs_fs, hdfs_paths)
+        self._hdfs_fs = hdfs_fs
+        self._max_workers = max_workers
+        self._quota = quota
+        self._tiering = tiering
+        self._tiering_index_path = tiering_index_path
+
+        self._du_sizes = {}
+        self._parent_children = {}
+        self._listings = {}
+        # (du path, candidate) of listed paths not expired, for quota and tiering
+        self._remain_candidates = []
+        self._quota_targets = set()
 
     def _check_and_update_param(self):
         if isinstance(self._hdfs_paths, str):
@@ -52,12 +96,75 @@ class HDFSPathCleaner(BaseCleaner):
         if not self._hdfs_paths:
             raise Exception(f"{self}: hdfs path:{self._hdfs_paths} is empty!")
 
+        if not self._max_workers or self._max_workers < 1:
+            raise Exception(f"{self}: max workers:{self._max_workers} is invalid!")
+
+        if self._quota:
+            if not self._quota.quota_dir or not 0 < self._quota.target_ratio < 1:
+                raise Exception(f"{self}: quota:{self._quota} is invalid!")
+
+            # candidates are chosen by size until enough space freed
+            self._report_size = True
+            if not self._skip_trash:
+                self._logger.warning(f"{self}: deleted paths are moved to trash, "
+                                     f"space of quota dir is not freed if trash is under it")
+
+        if self._tiering:
+            after, replication, storage_policy = self._tiering
+            if not after or (not replication and not storage_policy) or (replication and replication < 1):
+                raise Exception(f"{self}: tiering:{self._tiering} is invalid!")
+
     @property
     def description(self) -> str:
         return "hdfs path cleaner"
 
-    def clean(self):
+    def set_listing_cache(self, listing_cache):
+        super().set_listing_cache(listing_cache)
+        self._hdfs_fs = CachedHdfsFileSystem.wrap(self._hdfs_fs, listing_cache)
+
+    def clean(self) -> CleanSummary:
+        summary = CleanSummary(self)
+        try:
+            if self.test:
+                for candidate in self.iter_candidates():
+                    if self._exec_del_test(candidate.target):
+                        summary.add(candidate.root, candidate.size)
+            else:
+                self._real_exec_del(self.iter_candidates(), summary)
+
+            self._logger.info(f"{self.action_prefix}{summary}")
+
+            if self._tiering:
+                self._exec_tiering(self._get_tiering_paths())
+            return summary
+        finally:
+            self.close()
+
+    def close(self):
+        self._hdfs_fs.close()
+
+    def iter_candidates(self):
         self._check_and_update_param()
+        self._du_sizes = {}
+        self._parent_children = {}
+        self._listings = {}
+        self._remain_candidates = []
+        self._quota_targets = set()
+
+        # read before any expired path deleted, test clean and clean see the same usage
+        need_free_bytes = self._get_quota_need_free_bytes() if self._quota else 0
+
+        expired_bytes = 0
+        for candidate in self._iter_expire_candidates():
+            expired_bytes += candidate.size or 0
+            yield candidate
+
+        if self._quota:
+            yield from self._iter_quota_candidates(need_free_bytes - expired_bytes)
+
+    def _iter_expire_candidates(self):
+        if self._max_workers > 1:
+            self._prefetch_listings()
 
         for hdfs_path in self._hdfs_paths:
 
@@ -66,30 +173,68 @@ class HDFSPathCleaner(BaseCleaner):
                 continue
 
             if '*' in hdfs_path:
-                self._handle_wildcard_character_path(hdfs_path)
+                yield from self._iter_wildcard_character_path_candidates(hdfs_path)
                 continue
 
-            self._handle_common_path(hdfs_path)
+            yield from self._iter_common_path_candidates(hdfs_path)
+
+    def _prefetch_listings(self):
+        """
+        ls and du the parent paths and wildcard paths with thread pool before candidates are checked in order
+        :return:
+        """
+        ls_paths = list(dict.fromkeys(hdfs_path if '*' in hdfs_path else self._get_parent_path(hdfs_path)
+                                      for hdfs_path in self._hdfs_paths if hdfs_path))
+
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            self._listings = dict(zip(ls_paths, executor.map(self._ls_hdfs_path, ls_paths)))
+            if self._report_size:
+                du_sizes = executor.map(self._hdfs_fs.du, ls_paths)
+                self._du_sizes = {(ls_path, False): sizes for ls_path, sizes in zip(ls_paths, du_sizes)}
 
-    def _handle_common_path(self, hdfs_path):
+    def _iter_common_path_candidates(self, hdfs_path):
         """
-        check common path update time and execute delete
+        check common path update time and yield it if expired
         :param hdfs_path:
         :return:
         """
         parent_path = self._get_parent_path(hdfs_path)
 
-        hdfs_path_lines = self._ls_hdfs_path(parent_path)
-        for path_line in hdfs_path_lines:
-            time_str, tmp_path = self._get_ls_time_and_path(path_line)
-            if tmp_path and (tmp_path in hdfs_path or hdfs_path in tmp_path):
-                if self._is_expire(time_str):
-                    self._exec_del(hdfs_path)
-                return
+        children = self._get_children(parent_path)
+        status = children.get(self._get_name(hdfs_path))
+        if not status:
+            self._logger.warning(f"{self}: {hdfs_path} not found in parent path:{parent_path}")
+            return
 
-        self._logger.warning(f"{self}: {hdfs_path} not found suitable path:{hdfs_path_lines}")
+        if self._is_expire(status.modification_time):
+            yield CleanCandidate(hdfs_path,
+                                 CleanCandidate.KIND_HDFS_PATH,
+                                 status.modification_time,
+                                 self._get_size(parent_path, hdfs_path),
+                                 hdfs_path)
+        elif self._quota or self._tiering:
+            self._remain_candidates.append((parent_path, CleanCandidate(
+                hdfs_path, CleanCandidate.KIND_HDFS_PATH, status.modification_time, None, hdfs_path)))
+
+    def _get_children(self, parent_path):
+        """
+        ls parent path only once for all configured paths under it
+        :param parent_path:
+        :return: {name: HdfsFileStatus} of children
+        """
+        if parent_path not in self._parent_children:
+            self._parent_children[parent_path] = {
+                self._get_name(status.path): status for status in self._ls_hdfs_path(parent_path)}
+        return self._parent_children[parent_path]
+
+    @staticmethod
+    def _get_name(hdfs_path):
+        """
+        last name of path, children are matched by name, ls may print path with or without scheme
+        """
+        return posixpath.basename(HdfsUtil.normalize_path(hdfs_path))
 
-    def _handle_wildcard_character_path(self, hdfs_path):
+    def _iter_wildcard_character_path_candidates(self, hdfs_path):
         """
         if hdfs path has wildcard character, will find all real path first
         ex: /user/your_project/*/tmp/ will fist use
@@ -97,16 +242,186 @@ class HDFSPathCleaner(BaseCleaner):
         :param hdfs_path:
         :return:
         """
-        hdfs_path_lines = self._ls_hdfs_path(hdfs_path)
+        statuses = self._ls_hdfs_path(hdfs_path)
 
-        if not hdfs_path_lines:
+        if not statuses:
             self._logger.warning(f"hdfs path: {hdfs_path} get null on hdfs!")
             return
 
-        for path_line in hdfs_path_lines:
-            time_str, tmp_path = self._get_ls_time_and_path(path_line)
-            if tmp_path and self._is_expire(time_str):
-                    self._exec_del(tmp_path)
+        for status in statuses:
+            if self._is_expire(status.modification_time):
+                yield CleanCandidate(status.path,
+                                     CleanCandidate.KIND_HDFS_PATH,
+                                     status.modification_time,
+                                     self._get_size(hdfs_path, status.path),
+                                     hdfs_path)
+            elif self._quota or self._tiering:
+                self._remain_candidates.append((hdfs_path, CleanCandidate(
+                    status.path, CleanCandidate.KIND_HDFS_PATH, status.modification_time, None, hdfs_path)))
+
+    def _get_quota_need_free_bytes(self):
+        """
+        `hadoop fs -count -q` of quota dir, space consumed counts replicas, convert it to bytes of files like du
+        :return: bytes of files need to free, not positive if under target ratio
+        """
+        quota_dir, target_ratio = self._quota
+        try:
+            space_quota, space_consumed, length = self._hdfs_fs.get_space_quota(quota_dir)
+        except Exception:
+            self._logger.error(f"{self} get space quota of {quota_dir} failed: {traceback.format_exc()}")
+            return 0
+
+        if not space_quota:
+            self._logger.warning(f"{self} quota dir: {quota_dir} has no space quota")
+            return 0
+
+        need_free_space = space_consumed - space_quota * target_ratio
+        self._logger.info(f"{self} quota dir: {quota_dir} consumed {space_consumed} of space quota {space_quota}, "
+                          f"need free {max(need_free_space, 0)} for target ratio {target_ratio}")
+        return need_free_space * length / space_consumed if space_consumed else 0
+
+    def _iter_quota_candidates(self, need_free_bytes):
+        """
+        yield the oldest not expired paths until the quota need freed, sizes of them are get by du of their parents
+        :param need_free_bytes: bytes still need to free after expired paths deleted
+        :return:
+        """
+        if need_free_bytes <= 0:
+            self._logger.info(f"{self} quota dir: {self._quota.quota_dir} is under target ratio after expire")
+            return
+
+        freed_bytes = 0
+        for du_path, candidate in sorted(self._remain_candidates, key=lambda it: it[1].timestamp):
+            if freed_bytes >= need_free_bytes:
+                break
+            # path out of quota dir frees nothing of the quota
+            if not self._is_under_quota_dir(candidate.target):
+                continue
+            candidate.size = self._get_size(du_path, candidate.target)
+            freed_bytes += candidate.size or 0
+            self._quota_targets.add(candidate.target)
+            yield candidate
+
+        if freed_bytes < need_free_bytes:
+            self._logger.warning(f"{self} all paths only {freed_bytes} bytes, quota target can not be satisfied")
+
+    def _is_under_quota_dir(self, hdfs_path):
+        """
+        compared without scheme and authority, relative path only matches relative quota dir
+        """
+        quota_dir, path = self._get_path_part(self._quota.quota_dir), self._get_path_part(hdfs_path)
+        return path == quota_dir or path.startswith(quota_dir.rstrip('/') + '/')
+
+    @staticmethod
+    def _get_path_part(hdfs_path):
+        """
+        hdfs://nameservice1//user/proj/ ==> /user/proj
+        """
+        parsed = urlparse(hdfs_path)
+        return posixpath.normpath(parsed.path if parsed.scheme else hdfs_path)
+
+    def _get_tiering_paths(self):
+        """
+        paths left after expired and quota paths deleted, and not updated since tiering after
+        :return: {hdfs path: update timestamp} in order of listing
+        """
+        tiering_timestamp = self._get_tiering_timestamp()
+        return {candidate.target: candidate.timestamp for _, candidate in self._remain_candidates
+                if candidate.target not in self._quota_targets and candidate.timestamp < tiering_timestamp}
+
+    def _get_tiering_timestamp(self):
+        if not hasattr(self, 'tiering_timestamp'):
+            tiering_timestamp = DateUtil.get_day_begin_timestamp(DateUtil.get_expire_time(self._tiering.after))
+            setattr(self, 'tiering_timestamp', tiering_timestamp)
+        return getattr(self, 'tiering_timestamp')
+
+    def _exec_tiering(self, path_timestamps):
+        """
+        `hadoop fs -setrep` is executed once for many paths, storage policy is set path by path,
+        both only change metadata on namenode, replicas are removed and blocks are moved by datanodes later
+        paths tiered with the same replication and storage policy and not updated since are skipped
+        :param path_timestamps: {hdfs path: update timestamp}
+        :return:
+        """
+        _, replication, storage_policy = self._tiering
+        tiering_index = self._open_tiering_index()
+        if tiering_index:
+            tiered_paths = {hdfs_path for hdfs_path, timestamp in path_timestamps.items()
+                            if tiering_index.get(hdfs_path) == self._tiering_record(timestamp)}
+            if tiered_paths:
+                self._logger.info(f"{self} skip {len(tiered_paths)} hdfs paths tiered and not updated since")
+            path_timestamps = {hdfs_path: timestamp for hdfs_path, timestamp in path_timestamps.items()
+                               if hdfs_path not in tiered_paths}
+        hdfs_paths = list(path_timestamps)
+
+        failed_paths = set()
+        actions = []
+        if replication:
+            actions.append((f"set replication {replication}", self._hdfs_fs.set_replication_many, replication))
+        if storage_policy:
+            actions.append((f"set storage policy {storage_policy}", self._hdfs_fs.set_storage_policy_many,
+                            storage_policy))
+
+        for action, func, value in actions:
+            if self.test:
+                for hdfs_path in hdfs_paths:
+                    self._logger.info(f"{self.action_prefix}{self} {action} of hdfs path: {hdfs_path}")
+                continue
+
+            def iter_paths():
+                for path in hdfs_paths:
+                    self._acquire_rate_limit(1)
+                    yield path
+
+            errors = func(iter_paths(), value, self._max_workers)
+            failed_paths.update(errors)
+            for hdfs_path in hdfs_paths:
+                if hdfs_path in errors:
+                    self._logger.error(f"{self.action_prefix}{self} {action} of hdfs path:{hdfs_path} failed: "
+                                       f"{errors[hdfs_path]}")
+                else:
+                    self._logger.info(f"{self.action_prefix}{self} {action} of hdfs path:{hdfs_path} success")
+
+        if tiering_index and not self.test:
+            for hdfs_path, timestamp in path_timestamps.items():
+                if hdfs_path not in failed_paths:
+                    tiering_index.put(hdfs_path, self._tiering_record(timestamp))
+            tiering_index.close()
+
+    def _open_tiering_index(self):
+        """
+        records of other replication or storage policy are ignored, paths are tiered again when tiering changed
+        :return: None if tiering index path not set
+        """
+        if not self._tiering_index_path:
+            return None
+
+        _, replication, storage_policy = self._tiering
+        tiering_index = DirMtimeIndex(self._tiering_index_path, f'tiering {replication} {storage_policy}').open()
+        self._logger.info(f"{self} load {tiering_index.record_count} tiered paths from index: "
+                          f"{self._tiering_index_path}")
+        return tiering_index
+
+    @staticmethod
+    def _tiering_record(timestamp) -> DirIndexRecord:
+        # update time of path in milliseconds, no files are tracked
+        return DirIndexRecord(round(timestamp * 1000), None, 0, [])
+
+    def _get_size(self, du_path, hdfs_path, summarize=False):
+        """
+        get bytes of hdfs path, du path is executed only once for all its children
+        :param du_path: parent path, or the wildcard path, du lists the same children as ls
+        :param hdfs_path:
+        :param summarize: du with -s
+        :return: None if not report size or size not found
+        """
+        if not self._report_size:
+            return None
+
+        key = (du_path, summarize)
+        if key not in self._du_sizes:
+            self._du_sizes[key] = self._hdfs_fs.du(du_path, summarize)
+        return self._du_sizes[key].get(HdfsUtil.normalize_path(hdfs_path))
 
     def _get_parent_path(self, hdfs_path: str):
         """
@@ -138,43 +453,28 @@ class HDFSPathCleaner(BaseCleaner):
         return parent_path
 
     def _ls_hdfs_path(self, hdfs_path):
-        shell_cmd = f"hadoop fs -ls {hdfs_path}"
-        try:
-            ret = ShellUtil.exec_shell_with_result(shell_cmd, self._logger)
-            self._logger.debug(f"hdfs ls result is:")
-            for line in ret:
-                self._logger.debug(f"ls result: {line}")
-            return ret
-        except Exception:
-            self._logger.error(f"{self} execute shell cmd error:{traceback.format_exc()}")
-            return ['']
-
-    def _get_ls_time_and_path(self, dfs_ls_line):
         """
-        drwxr-xr-x   - proj hive          0 2021-07-21 18:29 /user/hive/warehouse/proj.db/tb1
-        will return: 2021-07-21, /user/hive/warehouse/proj.db/tb1
-        :param dfs_ls_line:
-        :return:
+        :param hdfs_path:
+        :return: [HdfsFileStatus], empty if ls failed
         """
-        time_pattern = re.search(self._hdfs_day_time_pattern, dfs_ls_line)
-        time_str = '' if not time_pattern else time_pattern.group(0)
-        hdfs_path = '' if not time_str else dfs_ls_line.strip().split(' ')[-1]
+        if hdfs_path in self._listings:
+            return self._listings[hdfs_path]
 
-        self._logger.debug(f"ls line is: {dfs_ls_line}, ret is:{time_str}, {hdfs_path}")
-        return time_str, hdfs_path
+        try:
+            return self._hdfs_fs.list_status(hdfs_path)
+        except Exception:
+            self._logger.error(f"{self} ls hdfs path: {hdfs_path} error:{traceback.format_exc()}")
+            return []
 
-    def _is_expire(self, update_time_str):
+    def _is_expire(self, update_timestamp):
         if self._ignore_update_time:
             return True
 
         if not self._expire_time:
             return True
 
-        update_time = DateUtil.str_2_datetime(update_time_str)
-        expire_time = self._get_expire_time()
-        if DateUtil.compare_date(update_time, expire_time):
-            return False
-        return True
+        # same as DateUtil.compare_date, path updated before the expire day is expired
+        return update_timestamp < self._get_expire_timestamp()
 
     def _get_expire_time(self):
         if not hasattr(self, 'expire_time'):
@@ -182,23 +482,54 @@ class HDFSPathCleaner(BaseCleaner):
             setattr(self, 'expire_time', expire_time)
         return getattr(self, 'expire_time')
 
-    def _exec_del(self, hdfs_path):
+    def _get_expire_timestamp(self):
+        if not hasattr(self, 'expire_timestamp'):
+            expire_timestamp = DateUtil.get_day_begin_timestamp(self._get_expire_time())
+            setattr(self, 'expire_timestamp', expire_timestamp)
+        return getattr(self, 'expire_timestamp')
 
-        if self.test:
-            return self._exec_del_test(hdfs_path)
-
-        return self._real_exec_del(hdfs_path)
+    def _get_max_chunk_paths(self):
+        if not self.rate_limiter:
+            return None
+        return max(int(self.rate_limiter.ops_per_second), 1)
 
     def _exec_del_test(self, hdfs_path):
         trash_msg = 'with skip trash' if self._skip_trash else 'with trash'
         self._logger.info(f"{self.action_prefix}{self.description} delete hdfs path: {hdfs_path} {trash_msg}")
+        return True
 
-    def _real_exec_del(self, hdfs_path):
-        skip_trash = '-skipTrash' if self._skip_trash else ''
-        shell_cmd = f"hadoop fs -rm -r {skip_trash} {hdfs_path}"
+    def _real_exec_del(self, candidates, summary: CleanSummary):
+        """
+        delete all candidates with hdfs fs delete_many, `hadoop fs -rm` is executed once for many paths
+        rate limiter is acquired for all paths of a batch just before it is deleted,
+        a batch has at most ops per second of the rate limiter paths
+        :param candidates:
+        :param summary: deleted candidates are added to it
+        :return:
+        """
+        delete_candidates = {}
+
+        def iter_delete_paths():
+            for candidate in candidates:
+                if candidate.target in delete_candidates:
+                    continue
+                delete_candidates[candidate.target] = candidate
+                yield candidate.target
+
+        def acquire(hdfs_paths):
+            nbytes = sum(delete_candidates[hdfs_path].size or 0 for hdfs_path in hdfs_paths)
+            self._acquire_rate_limit(len(hdfs_paths), nbytes or None)
+
+        errors = self._hdfs_fs.delete_many(iter_delete_paths(),
+                                           self._skip_trash,
+                                           self._max_workers,
+                                           acquire if self.rate_limiter else None,
+                                           self._get_max_chunk_paths())
+        for hdfs_path, candidate in delete_candidates.items():
+            if hdfs_path in errors:
+                self._logger.error(f"{self.action_prefix}{self} remove hdfs path:{hdfs_path} failed: "
+                                   f"{errors[hdfs_path]}")
+                continue
 
-        ret, msg = ShellUtil.exec_shell_with_status(shell_cmd, self._logger)
-        if ret:
             self._logger.info(f"{self.action_prefix}{self} remove hdfs path:{hdfs_path} success")
-            return
-        self._logger.error(f"{self.action_prefix}{self} remove hdfs path:{hdfs_path} failed: {msg}")
\ No newline at end of file
+            summary.add(candidate.root, candidate.size)
\ No newline at end of file
@@ -7,15 +7,40 @@
 :Version: v.1.0
 :Description:
 """
+import itertools
 import os
 import re
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
-from component.base_cleaner import BaseCleaner
-from common.utils import ExpireTimeDesc, DateUtil, ShellUtil
+from component.base_cleaner import BaseCleaner, CleanCandidate, CleanSummary
+from common.utils import ExpireTimeDesc, DateUtil, HdfsUtil
+from common.hdfs_fs import SparkHdfsFileSystem, CachedHdfsFileSystem
+from common.hive_metastore import SparkHiveMetastore
+from common.hive_ddl import HiveDdlExecutor, HiveCliDdlExecutor, SparkDdlExecutor, HiveScriptDdlExecutor
 from common.logger_adaptor import LogAdaptor
 
 
+class _HiveCandidate(CleanCandidate):
+    """
+    table_name: table of the candidate
+    partition: partition spec, ex: dt=20210721, None for table candidate or hdfs dir not matched partition
+    hdfs_dir: table or partition dir on hdfs
+    is_time_sorted: partition is time sorted, partitions <= the max one are dropped together
+    """
+    __slots__ = ('table_name', 'partition', 'hdfs_dir', 'is_time_sorted')
+
+    def __init__(self, target, kind, timestamp=None, size=None, root=None,
+                 table_name=None, partition=None, hdfs_dir=None, is_time_sorted=False):
+        super().__init__(target, kind, timestamp, size, root)
+        self.table_name = table_name
+        self.partition = partition
+        self.hdfs_dir = hdfs_dir
+        self.is_time_sorted = is_time_sorted
+
+
 class HiveTableCleaner(BaseCleaner):
 
     DEFAULT_EXPIRE_TIME = ExpireTimeDesc(0, 4, 0)
@@ -25,6 +50,10 @@ class HiveTableCleaner(BaseCleaner):
     DELETE_TYPE_TABLE = 1
     DELETE_TYPE_PARTITION = 2
 
+    DDL_EXECUTOR_CLI = 'cli'
+    DDL_EXECUTOR_SPARK = 'spark'
+    DDL_EXECUTOR_SCRIPT = 'script'
+
     def __init__(self,
                  logger: LogAdaptor,
                  spark,
@@ -37,8 +66,13 @@ class HiveTableCleaner(BaseCleaner):
                  ignore_update_time=False,
                  check_time_type=None,
                  partition_field_format='%Y%m%d',
-                 hdfs_day_time_pattern=r'\d{4}-\d{2}-\d{2}',
-                 expire_time: ExpireTimeDesc = None):
+                 hdfs_day_time_pattern=None,
+                 expire_time: ExpireTimeDesc = None,
+                 report_size=True,
+                 ddl_executor=None,
+                 partition_chunk_size=100,
+                 max_workers=1,
+                 scheduler_pool='hive_cleaner'):
         """
         clear hive data util
         if drop partition, support signal partition
@@ -56,9 +90,26 @@ class HiveTableCleaner(BaseCleaner):
             check time by partition for time sorted partition if partition_field set
             check time by partition updatetime on hdfs if hdfs_update_time set
         :param partition_field_format: datetime format for time sorted partition field
-        :param hdfs_day_time_pattern: the time regular expressions pattern for hdfs ls return
+        :param hdfs_day_time_pattern: deprecated, ignored with a DeprecationWarning if set,
+            hdfs dirs are listed with hadoop FileSystem in jvm of spark, update time is read from file status
         :param expire_time:
+        :param report_size: get bytes of expired tables and partitions with `hadoop fs -du`,
+            once for warehouse path and once per table dir
+        :param ddl_executor: executor of drop statements, default `cli`
+            `cli` one hive_cmd process per statement
+            `spark` statements executed in spark session
+            `script` statements of one clean executed together with one `hive -f` at the end
+            or a HiveDdlExecutor, ex: HiveServer2DdlExecutor
+        :param partition_chunk_size: max partitions dropped by one `alter table` statement when not time sorted,
+            a failed statement is retried partition by partition,
+            with `script` executor the failed statement is found after `hive -f`, its partitions are dropped
+            one by one with the statements not executed after it by one more `hive -f`
+        :param max_workers: max tables checked and dropped concurrently, default 1 one by one,
+            candidates and summary are still in order of tables
+        :param scheduler_pool: spark fair scheduler pool prefix, every worker thread has its own pool
+            `{scheduler_pool}_{n}`, so spark jobs of tables do not starve each other, None not set pool
         """
+        self._warn_deprecated_param('hdfs_day_time_pattern', hdfs_day_time_pattern)
         self._logger = logger
         self._spark = spark
         self._hive_db_name = hive_db_name
@@ -70,11 +121,27 @@ class HiveTableCleaner(BaseCleaner):
         self._ignore_update_time = ignore_update_time
         self._check_time_type = check_time_type
         self._partition_field_format = partition_field_format
-        self._hdfs_day_time_pattern = hdfs_day_time_pattern
         self._expire_time = expire_time if expire_time else self.DEFAULT_EXPIRE_TIME
+        self._report_size = report_size
+        self._hdfs_fs = SparkHdfsFileSystem(logger, spark) if spark else None
+        self._metastore = SparkHiveMetastore(logger, spark) if spark else None
+        self._ddl_executor = ddl_executor
+        self._partition_chunk_size = partition_chunk_size
+        self._max_workers = max_workers
+        self._scheduler_pool = scheduler_pool
+        self._worker_ids = itertools.count()
 
         self._db_tables = None
+        self._partition_columns = {}
+        # {table name: [statement]} and {table name: [hdfs path]} of deferred ddl executor
+        self._deferred_statements = {}
+        self._deferred_hdfs_paths = {}
+        # {statement: (table name, partitions, purge)} of multi partitions drop of deferred ddl executor
+        self._deferred_chunks = {}
+        self._deferred_lock = threading.Lock()
         self._table_hdfs_update_time = None
+        self._du_sizes = {}
+        self._du_lock = threading.Lock()
 
     def _check_and_update_param(self):
         if not self._spark:
@@ -101,26 +168,199 @@ class HiveTableCleaner(BaseCleaner):
         if self._check_time_type == self.CHECK_TIME_PARTITION_FIELD:
             if not self._partition_field_format:
                 raise Exception(f"{self} partition field format is not specified")
-        else:
-            if not self._hdfs_day_time_pattern:
-                raise Exception(f"{self} hdfs day time pattern is not specified")
 
         self._expire_time = self.DEFAULT_EXPIRE_TIME if not self._expire_time else self._expire_time
 
+        if not self._max_workers or self._max_workers < 1:
+            raise Exception(f"{self} max workers is invalid:{self._max_workers}")
+
+        if self._max_workers > 1 and self._scheduler_pool and \
+                self._spark.sparkContext.getConf().get('spark.scheduler.mode', 'FIFO').upper() != 'FAIR':
+            self._logger.warning(f"{self} spark.scheduler.mode is not FAIR, scheduler pools of workers not work")
+
+        if not self._partition_chunk_size or self._partition_chunk_size < 1:
+            raise Exception(f"{self} partition chunk size is invalid:{self._partition_chunk_size}")
+
+        if not isinstance(self._ddl_executor, HiveDdlExecutor):
+            self._ddl_executor = self._create_ddl_executor(self._ddl_executor or self.DDL_EXECUTOR_CLI)
+
+    def _create_ddl_executor(self, executor_type) -> HiveDdlExecutor:
+        if executor_type == self.DDL_EXECUTOR_CLI:
+            return HiveCliDdlExecutor(self._logger, self._hive_cmd)
+        if executor_type == self.DDL_EXECUTOR_SPARK:
+            return SparkDdlExecutor(self._logger, self._spark)
+        if executor_type == self.DDL_EXECUTOR_SCRIPT:
+            return HiveScriptDdlExecutor(self._logger, re.sub(r'\s+-e$', '', self._hive_cmd.strip()))
+        raise Exception(f"{self} ddl executor is invalid:{executor_type}")
+
     @property
     def description(self) -> str:
         return "hive table cleaner"
 
-    def clean(self):
+    def set_listing_cache(self, listing_cache):
+        super().set_listing_cache(listing_cache)
+        if self._hdfs_fs:
+            self._hdfs_fs = CachedHdfsFileSystem.wrap(self._hdfs_fs, listing_cache)
+
+    def clean(self) -> CleanSummary:
+        summary = CleanSummary(self)
+        self._deferred_statements = {}
+        self._deferred_hdfs_paths = {}
+        self._deferred_chunks = {}
+        try:
+            deferred_candidates = {}
+            for table_name, (candidates, deleted) in self._map_tables(self._clean_table):
+                if not deleted:
+                    continue
+
+                # counted after the deferred statements executed and hdfs dirs removed
+                if table_name in self._deferred_statements or table_name in self._deferred_hdfs_paths:
+                    deferred_candidates[table_name] = candidates
+                    continue
+
+                for candidate in candidates:
+                    summary.add(candidate.root, candidate.size)
+
+            if not self.test:
+                self._flush_deferred(deferred_candidates, summary)
+
+            self._logger.info(f"{self.action_prefix}{summary}")
+            return summary
+        finally:
+            self.close()
+
+    def close(self):
+        if isinstance(self._ddl_executor, HiveDdlExecutor):
+            self._ddl_executor.close()
+        if self._hdfs_fs:
+            self._hdfs_fs.close()
+
+    def _flush_deferred(self, deferred_candidates, summary: CleanSummary):
+        """
+        execute the deferred statements, then remove hdfs dirs and count candidates of tables all statements success
+        :param deferred_candidates: {table name: candidates}
+        :param summary:
+        :return:
+        """
+        errors = self._flush_ddl_executor()
+        for table_name, candidates in deferred_candidates.items():
+            failed_statements = [s for s in self._deferred_statements.get(table_name, []) if s in errors]
+            for statement in failed_statements:
+                self._logger.error(f"{self.action_prefix}{self} execute hive command:{statement} "
+                                   f"failed:{errors[statement]}")
+            if failed_statements:
+                continue
+
+            hdfs_paths = self._deferred_hdfs_paths.get(table_name)
+            if hdfs_paths:
+                self._remove_hdfs_dirs(hdfs_paths)
+            self._invalidate_listing(os.path.join(self._hive_db_warehouse_path, table_name))
+
+            for candidate in candidates:
+                summary.add(candidate.root, candidate.size)
+
+    def _flush_ddl_executor(self):
+        """
+        flush the deferred executor, hive stops at the first failed statement,
+        if it drops many partitions, the statements not executed and its partitions one by one are flushed again
+        :return: {failed statement: error}
+        """
+        errors = self._ddl_executor.flush()
+        while errors:
+            failed_statement = next(iter(errors))
+            chunk = self._deferred_chunks.pop(failed_statement, None)
+            if not chunk:
+                return errors
+
+            table_name, partitions, purge = chunk
+            self._logger.warning(f"{self} drop {len(partitions)} partitions of {table_name} together failed, "
+                                 f"drop them one by one: {errors[failed_statement]}")
+            for statement in list(errors)[1:]:
+                self._ddl_executor.execute(statement)
+            for partition in partitions:
+                self._build_and_exec_hive_command(
+                    self._build_drop_partitions_cmd(table_name, [partition], purge), table_name)
+            errors = self._ddl_executor.flush()
+        return errors
+
+    def iter_candidates(self):
+        """
+        yield table candidate or the partition candidates of table, candidates of one table are yielded together
+        :return:
+        """
+        for _, candidates in self._map_tables(self._get_table_candidates):
+            yield from candidates
+
+    def _map_tables(self, func):
+        """
+        call func for every clear table, with thread pool if max workers > 1
+        :param func: func(table_name)
+        :return: (table name, result of func) in order of tables
+        """
         self._check_and_update_param()
+        self._du_sizes = {}
+        self._table_hdfs_update_time = None
 
         self._get_all_table_name_in_db()
 
+        table_names = self._get_clear_table_names()
+        if not self._ignore_update_time:
+            # partition columns of all tables are fetched from metastore in one call
+            self._partition_columns = self._metastore.get_partition_columns(
+                self._hive_db_name, [table_name for table_name in table_names if table_name in self._db_tables])
+
+        if self._max_workers == 1 or len(table_names) <= 1:
+            for table_name in table_names:
+                yield table_name, func(table_name)
+            return
+
+        # warehouse du and update time of tables are shared by all tables, get them before workers start
+        self._get_size(self._hive_db_warehouse_path, self._hive_db_warehouse_path)
+        if not self._ignore_update_time and any(not self._partition_columns.get(table_name)
+                                                for table_name in table_names if table_name in self._db_tables):
+            self._get_table_update_time_on_hdfs()
+        with ThreadPoolExecutor(max_workers=self._max_workers, initializer=self._set_scheduler_pool) as executor:
+            yield from zip(table_names, executor.map(func, table_names))
+
+    def _set_scheduler_pool(self):
+        if not self._scheduler_pool:
+            return
+
+        # local property is of current thread, jobs submitted by the worker go to its own pool
+        pool = f'{self._scheduler_pool}_{next(self._worker_ids)}'
+        self._spark.sparkContext.setLocalProperty('spark.scheduler.pool', pool)
+        self._logger.debug(f"{self} worker uses spark scheduler pool: {pool}")
+
+    def _get_table_candidates(self, table_name):
+        """
+        :param table_name:
+        :return: [candidate] of table
+        """
+        begin = time.time()
+        candidates = list(self._iter_single_table_candidates(table_name))
+        self._logger.info(f"{self} table: {self._hive_db_name}.{table_name}, {len(candidates)} candidates "
+                          f"of {sum(c.size or 0 for c in candidates)} bytes, checked in {time.time() - begin:.2f}s")
+        return candidates
+
+    def _clean_table(self, table_name):
+        """
+        :param table_name:
+        :return: (candidates of table, deleted or not)
+        """
+        candidates = self._get_table_candidates(table_name)
+        if not candidates:
+            return candidates, False
+        return candidates, self._exec_del_candidates(table_name, candidates)
+
+    def _get_clear_table_names(self):
+        """
+        :return: [table name] of clear tables, wildcard expanded, in order
+        """
         if '*' in self._clear_tables:
             self._logger.info(f"{self}, '*' in clear tables, all table will execute clean")
-            self._handle_clear_all_table()
-            return
+            return list(self._db_tables)
 
+        table_names = []
         for table_name in self._clear_tables:
             # check table
             if not table_name:
@@ -128,10 +368,34 @@ class HiveTableCleaner(BaseCleaner):
                 continue
 
             if '*' in table_name:
-                self._handle_wildcard_character_table(table_name)
+                table_names.extend(self._get_wildcard_character_table_names(table_name))
                 continue
 
-            self._handle_single_table(table_name)
+            table_names.append(table_name)
+        return list(dict.fromkeys(table_names))
+
+    def _exec_del_candidates(self, table_name, candidates):
+        """
+        drop table, or drop the partitions of table together
+        :param table_name:
+        :param candidates: candidates of table
+        :return:
+        """
+        if candidates[0].kind == CleanCandidate.KIND_HIVE_TABLE:
+            return self._drop_table(table_name)
+
+        delete_hdfs_dirs = list(dict.fromkeys(c.hdfs_dir for c in candidates if c.hdfs_dir))
+        if candidates[0].is_time_sorted:
+            return self._exec_del(table_name,
+                                  self.DELETE_TYPE_PARTITION,
+                                  max_delete_partition=max(c.partition for c in candidates),
+                                  delete_hdfs_dirs=delete_hdfs_dirs)
+
+        return self._exec_del(table_name,
+                              self.DELETE_TYPE_PARTITION,
+                              is_time_sorted_partition=False,
+                              delete_partitions=[c.partition for c in candidates if c.partition],
+                              delete_hdfs_dirs=delete_hdfs_dirs)
 
     def _get_all_table_name_in_db(self):
         """
@@ -139,29 +403,18 @@ class HiveTableCleaner(BaseCleaner):
         if no database or database have no table will raise exception
         :return:
         """
-        self._db_tables = self._spark.sql(f"show tables in {self._hive_db_name}")\
-            .rdd.map(lambda x: x.tableName).collect()
+        self._db_tables = self._metastore.list_tables(self._hive_db_name)
 
     def _get_table_update_time_on_hdfs(self):
-        shell_cmd = f"hadoop fs -ls {self._hive_db_warehouse_path}"
         try:
-            ls_lines = ShellUtil.exec_shell_with_result(shell_cmd, self._logger)
-            info = {}
-            for line in ls_lines:
-                if self._hive_db_warehouse_path in line:
-                    update_date_time, _ = self._get_ls_time_and_path(line)
-                    table_name = line.strip().split(self._hive_db_warehouse_path)[-1]
-                    info[table_name] = update_date_time
-            self._table_hdfs_update_time = info
+            statuses = self._hdfs_fs.list_status(self._hive_db_warehouse_path)
+            self._table_hdfs_update_time = {
+                os.path.basename(status.path.rstrip('/')): status.modification_time for status in statuses}
         except Exception:
             self._logger.error(f"{self} ls warehouse dir error:{traceback.format_exc()}")
             raise
 
-    def _handle_clear_all_table(self):
-        for table_name in self._db_tables:
-            self._handle_single_table(table_name)
-
-    def _handle_wildcard_character_table(self, wildcard_table_name):
+    def _get_wildcard_character_table_names(self, wildcard_table_name):
         reg = wildcard_table_name.replace('*', r'[\w]*?')
         self._logger.info(f"{self}: {wildcard_table_name} reg is:{reg}")
 
@@ -169,14 +422,12 @@ class HiveTableCleaner(BaseCleaner):
 
         if not tables:
             self._logger.warning(f"{self}: {wildcard_table_name} no match table found!")
-            return
+            return []
 
         self._logger.info(f"{self}: {wildcard_table_name} found table:{tables}")
+        return tables
 
-        for table_name in tables:
-            self._handle_single_table(table_name)
-
-    def _handle_single_table(self, table_name):
+    def _iter_single_table_candidates(self, table_name):
         """
         TODO: add handler to chain of responsibility
         :param table_name:
@@ -187,34 +438,111 @@ class HiveTableCleaner(BaseCleaner):
             return
 
         if self._ignore_update_time:
-            self._drop_table(table_name)
+            yield self._table_candidate(table_name)
             return
 
         has_partition, partitions = self._check_and_get_table_partition(table_name)
         if not has_partition:
-            self._handle_no_partition_table(table_name)
+            yield from self._iter_no_partition_table_candidates(table_name)
             return
 
         if not partitions:
             return
 
         if self._check_time_type == self.CHECK_TIME_PARTITION_FIELD and self._is_day_time_partition(partitions):
-            self._handle_for_partition_field(table_name, partitions)
+            yield from self._iter_partition_field_candidates(table_name, partitions)
             return
 
         if self._check_time_type == self.CHECK_TIME_HDFS_UPDATE_TIME:
-            self._handle_for_hdfs_update_time(table_name, partitions)
+            yield from self._iter_hdfs_update_time_candidates(table_name, partitions)
             return
 
+    def _table_candidate(self, table_name, update_timestamp=None):
+        hdfs_dir = os.path.join(self._hive_db_warehouse_path, table_name)
+        return _HiveCandidate(
+            f'{self._hive_db_name}.{table_name}',
+            CleanCandidate.KIND_HIVE_TABLE,
+            update_timestamp,
+            self._get_size(self._hive_db_warehouse_path, hdfs_dir),
+            f'{self._hive_db_name}.{table_name}',
+            table_name=table_name,
+            hdfs_dir=hdfs_dir)
+
+    def _partition_candidate(self, table_name, partition, hdfs_dir, timestamp, is_time_sorted):
+        target = f'{self._hive_db_name}.{table_name}/{partition}' if partition else hdfs_dir
+        table_hdfs_dir = os.path.join(self._hive_db_warehouse_path, table_name)
+        partition_hdfs_dir = hdfs_dir if hdfs_dir else os.path.join(table_hdfs_dir, partition)
+        return _HiveCandidate(
+            target,
+            CleanCandidate.KIND_HIVE_PARTITION,
+            timestamp,
+            self._get_size(table_hdfs_dir, partition_hdfs_dir),
+            f'{self._hive_db_name}.{table_name}',
+            table_name=table_name,
+            partition=partition,
+            hdfs_dir=hdfs_dir,
+            is_time_sorted=is_time_sorted)
+
+    def _get_size(self, du_path, hdfs_path):
+        """
+        get bytes of table or partition dir, du path is executed only once for all its children
+        :param du_path: warehouse path for table, table dir for partition
+        :param hdfs_path:
+        :return: None if not report size or size not found
+        """
+        if not self._report_size or not self._hive_db_warehouse_path:
+            return None
+
+        with self._du_lock:
+            sizes = self._du_sizes.get(du_path)
+        if sizes is None:
+            # du out of lock, dir of table is only du by the worker of table
+            sizes = self._hdfs_fs.du(du_path)
+            with self._du_lock:
+                sizes = self._du_sizes.setdefault(du_path, sizes)
+        return sizes.get(HdfsUtil.normalize_path(hdfs_path))
+
     def _check_and_get_table_partition(self, table_name):
+        """
+        list partitions from metastore, only expired ones if partition field is time sorted
+        :param table_name:
+        :return: (has partition, ['dt=20210721', ...])
+        """
+        partition_columns = self._partition_columns.get(table_name)
+        if not partition_columns:
+            return False, None
+
         try:
-            partitions = self._spark.sql(f"show partitions {self._hive_db_name}.{table_name}")\
-                .rdd\
-                .map(lambda r: r[0])\
-                .collect()
-            return True, partitions
+            return True, self._metastore.list_partitions(self._hive_db_name,
+                                                         table_name,
+                                                         partition_columns,
+                                                         self._get_expire_predicate(partition_columns))
         except Exception:
-            return False, None
+            self._logger.warning(f"{self} list partitions of {self._hive_db_name}.{table_name} from metastore "
+                                 f"failed, use show partitions: {traceback.format_exc()}")
+            return True, [row[0] for row in
+                          self._spark.sql(f"show partitions {self._hive_db_name}.{table_name}").collect()]
+
+    def _get_expire_predicate(self, partition_columns):
+        """
+        partitions before expire day, pushed down to metastore,
+        only for single partition field of format sorts the same as time, ex: %Y%m%d, %Y-%m-%d
+        :param partition_columns:
+        :return: None to list all partitions
+        """
+        # time of partition is checked by the value of the last field
+        if self._check_time_type != self.CHECK_TIME_PARTITION_FIELD or len(partition_columns) != 1:
+            return None
+
+        directives = re.findall('%(.)', self._partition_field_format)
+        if not directives or directives != ['Y', 'm', 'd', 'H', 'M', 'S'][:len(directives)]:
+            return None
+
+        # partitions of format not matched are filtered again when checked
+        expire_partition = self._get_expire_time().strftime(self._partition_field_format)
+        column = partition_columns[0].replace('`', '``')
+        expire_partition = expire_partition.replace('\\', '\\\\').replace("'", "\\'")
+        return f"`{column}` < '{expire_partition}'"
 
     def _is_day_time_partition(self, partitions) -> bool:
         part0 = partitions[0].split('=')[-1]
@@ -224,22 +552,22 @@ class HiveTableCleaner(BaseCleaner):
         except Exception:
             return False
 
-    def _handle_no_partition_table(self, table_name):
-        if not self._table_hdfs_update_time:
+    def _iter_no_partition_table_candidates(self, table_name):
+        if self._table_hdfs_update_time is None:
             self._get_table_update_time_on_hdfs()
 
-        update_time_str = self._table_hdfs_update_time.get(table_name, None)
-        if not update_time_str:
+        update_timestamp = self._table_hdfs_update_time.get(table_name, None)
+        if update_timestamp is None:
             self._logger.warning(f"{self} not found {table_name} on warehouse path:{self._hive_db_warehouse_path}")
             return
 
-        if self._is_expire(update_time_str):
-            self._drop_table(table_name)
+        if self._is_expire_timestamp(update_timestamp):
+            yield self._table_candidate(table_name, update_timestamp)
 
     def _drop_table(self, table_name):
         return self._exec_del(table_name, self.DELETE_TYPE_TABLE)
 
-    def _handle_for_partition_field(self, table_name, partitions):
+    def _iter_partition_field_candidates(self, table_name, partitions):
         """
         :param table_name:
         :param partitions: 'dt=20210721'
@@ -256,72 +584,51 @@ class HiveTableCleaner(BaseCleaner):
             self._logger.info(f"{self} table:{self._hive_db_name}.{table_name} no expire partition found")
             return
 
-        expire_dirs = [] if not self._skip_trash else [
-            os.path.join(self._hive_db_warehouse_path, table_name, partition) for partition in expire_partitions]
+        for partition_str in expire_partitions:
+            # partition dir only removed when skip trash
+            hdfs_dir = os.path.join(self._hive_db_warehouse_path, table_name, partition_str) \
+                if self._skip_trash else None
+            timestamp = DateUtil.str_2_timestamp(partition_str.split('=')[-1], self._partition_field_format)
+            yield self._partition_candidate(table_name, partition_str, hdfs_dir, timestamp, True)
 
-        self._exec_del(table_name,
-                       self.DELETE_TYPE_PARTITION,
-                       max_delete_partition=max(expire_partitions),
-                       delete_hdfs_dirs=expire_dirs)
-
-    def _handle_for_hdfs_update_time(self, table_name, partitions):
+    def _iter_hdfs_update_time_candidates(self, table_name, partitions):
         table_hdfs_dir = os.path.join(self._hive_db_warehouse_path, table_name)
-        shell_cmd = f"hadoop fs -ls {table_hdfs_dir}"
         try:
-            lines = ShellUtil.exec_shell_with_result(shell_cmd, self._logger)
-
-            expire_partition_dirs = []
-            for line in lines:
-                if table_hdfs_dir in line:
-                    update_time_str, partition_dir = self._get_ls_time_and_path(line)
-                    if self._is_expire(update_time_str):
-                        expire_partition_dirs.append(partition_dir)
-            if not expire_partition_dirs:
-                self._logger.info(f"{self} table: {table_name} no partition expire")
-                return
-
-            expire_partitions = []
-            for partition_dir in expire_partition_dirs:
-                for partition in partitions:
-                    if partition_dir.endswith(partition):
-                        expire_partitions.append(partition)
-
-            self._exec_del(
-                table_name,
-                self.DELETE_TYPE_PARTITION,
-                is_time_sorted_partition=False,
-                delete_partitions=expire_partitions,
-                delete_hdfs_dirs=expire_partition_dirs
-            )
+            expire_partition_dirs = [(status.path, status.modification_time)
+                                     for status in self._hdfs_fs.list_status(table_hdfs_dir)
+                                     if self._is_expire_timestamp(status.modification_time)]
         except Exception:
             self._logger.error(f"{self}, ls table hdfs dir failed:{traceback.format_exc()}")
+            return
 
-    def _get_ls_time_and_path(self, dfs_ls_line):
-        """
-        drwxr-xr-x   - proj hive          0 2021-07-21 18:29 /user/hive/warehouse/proj.db/tb1
-        will return: 2021-07-21, /user/hive/warehouse/proj.db/tb1
-        :param dfs_ls_line:
-        :return:
-        """
-        time_pattern = re.search(self._hdfs_day_time_pattern, dfs_ls_line)
-        time_str = '' if not time_pattern else time_pattern.group(0)
-        hdfs_path = '' if not time_str else dfs_ls_line.strip().split(' ')[-1]
+        if not expire_partition_dirs:
+            self._logger.info(f"{self} table: {table_name} no partition expire")
+            return
+
+        for partition_dir, timestamp in expire_partition_dirs:
+            matched_partitions = [partition for partition in partitions if partition_dir.endswith(partition)]
+
+            # the dir not matched any partition is only removed for outer table with skip trash,
+            # drop partition never removes it
+            if not matched_partitions and (self._is_inner_table or not self._skip_trash):
+                self._logger.info(f"{self} table: {table_name} dir: {partition_dir} matches no partition, skipped")
+                continue
 
-        self._logger.debug(f"ls line is: {dfs_ls_line}, ret is:{time_str}, {hdfs_path}")
-        return time_str, hdfs_path
+            for partition in matched_partitions or [None]:
+                yield self._partition_candidate(table_name, partition, partition_dir, timestamp, False)
 
     def _is_expire(self, update_time_str, fmt='%Y-%m-%d'):
+        return self._is_expire_timestamp(DateUtil.str_2_timestamp(update_time_str, fmt))
+
+    def _is_expire_timestamp(self, update_timestamp):
         if self._ignore_update_time:
             return True
 
         if not self._expire_time:
             return True
 
-        update_time = DateUtil.str_2_datetime(update_time_str, fmt)
-        expire_time = self._get_expire_time()
-        if DateUtil.compare_date(update_time, expire_time):
-            return False
-        return True
+        # same as DateUtil.compare_date, data updated before the expire day is expired
+        return update_timestamp < self._get_expire_timestamp()
 
     def _get_expire_time(self):
         if not hasattr(self, 'expire_time'):
@@ -329,6 +636,12 @@ class HiveTableCleaner(BaseCleaner):
             setattr(self, 'expire_time', expire_time)
         return getattr(self, 'expire_time')
 
+    def _get_expire_timestamp(self):
+        if not hasattr(self, 'expire_timestamp'):
+            expire_timestamp = DateUtil.get_day_begin_timestamp(self._get_expire_time())
+            setattr(self, 'expire_timestamp', expire_timestamp)
+        return getattr(self, 'expire_timestamp')
+
     def _exec_del(self,
                   table_name,
                   del_type,
@@ -342,9 +655,8 @@ class HiveTableCleaner(BaseCleaner):
             drop table if exists table_name [purge]
         drop time sorted partitions command:
             alter table {table_name} drop partition (dt<{min_remain_partition}) [purge]
-        drop specified partitions command:
-            alter table {table_name} drop partition (dt = {delete_partitions[0]}) [purge]
-            alter table {table_name} drop partition (dt = {delete_partitions[1]}) [purge]
+        drop specified partitions command, partition_chunk_size partitions per command:
+            alter table {table_name} drop partition (dt = {delete_partitions[0]}), partition (...), ... [purge]
         :param table_name:
         :param del_type: in (self.DELETE_TYPE_TABLE, self.DELETE_TYPE_PARTITION)
         :param is_time_sorted_partition: partition is time sorted
@@ -395,6 +707,7 @@ class HiveTableCleaner(BaseCleaner):
                 f"with partitions:{delete_partitions} {trash_msg}"
 
         self._logger.info(msg)
+        return True
 
     def _real_exec_del(self,
                        table_name,
@@ -404,13 +717,17 @@ class HiveTableCleaner(BaseCleaner):
                        delete_partitions=None,
                        delete_hdfs_dirs=None):
 
-        if del_type == self.DELETE_TYPE_TABLE:
-            return self._exec_del_table(table_name)
+        try:
+            if del_type == self.DELETE_TYPE_TABLE:
+                return self._exec_del_table(table_name)
 
-        if is_time_sorted_partition:
-            return self._exec_del_sorted_partition(table_name, max_delete_partition, delete_hdfs_dirs)
+            if is_time_sorted_partition:
+                return self._exec_del_sorted_partition(table_name, max_delete_partition, delete_hdfs_dirs)
 
-        return self._exec_del_partitions(table_name, delete_partitions, delete_hdfs_dirs)
+            return self._exec_del_partitions(table_name, delete_partitions, delete_hdfs_dirs)
+        finally:
+            # hive drop removes table or partition dirs, listings around table dir are out of date
+            self._invalidate_listing(os.path.join(self._hive_db_warehouse_path, table_name))
 
     def _exec_del_table(self, table_name):
         if self._is_inner_table:
@@ -422,14 +739,15 @@ class HiveTableCleaner(BaseCleaner):
         drop_cmd = f"drop table if exists {self._hive_db_name}.{table_name}"
         drop_cmd = f'{drop_cmd} purge' if self._skip_trash else drop_cmd
         try:
-            self._build_and_exec_hive_command(drop_cmd)
-            self._spark.sql(drop_cmd)
+            self._build_and_exec_hive_command(drop_cmd, table_name)
             self._logger.warning(
                 f"{self.action_prefix}{self} drop inner table {self._hive_db_name}.{table_name} success")
+            return True
         except Exception:
             self._logger.error(
                 f"{self.action_prefix}{self} drop inner "
                 f"table {self._hive_db_name}.{table_name} failed:{traceback.format_exc()}")
+            return False
 
     def _real_exec_del_outer_table(self, table_name):
 
@@ -438,17 +756,19 @@ class HiveTableCleaner(BaseCleaner):
             self._logger.info(
                 f"{self.action_prefix}{self} remove "
                 f"table:{self._hive_db_name}.{table_name} from hdfs path:{hdfs_table_path}")
-            self._delete_with_skip_trash(hdfs_table_path)
+            self._delete_with_skip_trash([hdfs_table_path], table_name)
 
         try:
             drop_cmd = f"drop table if exists {self._hive_db_name}.{table_name}"
-            self._build_and_exec_hive_command(drop_cmd)
+            self._build_and_exec_hive_command(drop_cmd, table_name)
             self._logger.warning(f"{self.action_prefix}{self} drop outer "
                                  f"table {self._hive_db_name}.{table_name} success")
+            return True
         except Exception:
             self._logger.error(
                 f"{self.action_prefix}{self} drop outer table "
                 f"{self._hive_db_name}.{table_name} failed:{traceback.format_exc()}")
+            return False
 
     def _exec_del_sorted_partition(self, table_name, max_delete_partition, delete_hdfs_dirs):
         if self._is_inner_table:
@@ -467,17 +787,18 @@ class HiveTableCleaner(BaseCleaner):
                 f"""({partition_field} <= '{partition}')""",
                 'purge' if self._skip_trash else ''
             ]
-            self._build_and_exec_hive_command(drop_cmd)
+            self._build_and_exec_hive_command(drop_cmd, table_name)
             self._logger.info(f"{self.action_prefix}{self} drop inner table {table_name} partition success!")
+            return True
         except Exception:
             self._logger.error(f"{self.action_prefix}{self} drop inner "
                                f"table {table_name} partition failed:{traceback.format_exc()}")
+            return False
 
     def _real_exec_del_sorted_partition_outer(self, table_name, max_delete_partition, delete_hdfs_dirs):
 
         if self._skip_trash and delete_hdfs_dirs:
-            for hdfs_dir in delete_hdfs_dirs:
-                self._delete_with_skip_trash(hdfs_dir)
+            self._delete_with_skip_trash(delete_hdfs_dirs, table_name)
 
         try:
             items = max_delete_partition.split('=')
@@ -488,11 +809,13 @@ class HiveTableCleaner(BaseCleaner):
                 'drop partition',
                 f"""({partition_field} <= '{partition}')"""
             ]
-            self._build_and_exec_hive_command(drop_cmd)
+            self._build_and_exec_hive_command(drop_cmd, table_name)
             self._logger.info(f"{self.action_prefix}{self} drop outer table {table_name} partition success!")
+            return True
         except Exception:
             self._logger.error(f"{self.action_prefix}{self} drop outer "
                                f"table {table_name} partition failed:{traceback.format_exc()}")
+            return False
 
     def _exec_del_partitions(self, table_name, delete_partitions, delete_hdfs_dirs):
         if self._is_inner_table:
@@ -500,67 +823,130 @@ class HiveTableCleaner(BaseCleaner):
         return self._real_exec_del_partitions_outer(table_name, delete_partitions, delete_hdfs_dirs)
 
     def _real_exec_del_partitions_inner(self, table_name, delete_partitions):
-        try:
-            for partition in delete_partitions:
-                items = partition.split('=')
-                partition_field, partition = items[0], items[-1]
-                drop_cmd = [
-                    'alter table',
-                    f'{self._hive_db_name}.{table_name}',
-                    'drop partition',
-                    f"""({partition_field}='{partition}')"""
-                    'purge' if self._skip_trash else ''
-                ]
-                self._build_and_exec_hive_command(drop_cmd)
+        if self._drop_partitions(table_name, delete_partitions, self._skip_trash):
             self._logger.info(f"{self.action_prefix}{self} drop inner table {table_name} partition success!")
-        except Exception:
-            self._logger.error(f"{self.action_prefix}{self} drop inner "
-                               f"table {table_name} partition failed:{traceback.format_exc()}")
+            return True
+
+        self._logger.error(f"{self.action_prefix}{self} drop inner table {table_name} partition failed")
+        return False
 
     def _real_exec_del_partitions_outer(self, table_name, delete_partitions, delete_hdfs_dirs):
         if self._skip_trash and delete_hdfs_dirs:
-            for hdfs_dir in delete_hdfs_dirs:
-                self._delete_with_skip_trash(hdfs_dir)
+            self._delete_with_skip_trash(delete_hdfs_dirs, table_name)
 
-        try:
-            for partition in delete_partitions:
-                items = partition.split('=')
-                partition_field, partition = items[0], items[-1]
-                drop_cmd = [
-                    'alter table',
-                    f'{self._hive_db_name}.{table_name}',
-                    'drop partition',
-                    f"""({partition_field}='{partition}')"""
-                ]
-                self._build_and_exec_hive_command(drop_cmd)
+        if self._drop_partitions(table_name, delete_partitions):
             self._logger.info(f"{self.action_prefix}{self} drop outer table {table_name} partition success!")
-        except Exception:
-            self._logger.error(f"{self.action_prefix}{self} drop outter "
-                               f"table {table_name} partition failed:{traceback.format_exc()}")
+            return True
+
+        self._logger.error(f"{self.action_prefix}{self} drop outter table {table_name} partition failed")
+        return False
 
-    def _build_and_exec_hive_command(self, command_items):
+    def _drop_partitions(self, table_name, delete_partitions, purge=False):
+        """
+        drop partitions with one statement per chunk, partitions of a failed chunk are dropped one by one,
+        chunk of deferred executor fails on flush, it is recorded to be split then
+        :param table_name:
+        :param delete_partitions: ['dt=20210721/hour=00', ...]
+        :param purge:
+        :return: all partitions dropped or not
+        """
+        all_dropped = True
+        for i in range(0, len(delete_partitions), self._partition_chunk_size):
+            chunk = delete_partitions[i:i + self._partition_chunk_size]
+            command_items = self._build_drop_partitions_cmd(table_name, chunk, purge)
+            try:
+                self._build_and_exec_hive_command(command_items, table_name)
+                if self._ddl_executor.deferred and len(chunk) > 1:
+                    with self._deferred_lock:
+                        self._deferred_chunks[' '.join(item for item in command_items if item)] = \
+                            (table_name, chunk, purge)
+                continue
+            except Exception:
+                if len(chunk) == 1:
+                    all_dropped = False
+                    self._logger.error(f"{self.action_prefix}{self} drop partition {chunk[0]} of "
+                                       f"{self._hive_db_name}.{table_name} failed:{traceback.format_exc()}")
+                    continue
+                self._logger.warning(f"{self} drop {len(chunk)} partitions of {table_name} together failed, "
+                                     f"drop them one by one: {traceback.format_exc()}")
+
+            for partition in chunk:
+                try:
+                    self._build_and_exec_hive_command(
+                        self._build_drop_partitions_cmd(table_name, [partition], purge), table_name)
+                except Exception:
+                    all_dropped = False
+                    self._logger.error(f"{self.action_prefix}{self} drop partition {partition} of "
+                                       f"{self._hive_db_name}.{table_name} failed:{traceback.format_exc()}")
+        return all_dropped
+
+    def _build_drop_partitions_cmd(self, table_name, partitions, purge=False):
+        """
+        ['dt=20210721/hour=00', 'dt=20210722/hour=00'] ==>
+            alter table db.table drop partition (dt='20210721', hour='00'), partition (dt='20210722', hour='00')
+        """
+        specs = []
+        for partition in partitions:
+            fields = [field.split('=', 1) for field in partition.split('/')]
+            specs.append('partition (' + ', '.join(f"{name}='{value}'" for name, value in fields) + ')')
+        return [
+            'alter table',
+            f'{self._hive_db_name}.{table_name}',
+            'drop',
+            ', '.join(specs),
+            'purge' if purge else ''
+        ]
+
+    def _build_and_exec_hive_command(self, command_items, table_name=None):
+        """
+        :param command_items:
+        :param table_name: table of the statement, statements of deferred executor are recorded by table
+        :return:
+        """
         if isinstance(command_items, str):
             command_items = [command_items]
-        exec_cmd = ' '.join(command_items)
-        if self._hive_cmd not in exec_cmd:
-            exec_cmd = f'{self._hive_cmd} "{exec_cmd}"'
-        code, errmsg = ShellUtil.exec_shell_with_status(exec_cmd, self._logger)
+        exec_cmd = ' '.join(item for item in command_items if item)
+        try:
+            self._ddl_executor.execute(exec_cmd)
+        except Exception:
+            self._logger.error(f"{self} execute hive command:{exec_cmd} failed:{traceback.format_exc()}")
+            raise
 
-        if code:
-            self._logger.info(f"{self} execute hive command: {exec_cmd} success!")
+        if self._ddl_executor.deferred:
+            with self._deferred_lock:
+                self._deferred_statements.setdefault(table_name, []).append(exec_cmd)
+            self._logger.info(f"{self} hive command: {exec_cmd} deferred")
             return True
 
-        self._logger.error(f"{self} execute hive command:{exec_cmd} failed:{errmsg}")
-        raise Exception(errmsg)
-
-    def _delete_with_skip_trash(self, hdfs_path):
-        shell_cmd = f"hadoop fs -rm -r -skipTrash {hdfs_path}"
-        code, msg = ShellUtil.exec_shell_with_status(shell_cmd, self._logger)
+        self._logger.info(f"{self} execute hive command: {exec_cmd} success!")
+        return True
 
-        if code:
-            self._logger.info(f"{self.action_prefix}{self} remove hdfs path {hdfs_path} success!")
+    def _delete_with_skip_trash(self, hdfs_paths, table_name=None):
+        """
+        delete hdfs paths of outer table, with deferred executor they are removed after the drop statements success,
+        metastore never keeps a table or partition of removed dirs
+        :param hdfs_paths:
+        :param table_name:
+        :return: all paths deleted or not
+        """
+        if self._ddl_executor.deferred:
+            with self._deferred_lock:
+                self._deferred_hdfs_paths.setdefault(table_name, []).extend(hdfs_paths)
             return True
+        return self._remove_hdfs_dirs(hdfs_paths)
 
-        self._logger.error(f"{self.action_prefix}{self} remove hdfs path {hdfs_path} failed: {msg}")
-        return False
+    def _remove_hdfs_dirs(self, hdfs_paths):
+        """
+        delete hdfs paths together with hdfs fs delete_many
+        :param hdfs_paths:
+        :return: all paths deleted or not
+        """
+        errors = self._hdfs_fs.delete_many(hdfs_paths, skip_trash=True)
+        for hdfs_path in hdfs_paths:
+            if hdfs_path in errors:
+                self._logger.error(f"{self.action_prefix}{self} remove hdfs path {hdfs_path} "
+                                   f"failed: {errors[hdfs_path]}")
+            else:
+                self._logger.info(f"{self.action_prefix}{self} remove hdfs path {hdfs_path} success!")
+        return not errors
 
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: local_clean_daemon
+:Author: xufeng
+:Date: 2021-08-18 3:05 PM
+:Version: v.1.0
+:Description:
+"""
+import heapq
+import os
+import threading
+import time
+import traceback
+
+from component.base_cleaner import CleanSummary
+from component.local_data_cleaner import LocalDataCleaner
+from common.utils import ExpireTimeDesc, DiskBudgetDesc, DateUtil
+from common.file_matcher import FileNameMatcher
+from common.inotify import Inotify, InotifyEvent
+from common.logger_adaptor import LogAdaptor
+
+
+class LocalCleanDaemon(LocalDataCleaner):
+    """
+    long running local cleaner
+    paths are scanned and cleaned once like LocalDataCleaner, remain files are scheduled by their expire time,
+    then directories are watched with inotify, new and changed files are scheduled without listing directory,
+    files are deleted when expired, paths are scanned again periodically in case inotify events lost
+    """
+
+    # modify is not watched, log being written fires too many events,
+    # file mtime is checked again when it expires and rescheduled if it was written
+    DIR_WATCH_MASK = Inotify.IN_CREATE | Inotify.IN_ATTRIB | Inotify.IN_CLOSE_WRITE | Inotify.IN_MOVED_FROM | \
+        Inotify.IN_MOVED_TO | Inotify.IN_DELETE | Inotify.IN_ONLYDIR | Inotify.IN_DONTFOLLOW
+    FILE_WATCH_MASK = Inotify.IN_ATTRIB | Inotify.IN_CLOSE_WRITE | Inotify.IN_DELETE_SELF | Inotify.IN_MOVE_SELF
+    REMOVE_EVENT_MASK = Inotify.IN_DELETE | Inotify.IN_MOVED_FROM | Inotify.IN_DELETE_SELF | Inotify.IN_MOVE_SELF
+
+    DEFAULT_RESCAN_INTERVAL = 6 * 3600
+    # max seconds to wait inotify events, stop event is checked after waiting
+    POLL_INTERVAL = 1
+
+    def __init__(self,
+                 logger: LogAdaptor,
+                 local_paths,
+                 delete_all_file=False,
+                 ignore_delete_type=False,
+                 default_suffix=None,
+                 ignore_update_time=False,
+                 expire_time: ExpireTimeDesc = None,
+                 max_workers=1,
+                 suffix_match_mode=FileNameMatcher.MATCH_CONTAINS,
+                 index_path=None,
+                 disk_budget: DiskBudgetDesc = None,
+                 compress_after_days=None,
+                 compress_format=LocalDataCleaner.COMPRESS_GZIP,
+                 compress_workers=None,
+                 rescan_interval=DEFAULT_RESCAN_INTERVAL):
+        """
+        params are same as LocalDataCleaner, they are used in every scan
+        :param rescan_interval: seconds between two full scans, the first scan is executed when daemon start
+        """
+        super().__init__(logger,
+                         local_paths,
+                         delete_all_file,
+                         ignore_delete_type,
+                         default_suffix,
+                         ignore_update_time,
+                         expire_time,
+                         max_workers,
+                         suffix_match_mode,
+                         index_path,
+                         disk_budget,
+                         compress_after_days,
+                         compress_format,
+                         compress_workers)
+        self._rescan_interval = rescan_interval
+
+        self._inotify = None
+        # wd: (watched path, root)
+        self._watches = {}
+        # min heap of (expire_at, file_path, root)
+        self._schedule = []
+        # file_path: expire_at of its latest schedule, older schedules in heap are ignored
+        self._expire_at = {}
+        self._next_rescan_time = 0
+
+    def _check_and_update_param(self):
+        super()._check_and_update_param()
+
+        if not self._rescan_interval or self._rescan_interval <= 0:
+            raise Exception(f"{self}: rescan interval:{self._rescan_interval} is invalid!")
+
+    @property
+    def description(self) -> str:
+        return "local file clean daemon"
+
+    def run(self, stop_event: threading.Event = None) -> CleanSummary:
+        """
+        clean until stop event set, run forever if stop event not specified
+        :param stop_event:
+        :return: summary of all scans and scheduled deletes
+        """
+        self._check_and_update_param()
+
+        summary = CleanSummary(self)
+        self._inotify = Inotify()
+        try:
+            self._rescan(summary)
+            while not (stop_event and stop_event.is_set()):
+                self._exec_expired(time.time(), summary)
+
+                events = self._inotify.read_events(self._get_wait_seconds())
+                need_rescan = False
+                for event in events:
+                    need_rescan = self._handle_event(event) or need_rescan
+
+                if need_rescan:
+                    self._logger.warning(f"{self} inotify event queue overflow, rescan paths")
+
+                if need_rescan or time.time() >= self._next_rescan_time:
+                    self._rescan(summary)
+        finally:
+            self._inotify.close()
+            self._inotify = None
+            self._watches = {}
+
+        self._logger.info(f"{self.action_prefix}{summary}")
+        return summary
+
+    def _get_wait_seconds(self):
+        wait_until = self._next_rescan_time
+        if self._schedule:
+            wait_until = min(wait_until, self._schedule[0][0])
+        return max(0, min(self.POLL_INTERVAL, wait_until - time.time()))
+
+    def _rescan(self, summary: CleanSummary):
+        """
+        clean paths like LocalDataCleaner, then watch all directories and schedule all remain files again
+        :param summary:
+        :return:
+        """
+        # expire time is cached by cleaner, refresh it for every scan
+        for attr in ('expire_time', 'expire_timestamp'):
+            if hasattr(self, attr):
+                delattr(self, attr)
+
+        summary.merge(self.clean())
+
+        self._schedule = []
+        self._expire_at = {}
+        for path in self._clear_local_paths:
+            if os.path.isfile(path):
+                self._add_watch(path, self.FILE_WATCH_MASK, path)
+                self._schedule_file(path, path)
+                continue
+
+            if os.path.isdir(path):
+                self._watch_tree(path, path)
+
+        self._next_rescan_time = time.time() + self._rescan_interval
+        self._logger.info(f"{self} watch {len(self._watches)} paths, schedule {len(self._expire_at)} files")
+
+    def _watch_tree(self, dir_path, root):
+        """
+        watch directory and its sub directories, and schedule the files in them
+        directory is watched before listing, so file created during listing is not missed
+        :param dir_path:
+        :param root: configured path
+        :return:
+        """
+        dirs = [dir_path]
+        while dirs:
+            dir_path = dirs.pop()
+            self._add_watch(dir_path, self.DIR_WATCH_MASK, root)
+            try:
+                with os.scandir(dir_path) as it:
+                    entries = list(it)
+            except OSError:
+                self._logger.warning(f"{self} list dir: {dir_path} failed: {traceback.format_exc()}")
+                continue
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                    continue
+
+                try:
+                    self._schedule_file(entry.path, root, entry.stat(follow_symlinks=False).st_mtime)
+                except OSError:
+                    continue
+
+    def _add_watch(self, path, mask, root):
+        try:
+            wd = self._inotify.add_watch(path, mask)
+        except OSError as e:
+            # ex: max_user_watches reached, path is still cleaned by rescan
+            self._logger.warning(f"{self} watch path: {path} failed: {e}")
+            return
+
+        self._watches[wd] = (path, root)
+
+    def _unwatch_tree(self, dir_path):
+        prefix = os.path.join(dir_path, '')
+        for wd, (path, _) in list(self._watches.items()):
+            if path == dir_path or path.startswith(prefix):
+                self._inotify.rm_watch(wd)
+                del self._watches[wd]
+
+    def _handle_event(self, event: InotifyEvent) -> bool:
+        """
+        :param event:
+        :return: true if events lost and paths need rescan
+        """
+        if event.mask & Inotify.IN_Q_OVERFLOW:
+            return True
+
+        watch = self._watches.get(event.wd)
+        if not watch:
+            return False
+
+        if event.mask & Inotify.IN_IGNORED:
+            del self._watches[event.wd]
+            return False
+
+        path, root = watch
+        event_path = os.path.join(path, event.name) if event.name else path
+        if event.mask & Inotify.IN_ISDIR:
+            if event.mask & (Inotify.IN_CREATE | Inotify.IN_MOVED_TO):
+                self._watch_tree(event_path, root)
+            elif event.mask & Inotify.IN_MOVED_FROM:
+                self._unwatch_tree(event_path)
+            return False
+
+        if event.mask & self.REMOVE_EVENT_MASK:
+            self._expire_at.pop(event_path, None)
+            return False
+
+        self._schedule_file(event_path, root)
+        return False
+
+    def _schedule_file(self, file_path, root, mtime=None):
+        """
+        schedule file can be deleted by type at its expire time
+        :param file_path:
+        :param root: configured path
+        :param mtime: stat file if not specified
+        :return:
+        """
+        if not self._is_del_all_set() and not self._is_del_type(file_path):
+            return
+
+        if mtime is None:
+            try:
+                mtime = os.stat(file_path, follow_symlinks=False).st_mtime
+            except OSError:
+                self._expire_at.pop(file_path, None)
+                return
+
+        expire_at = self._get_file_expire_at(mtime)
+        if self._expire_at.get(file_path) == expire_at:
+            return
+
+        self._expire_at[file_path] = expire_at
+        heapq.heappush(self._schedule, (expire_at, file_path, root))
+
+    def _get_file_expire_at(self, mtime):
+        if self._is_del_all_set() or self._ignore_update_time or not self._expire_time:
+            return 0
+        return DateUtil.get_expire_at_timestamp(mtime, self._expire_time)
+
+    def _exec_expired(self, now, summary: CleanSummary):
+        """
+        delete the scheduled files expired before now
+        :param now:
+        :param summary:
+        :return:
+        """
+        while self._schedule and self._schedule[0][0] <= now:
+            expire_at, file_path, root = heapq.heappop(self._schedule)
+            if self._expire_at.get(file_path) != expire_at:
+                continue
+            del self._expire_at[file_path]
+
+            try:
+                file_stat = os.stat(file_path, follow_symlinks=False)
+            except OSError:
+                continue
+
+            # file written after scheduled
+            if self._get_file_expire_at(file_stat.st_mtime) > now:
+                self._schedule_file(file_path, root, file_stat.st_mtime)
+                continue
+
+            if self._exec_del(file_path, self.DEL_TYPE_FILE, size=file_stat.st_size):
+                summary.add(root, file_stat.st_size)
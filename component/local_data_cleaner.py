@@ -7,12 +7,101 @@
 :Version: v.1.0
 :Description:
 """
+import gzip
+import heapq
+import importlib.util
 import os
+import shutil
+import stat
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from component.base_cleaner import BaseCleaner, CleanCandidate, CleanSummary
+from common.utils import ExpireTimeDesc, DiskBudgetDesc, DateUtil
+from common.file_matcher import FileNameMatcher
+from common.dir_index import DirMtimeIndex, DirIndexRecord
+from common.logger_adaptor import LogAdaptor, BufferedLogAdaptor
+
+
+class _DirNode:
+    """
+    directory state during walk
+    remain is the count of children still exists, pending is the count of sub directory tasks not finished
+    fd is the opened directory, entries in it are stat and removed relative to it
+    root is the configured path directory belongs to
+    """
+    __slots__ = ('path', 'parent', 'sub_dirs', 'remain', 'pending', 'fd', 'root')
+
+    def __init__(self, path, parent=None):
+        self.path = path
+        self.parent = parent
+        self.root = parent.root if parent else path
+        self.sub_dirs = []
+        self.remain = 0
+        self.pending = 0
+        self.fd = None
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class _LocalCandidate(CleanCandidate):
+    """
+    dir_fd is the opened parent directory, candidate is removed relative to it
+    """
+    __slots__ = ('dir_fd',)
+
+    def __init__(self, target, kind, timestamp=None, size=None, root=None, dir_fd=None):
+        super().__init__(target, kind, timestamp, size, root)
+        self.dir_fd = dir_fd
+
+
+def _compress_file(file_path, compress_format, compressed_path):
+    """
+    compress file in worker process, original file is kept
+    compressed file is written to temp file, fsynced and linked to compressed path, then its directory is fsynced,
+    existing compressed file is never overwritten,
+    mtime of compressed file is same as original, so it expires as original
+    :param file_path:
+    :param compress_format: `gzip` or `zstd`
+    :param compressed_path:
+    :return: bytes of compressed file
+    """
+    file_stat = os.stat(file_path)
+    tmp_path = f'{compressed_path}.tmp'
+    try:
+        with open(file_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+            if compress_format == LocalDataCleaner.COMPRESS_GZIP:
+                with gzip.GzipFile(os.path.basename(file_path), 'wb', fileobj=dst, mtime=file_stat.st_mtime) as gz:
+                    shutil.copyfileobj(src, gz, LocalDataCleaner.COMPRESS_CHUNK_SIZE)
+            else:
+                import zstandard
+                zstandard.ZstdCompressor().copy_stream(src, dst, LocalDataCleaner.COMPRESS_CHUNK_SIZE)
+            dst.flush()
+            os.fsync(dst.fileno())
+
+        if os.stat(file_path).st_mtime_ns != file_stat.st_mtime_ns:
+            raise Exception(f"file: {file_path} changed during compress")
+
+        os.utime(tmp_path, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns))
+        try:
+            os.link(tmp_path, compressed_path)
+        except FileExistsError:
+            raise Exception(f"compressed file: {compressed_path} of {file_path} already exists")
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
 
-from component.base_cleaner import BaseCleaner
-from common.utils import ExpireTimeDesc, DateUtil
-from common.logger_adaptor import LogAdaptor
+    dir_fd = os.open(os.path.dirname(compressed_path) or '.', os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    return os.stat(compressed_path).st_size
 
 
 class LocalDataCleaner(BaseCleaner):
@@ -23,6 +112,15 @@ class LocalDataCleaner(BaseCleaner):
     DEL_TYPE_FILE = 1
     DEL_TYPE_DIR = 2
 
+    # open directory once, and stat, unlink and rmdir its entries relative to the directory fd
+    USE_DIR_FD = os.scandir in os.supports_fd and {os.stat, os.unlink, os.rmdir, os.open} <= os.supports_dir_fd
+    DIR_OPEN_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0)
+
+    COMPRESS_GZIP = 'gzip'
+    COMPRESS_ZSTD = 'zstd'
+    COMPRESS_SUFFIXES = {COMPRESS_GZIP: '.gz', COMPRESS_ZSTD: '.zst'}
+    COMPRESS_CHUNK_SIZE = 1024 * 1024
+
     def __init__(self,
                  logger: LogAdaptor,
                  local_paths,
@@ -30,7 +128,14 @@ class LocalDataCleaner(BaseCleaner):
                  ignore_delete_type=False,
                  default_suffix=None,
                  ignore_update_time=False,
-                 expire_time: ExpireTimeDesc = None):
+                 expire_time: ExpireTimeDesc = None,
+                 max_workers=1,
+                 suffix_match_mode=FileNameMatcher.MATCH_CONTAINS,
+                 index_path=None,
+                 disk_budget: DiskBudgetDesc = None,
+                 compress_after_days=None,
+                 compress_format=COMPRESS_GZIP,
+                 compress_workers=None):
         """
         delete local file util
         ex: delete expire log, tmp file etc.
@@ -44,6 +149,24 @@ class LocalDataCleaner(BaseCleaner):
             ex: .log, .out , if set .log, xxx.log.202106 also can be delete
         :param ignore_update_time: if set true, file update time will not check
         :param expire_time: if ignore_update_time set true, this param will ignored, default 15 day
+        :param max_workers: thread count to scan and delete paths in parallel, default 1 run in sequence
+            every directory is a task, directory is removed after all its children handled
+        :param suffix_match_mode: how default_suffix match file name, compiled once when cleaner created
+            contains: default, suffix appears in file name, ex: .log match xxx.log.202106
+            suffix: file name ends with suffix
+            glob: suffix is shell style pattern, ex: *.log.2021*
+        :param index_path: sqlite file to keep directory mtime and its oldest file mtime between runs,
+            directory not changed since last run and its oldest file not expire will be skipped,
+            not used if delete_all_file or ignore_update_time set
+        :param disk_budget: after expire files deleted, delete the oldest files by type until under budget
+            ex: DiskBudgetDesc(max_bytes=50 * 1024 ** 3, min_free_percent=None) keep files under path in 50G
+                DiskBudgetDesc(max_bytes=None, min_free_percent=20) keep 20% free space of the file system
+        :param compress_after_days: after expire files deleted, compress files by type updated before the days,
+            original file is deleted after compressed file fsynced, compressed file keeps the mtime of original,
+            and is deleted by expire time as the other files, default None not compress
+            ex: expire_time=ExpireTimeDesc(0, 0, 30), compress_after_days=2
+        :param compress_format: `gzip` or `zstd`, zstd need zstandard installed
+        :param compress_workers: process count to compress files, default cpu count
         """
         self._logger = logger
         self._clear_local_paths = local_paths
@@ -52,6 +175,21 @@ class LocalDataCleaner(BaseCleaner):
         self._default_file_suffix = default_suffix if default_suffix else self.DEFAULT_FILE_SUFFIX
         self._ignore_update_time = ignore_update_time
         self._expire_time = expire_time if expire_time else self.DEFAULT_EXPIRE_TIME
+        self._max_workers = max_workers
+        self._suffix_matcher = FileNameMatcher(self._default_file_suffix, suffix_match_mode)
+        self._index_path = index_path
+        self._dir_index = None
+        self._disk_budget = disk_budget
+        self._compress_after_days = compress_after_days
+        self._compress_format = compress_format
+        self._compress_workers = compress_workers
+
+        self._lock = threading.Lock()
+        self._thread_local = threading.local()
+        self._executor = None
+        self._summary = None
+        self._task_cond = threading.Condition()
+        self._pending_tasks = 0
 
     def _check_and_update_param(self):
         if not self._clear_local_paths:
@@ -63,55 +201,567 @@ class LocalDataCleaner(BaseCleaner):
         if isinstance(self._default_file_suffix, str):
             self._default_file_suffix = [self._default_file_suffix]
 
+        if not self._max_workers or self._max_workers < 1:
+            raise Exception(f"{self}: max workers:{self._max_workers} is invalid!")
+
+        if self._disk_budget and self._disk_budget.max_bytes is None and self._disk_budget.min_free_percent is None:
+            raise Exception(f"{self}: disk budget:{self._disk_budget} is empty!")
+
+        if self._compress_after_days is not None:
+            if self._compress_format not in self.COMPRESS_SUFFIXES:
+                raise Exception(f"{self}: compress format:{self._compress_format} is invalid!")
+
+            if self._compress_format == self.COMPRESS_ZSTD and not importlib.util.find_spec('zstandard'):
+                raise Exception(f"{self}: compress format zstd need zstandard installed!")
+
     @property
     def description(self) -> str:
         return "local file cleaner"
 
-    def clean(self):
+    @property
+    def _action_logger(self) -> LogAdaptor:
+        """
+        logger for delete action, in parallel mode it is the buffered logger of current directory task
+        """
+        return getattr(self._thread_local, 'logger', None) or self._logger
+
+    def clean(self) -> CleanSummary:
         self._check_and_update_param()
 
-        for path in self._clear_local_paths:
-            if os.path.isfile(path):
-                self._handle_file(path)
-                continue
+        summary = CleanSummary(self)
+        if self._max_workers > 1:
+            self._parallel_clean(summary)
+        else:
+            self._consume_candidates(self._iter_candidates(save_index=not self.test, compress=True), summary)
 
-            if os.path.isdir(path):
-                self._handle_dir(path)
-                continue
+        self._logger.info(f"{self.action_prefix}{summary}")
+        return summary
 
-            self._logger.warning(f"path {path} not found!")
+    def iter_candidates(self):
+        """
+        lazily yield the files and dirs will be deleted, nothing is deleted
+        dir is yielded after its children, as if all of its children deleted
+        :return:
+        """
+        yield from self._iter_candidates(save_index=False)
 
-    def _handle_file(self, file_path):
-        if self._can_delete(file_path):
-            self._exec_del(file_path, self.DEL_TYPE_FILE)
+    def _iter_candidates(self, save_index, compress=False):
+        """
+        yield candidates of all paths, the delete result of candidate can be sent back,
+        if False is sent back, candidate is treated as still exists
+        :param save_index: save dir index after walk
+        :param compress: compress files before disk budget checked
+        :return:
+        """
+        self._check_and_update_param()
+
+        self._open_dir_index()
+        try:
+            for path in self._clear_local_paths:
+                if os.path.isfile(path):
+                    yield from self._iter_file_candidate(path)
+                    continue
+
+                if os.path.isdir(path):
+                    yield from self._iter_dir_candidates(path)
+                    continue
+
+                self._logger.warning(f"path {path} not found!")
+        finally:
+            self._close_dir_index(save_index)
 
-    def _can_delete(self, file_path):
+        if compress:
+            self._compress_files()
+
+        yield from self._iter_disk_budget_candidates()
+
+    def _consume_candidates(self, candidates, summary: CleanSummary):
+        """
+        delete every candidate, and send the delete result back to the candidates generator
+        :param candidates: candidates generator
+        :param summary: deleted files are added to summary
+        :return: return value of the generator
+        """
+        deleted = None
+        while True:
+            try:
+                candidate = candidates.send(deleted)
+            except StopIteration as stop:
+                return stop.value
+
+            del_type = self.DEL_TYPE_FILE if candidate.kind == CleanCandidate.KIND_FILE else self.DEL_TYPE_DIR
+            deleted = self._exec_del(candidate.target, del_type, candidate.dir_fd, candidate.size)
+            if deleted and del_type == self.DEL_TYPE_FILE:
+                summary.add(candidate.root, candidate.size)
+
+    def _open_dir_index(self):
+        if not self._index_path:
+            return
+
+        if self._is_del_all_set() or self._ignore_update_time or not self._expire_time:
+            self._logger.warning(f"{self} all file will be deleted, dir index: {self._index_path} not used")
+            return
+
+        profile = '\0'.join([
+            str(self._ignore_delete_type), self._suffix_matcher.match_mode, *self._suffix_matcher.patterns])
+        self._dir_index = DirMtimeIndex(self._index_path, profile).open()
+        self._logger.info(f"{self} load {self._dir_index.record_count} dir from index: {self._index_path}")
+
+    def _close_dir_index(self, save=True):
+        """
+        :param save: test clean and iter candidates not delete anything, keep index as it was
+        :return:
+        """
+        if not self._dir_index:
+            return
+
+        if save:
+            self._dir_index.close()
+        self._dir_index = None
+
+    def _iter_file_candidate(self, file_path, entry: os.DirEntry = None, dir_fd=None, root=None):
+        """
+        yield file if it can be deleted
+        :param file_path:
+        :param entry: the scandir entry of file, its cached stat will be used
+        :param dir_fd: opened parent directory, file will be removed relative to it
+        :param root: configured path file belongs to, default file path
+        :return: true if file deleted
+        """
+        if not self._can_delete(file_path, entry):
+            return False
+
+        file_stat = entry.stat(follow_symlinks=False) if entry else os.stat(file_path)
+        deleted = yield _LocalCandidate(
+            file_path, CleanCandidate.KIND_FILE, file_stat.st_mtime, file_stat.st_size, root or file_path, dir_fd)
+        return deleted is not False
+
+    def _can_delete(self, file_path, entry: os.DirEntry = None):
 
         # if delete all is set, file will delete with out other check
         if self._is_del_all_set():
             return True
 
         # check file suffix and update time
-        if self._is_del_type(file_path) and self._is_expire(file_path):
+        if self._is_del_type(file_path) and self._is_expire(file_path, entry):
             return True
 
         return False
 
-    def _handle_dir(self, dir_path):
+    def _iter_dir_candidates(self, dir_path):
+        """
+        walk the directory tree with os.scandir, every directory is listed only once,
+        directory which become empty after its children handled is yielded bottom-up in the same pass
+        :param dir_path:
+        :return:
+        """
+        root_node = yield from self._scan_dir(dir_path)
+        if not root_node:
+            return
+
+        # directories in stack keep opened, so sub directories are opened and removed relative to parent
+        stack = [root_node]
+        try:
+            while stack:
+                node = stack[-1]
+                if node.sub_dirs:
+                    sub_node = yield from self._scan_dir(node.sub_dirs.pop(), node)
+                    if sub_node:
+                        stack.append(sub_node)
+                    continue
+
+                stack.pop()
+                yield from self._finish_dir(node)
+        finally:
+            for node in stack:
+                node.close()
+
+    def _scan_dir(self, dir_path, parent=None):
+        """
+        list directory once, yield the files can be deleted in it and collect sub directories
+        :param dir_path:
+        :param parent: parent dir node
+        :return: dir node, None if list directory failed
+        """
+        node = _DirNode(dir_path, parent)
+        try:
+            node.fd = self._open_dir(dir_path, parent)
+            if self._dir_index:
+                dir_mtime = (os.stat(dir_path) if node.fd is None else os.fstat(node.fd)).st_mtime_ns
+            else:
+                dir_mtime = None
+
+            record = self._get_unchanged_dir_record(dir_path, dir_mtime)
+            if record:
+                node.remain = record.file_count
+                node.sub_dirs = [os.path.join(dir_path, name) for name in reversed(record.sub_dirs)]
+                return node
+
+            with os.scandir(dir_path if node.fd is None else node.fd) as it:
+                entries = list(it)
+        except OSError:
+            node.close()
+            self._action_logger.warning(f"{self} list dir: {dir_path} failed: {traceback.format_exc()}")
+            self._mark_remain(parent)
+            return None
+
+        deleted = 0
+        oldest_mtime = None
+        sub_dir_names = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                sub_dir_names.append(entry.name)
+                continue
+
+            file_path = os.path.join(dir_path, entry.name)
+            try:
+                if (yield from self._iter_file_candidate(file_path, entry, node.fd, node.root)):
+                    deleted += 1
+                    continue
+
+                if self._dir_index and self._is_del_type(file_path):
+                    mtime = entry.stat(follow_symlinks=False).st_mtime
+                    oldest_mtime = mtime if oldest_mtime is None else min(oldest_mtime, mtime)
+            except OSError:
+                self._action_logger.warning(f"{self} check file: {file_path} failed: {traceback.format_exc()}")
+            node.remain += 1
+
+        # sub dir will pop from the end, keep listing order
+        node.sub_dirs = [os.path.join(dir_path, name) for name in reversed(sub_dir_names)]
+
+        # directory changed by this run, it will be indexed next run
+        if self._dir_index and not deleted:
+            self._dir_index.put(dir_path, DirIndexRecord(dir_mtime, oldest_mtime, node.remain, sub_dir_names))
+        return node
+
+    def _open_dir(self, dir_path, parent=None):
+        """
+        open directory, sub directory is opened relative to parent without following symlink
+        :param dir_path:
+        :param parent:
+        :return: directory fd, None if dir fd not supported
+        """
+        if not self.USE_DIR_FD:
+            return None
+
+        if parent is None or parent.fd is None:
+            return os.open(dir_path, self.DIR_OPEN_FLAGS)
+
+        flags = self.DIR_OPEN_FLAGS | getattr(os, 'O_NOFOLLOW', 0)
+        return os.open(os.path.basename(dir_path), flags, dir_fd=parent.fd)
+
+    def _get_unchanged_dir_record(self, dir_path, dir_mtime) -> DirIndexRecord:
+        """
+        get index record of directory if directory not changed since last run and its oldest file not expire
+        :param dir_path:
+        :param dir_mtime:
+        :return: None if directory should be scanned
+        """
+        if not self._dir_index:
+            return None
+
+        record = self._dir_index.get(dir_path)
+        if not record or record.dir_mtime != dir_mtime:
+            return None
+
+        if record.oldest_mtime is not None and record.oldest_mtime < self._get_expire_timestamp():
+            return None
+
+        return record
+
+    def _finish_dir(self, node):
+        """
+        called after all children of directory handled, if dir is empty, yield it
+        :param node:
+        :return:
+        """
+        node.close()
+        if not node.remain:
+            parent_fd = node.parent.fd if node.parent else None
+            deleted = yield _LocalCandidate(node.path, CleanCandidate.KIND_DIR, root=node.root, dir_fd=parent_fd)
+            if deleted is not False:
+                if self._dir_index:
+                    self._dir_index.remove(node.path)
+                return
+
+        self._mark_remain(node.parent)
+
+    def _mark_remain(self, node):
+        if not node:
+            return
+
+        with self._lock:
+            node.remain += 1
+
+    def _parallel_clean(self, summary: CleanSummary):
+        """
+        scan and delete with thread pool, every configured path and every directory is a task,
+        sub directories are submitted as new tasks, the task finishes the last child of directory removes it
+        :param summary:
+        :return:
+        """
+        self._summary = summary
+        self._open_dir_index()
+        self._pending_tasks = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                self._executor = executor
+
+                for path in self._clear_local_paths:
+                    if os.path.isfile(path):
+                        self._submit_task(self._consume_candidates, self._iter_file_candidate(path), summary)
+                        continue
+
+                    if os.path.isdir(path):
+                        self._submit_task(self._handle_dir_task, path)
+                        continue
+
+                    self._logger.warning(f"path {path} not found!")
+
+                with self._task_cond:
+                    self._task_cond.wait_for(lambda: not self._pending_tasks)
+        finally:
+            self._executor = None
+            self._summary = None
+            self._close_dir_index(not self.test)
+
+        self._compress_files()
+        self._consume_candidates(self._iter_disk_budget_candidates(), summary)
 
-        for root, dirs, files in os.walk(dir_path):
+    def _submit_task(self, func, *args):
+        with self._task_cond:
+            self._pending_tasks += 1
+        self._executor.submit(self._run_task, func, *args)
+
+    def _run_task(self, func, *args):
+        try:
+            func(*args)
+        except Exception:
+            self._logger.error(f"{self} execute task {func.__name__}{args} failed: {traceback.format_exc()}")
+        finally:
+            with self._task_cond:
+                self._pending_tasks -= 1
+                if not self._pending_tasks:
+                    self._task_cond.notify_all()
+
+    def _handle_dir_task(self, dir_path, parent=None):
+        """
+        handle files of one directory and submit its sub directories,
+        log of the files is buffered and flushed together to keep it in order
+        :param dir_path:
+        :param parent: parent dir node
+        :return:
+        """
+        logger = BufferedLogAdaptor(self._logger)
+        self._thread_local.logger = logger
+        try:
+            node = self._consume_candidates(self._scan_dir(dir_path, parent), self._summary)
+        finally:
+            self._thread_local.logger = None
+            logger.flush()
 
-            for f in files:
-                self._handle_file(os.path.join(root, f))
+        # too many directories wait for sub tasks at the same time, not keep them opened
+        if node:
+            node.close()
 
-            for d in dirs:
-                self._handle_dir(os.path.join(root, d))
+        if not node:
+            self._finish_sub_dir(parent)
+            return
 
-        # if dir is empty, delete it
-        if not os.listdir(dir_path):
-            self._exec_del(dir_path, self.DEL_TYPE_DIR)
+        if not node.sub_dirs:
+            self._consume_candidates(self._finish_dir(node), self._summary)
+            self._finish_sub_dir(parent)
             return
 
+        node.pending = len(node.sub_dirs)
+        while node.sub_dirs:
+            self._submit_task(self._handle_dir_task, node.sub_dirs.pop(), node)
+
+    def _finish_sub_dir(self, node):
+        """
+        called when one sub directory task of node is finished,
+        the last one finishes the node and goes on with its parent
+        :param node:
+        :return:
+        """
+        while node:
+            with self._lock:
+                node.pending -= 1
+                if node.pending:
+                    return
+
+            self._consume_candidates(self._finish_dir(node), self._summary)
+            node = node.parent
+
+    def _compress_files(self):
+        """
+        compress files by type updated before compress days in process pool,
+        original file is deleted after its compressed file is fsynced
+        :return:
+        """
+        if self._compress_after_days is None or self._is_del_all_set() or self._ignore_update_time:
+            return
+
+        compress_time = datetime.now() - timedelta(days=self._compress_after_days)
+        compress_timestamp = DateUtil.get_day_begin_timestamp(compress_time)
+        expire_timestamp = self._get_expire_timestamp() if self._expire_time else None
+        compressed_suffixes = tuple(self.COMPRESS_SUFFIXES.values())
+        compress_suffix = self.COMPRESS_SUFFIXES[self._compress_format]
+
+        files = {}
+        for path in self._clear_local_paths:
+            if not os.path.exists(path):
+                continue
+
+            for mtime, size, file_path in self._iter_type_files(path):
+                if file_path.endswith(compressed_suffixes) or mtime >= compress_timestamp:
+                    continue
+
+                # expired file left by test clean or failed delete
+                if expire_timestamp is not None and mtime < expire_timestamp:
+                    continue
+
+                if os.path.exists(f'{file_path}{compress_suffix}'):
+                    self._logger.error(f"{self.action_prefix}{self.description} compressed file of: {file_path} "
+                                       f"already exists, skip compress it")
+                    continue
+                files[file_path] = size
+
+        if not files:
+            return
+
+        if self.test:
+            for file_path in files:
+                self._logger.info(f"{self.action_prefix}{self.description} compress file: "
+                                  f"{file_path} to {file_path}{compress_suffix}")
+            return
+
+        compressed_count = 0
+        saved_bytes = 0
+        with ProcessPoolExecutor(max_workers=self._compress_workers) as executor:
+            futures = {
+                executor.submit(_compress_file, file_path, self._compress_format, f'{file_path}{compress_suffix}'):
+                    file_path for file_path in files}
+
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    compressed_size = future.result()
+                except Exception:
+                    self._logger.error(f"{self.action_prefix}{self.description} compress file: {file_path} "
+                                       f"failed: {traceback.format_exc()}")
+                    continue
+
+                if self._exec_del(file_path, self.DEL_TYPE_FILE, size=files[file_path]):
+                    compressed_count += 1
+                    saved_bytes += files[file_path] - compressed_size
+
+        self._logger.info(f"{self.action_prefix}{self} compress {compressed_count} files, "
+                          f"save {CleanSummary.format_bytes(saved_bytes)}")
+
+    def _iter_disk_budget_candidates(self):
+        """
+        yield the oldest files under every path until disk budget satisfied
+        :return:
+        """
+        if not self._disk_budget:
+            return
+
+        for path in self._clear_local_paths:
+            if os.path.exists(path):
+                yield from self._iter_path_disk_budget_candidates(path)
+
+    def _iter_path_disk_budget_candidates(self, path):
+        """
+        bytes need to free is worked out before candidate files are streamed through a max heap by mtime,
+        the heap only keeps the oldest files enough to free space,
+        if max bytes is set, path is walked once more to sum the sizes,
+        files expired by update time are yielded before and treated as deleted
+        :param path:
+        :return:
+        """
+        need_free_bytes = None
+        if self._disk_budget.max_bytes is not None:
+            total_bytes = sum(size for mtime, size, _ in self._iter_type_files(path)
+                              if not self._is_expired_file(mtime))
+            need_free_bytes = total_bytes - self._disk_budget.max_bytes
+        if self._disk_budget.min_free_percent is not None:
+            free_percent_need_bytes = self._get_free_percent_need_bytes(path)
+            need_free_bytes = free_percent_need_bytes if need_free_bytes is None \
+                else max(need_free_bytes, free_percent_need_bytes)
+
+        if need_free_bytes is None or need_free_bytes <= 0:
+            self._logger.info(f"{self} path: {path} is under disk budget: {self._disk_budget}")
+            return
+        self._logger.info(f"{self} path: {path} need free {need_free_bytes} bytes for disk budget: {self._disk_budget}")
+
+        # the newest file is dropped once the older files are enough
+        heap = []
+        heap_bytes = 0
+        for mtime, size, file_path in self._iter_type_files(path):
+            if self._is_expired_file(mtime):
+                continue
+            heapq.heappush(heap, (-mtime, size, file_path))
+            heap_bytes += size
+            while heap_bytes - heap[0][1] >= need_free_bytes:
+                heap_bytes -= heapq.heappop(heap)[1]
+
+        if heap_bytes < need_free_bytes:
+            self._logger.warning(f"{self} path: {path} all files only {heap_bytes} bytes, "
+                                 f"disk budget can not be satisfied")
+
+        freed_bytes = 0
+        for neg_mtime, size, file_path in sorted(heap, reverse=True):
+            if freed_bytes >= need_free_bytes:
+                break
+            deleted = yield _LocalCandidate(file_path, CleanCandidate.KIND_FILE, -neg_mtime, size, path)
+            if deleted is not False:
+                freed_bytes += size
+
+    def _get_free_percent_need_bytes(self, path):
+        """
+        bytes need to free on the filesystem of path for min free percent
+        """
+        fs_stat = os.statvfs(path)
+        fs_bytes = fs_stat.f_blocks * fs_stat.f_frsize
+        free_bytes = fs_stat.f_bavail * fs_stat.f_frsize
+        return fs_bytes * self._disk_budget.min_free_percent / 100 - free_bytes
+
+    def _iter_type_files(self, path):
+        """
+        walk path and yield the files can be deleted by type
+        :param path:
+        :return: (mtime, size, file_path)
+        """
+        if os.path.isfile(path):
+            if self._is_del_all_set() or self._is_del_type(path):
+                file_stat = os.stat(path)
+                yield file_stat.st_mtime, file_stat.st_size, path
+            return
+
+        dirs = [path]
+        while dirs:
+            try:
+                with os.scandir(dirs.pop()) as it:
+                    entries = list(it)
+            except OSError:
+                self._logger.warning(f"{self} list dir failed: {traceback.format_exc()}")
+                continue
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                    continue
+
+                if not self._is_del_all_set() and not self._is_del_type(entry.path):
+                    continue
+
+                try:
+                    file_stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                yield file_stat.st_mtime, file_stat.st_size, entry.path
+
     def _is_del_all_set(self):
         return self._delete_all
 
@@ -130,18 +780,22 @@ class LocalDataCleaner(BaseCleaner):
             return True
 
         file_name = os.path.basename(file_path)
-        for suffix in self._default_file_suffix:
-            if suffix in file_name:
-                return True
 
-        return False
+        # compressed file is matched as its original
+        if self._compress_after_days is not None:
+            compress_suffix = self.COMPRESS_SUFFIXES.get(self._compress_format)
+            if compress_suffix and file_name.endswith(compress_suffix):
+                file_name = file_name[:-len(compress_suffix)]
+
+        return self._suffix_matcher.match(file_name)
 
-    def _is_expire(self, file_path):
+    def _is_expire(self, file_path, entry: os.DirEntry = None):
         """
         check file update time
         if early than specified expire time return true
         else return false
         :param file_path:
+        :param entry: scandir entry of file, use the cached stat instead of stat file again
         :return:
         """
         if self._ignore_update_time:
@@ -150,15 +804,21 @@ class LocalDataCleaner(BaseCleaner):
         if not self._expire_time:
             return True
 
-        mtime = os.path.getmtime(file_path)
+        mtime = entry.stat(follow_symlinks=False).st_mtime if entry else os.path.getmtime(file_path)
 
-        file_update_time = DateUtil.timestamp_2_datetime(mtime)
-        expire_time = self._get_expire_time()
+        # same as DateUtil.compare_date, file updated before the expire day is expired
+        return mtime < self._get_expire_timestamp()
 
-        if DateUtil.compare_date(file_update_time, expire_time):
-            return False
-
-        return True
+    def _is_expired_file(self, mtime):
+        """
+        check file of type by update time only, as the expire clean does,
+        used to skip the files already yielded as expired
+        :param mtime:
+        :return:
+        """
+        if self._is_del_all_set() or self._ignore_update_time or not self._expire_time:
+            return True
+        return mtime < self._get_expire_timestamp()
 
     def _get_expire_time(self):
         if not hasattr(self, 'expire_time'):
@@ -166,41 +826,91 @@ class LocalDataCleaner(BaseCleaner):
             setattr(self, 'expire_time', expire_time)
         return getattr(self, 'expire_time')
 
-    def _exec_del(self, file_path_or_dir, del_type):
+    def _get_expire_timestamp(self):
+        if not hasattr(self, 'expire_timestamp'):
+            expire_timestamp = DateUtil.get_day_begin_timestamp(self._get_expire_time())
+            setattr(self, 'expire_timestamp', expire_timestamp)
+        return getattr(self, 'expire_timestamp')
+
+    def _exec_del(self, file_path_or_dir, del_type, dir_fd=None, size=None) -> bool:
         """
         delete directory or file
         :param file_path_or_dir:
         :param del_type:
-        :return:
+        :param dir_fd: opened parent directory, if set, remove relative to it
+        :param size: bytes of file, used by rate limiter
+        :return: true if deleted, test clean always return true
         """
         if self.test:
             return self._exec_del_test(file_path_or_dir, del_type)
 
-        return self._real_exec_del(file_path_or_dir, del_type)
+        return self._real_exec_del(file_path_or_dir, del_type, dir_fd, size)
 
     def _exec_del_test(self, file_path_or_dir, del_type):
         del_type = "file" if del_type == self.DEL_TYPE_FILE else "dir"
-        self._logger.info(f"{self.action_prefix}{self.description} delete {del_type}: {file_path_or_dir}")
+        self._action_logger.info(f"{self.action_prefix}{self.description} delete {del_type}: {file_path_or_dir}")
+        return True
 
-    def _real_exec_del(self, file_path_or_dir, del_type):
+    def _real_exec_del(self, file_path_or_dir, del_type, dir_fd=None, size=None):
         """
         us python os api remove file or directory
+        with dir fd, only the name is resolved by kernel in the opened parent directory
         :param file_path_or_dir:
         :param del_type:
+        :param dir_fd: opened parent directory
+        :param size: bytes of file
         :return:
         """
         assert del_type in (self.DEL_TYPE_FILE, self.DEL_TYPE_DIR), f'delete type error:{del_type}'
 
+        path = file_path_or_dir if dir_fd is None else os.path.basename(file_path_or_dir)
         try:
             if del_type == self.DEL_TYPE_FILE:
                 file_type = "file"
-                os.remove(file_path_or_dir)
+                if self._truncate_in_chunks(path, dir_fd, size):
+                    size = None
+                self._acquire_rate_limit(1, size)
+                os.unlink(path, dir_fd=dir_fd)
             else:
                 file_type = 'dir'
-                os.rmdir(file_path_or_dir)
+                self._acquire_rate_limit(1)
+                os.rmdir(path, dir_fd=dir_fd)
 
-            self._logger.info(f"{self.action_prefix}{self.description} remove {file_type}: {file_path_or_dir} success")
+            self._action_logger.info(
+                f"{self.action_prefix}{self.description} remove {file_type}: {file_path_or_dir} success")
+            return True
         except Exception:
-            self._logger.error(
+            self._action_logger.error(
                 f'{self.action_prefix}{self.description} remove file or dir'
                 f': {file_path_or_dir} failed: {traceback.format_exc()}')
+            return False
+
+    def _truncate_in_chunks(self, path, dir_fd=None, size=None) -> bool:
+        """
+        truncate large file from the end chunk by chunk before unlink, every chunk waits for rate limiter,
+        so blocks of multi-GB file are freed gradually instead of in one unlink
+        file with other hard links is not truncated, its data is still used
+        :param path:
+        :param dir_fd:
+        :param size: bytes of file
+        :return: true if file truncated
+        """
+        chunk_bytes = self.rate_limiter.truncate_chunk_bytes if self.rate_limiter else None
+        if not chunk_bytes or (size is not None and size <= chunk_bytes):
+            return False
+
+        file_stat = os.stat(path, dir_fd=dir_fd, follow_symlinks=False)
+        if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_nlink > 1 or file_stat.st_size <= chunk_bytes:
+            return False
+
+        fd = os.open(path, os.O_WRONLY | getattr(os, 'O_NOFOLLOW', 0), dir_fd=dir_fd)
+        try:
+            remain_bytes = os.fstat(fd).st_size
+            while remain_bytes > 0:
+                truncate_bytes = min(chunk_bytes, remain_bytes)
+                self._acquire_rate_limit(0, truncate_bytes)
+                remain_bytes -= truncate_bytes
+                os.ftruncate(fd, remain_bytes)
+        finally:
+            os.close(fd)
+        return True
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: file_matcher_test
+:Author: xufeng
+:Date: 2021-08-13 11:05 AM
+:Version: v.1.0
+:Description:
+"""
+from common.file_matcher import FileNameMatcher
+
+
+def test_contains_match_same_as_loop():
+    suffixes = ['.log', '.out', '.gc', '.hprof', '.log.2021', 'nohup']
+    names = ['a.log', 'a.log.20210601', 'nohup.txt', 'x.txt', 'hs.hprof', 'x.g', 'gc.lo', '']
+
+    matcher = FileNameMatcher(suffixes)
+    for name in names:
+        assert matcher.match(name) == any(suffix in name for suffix in suffixes)
+
+
+def test_suffix_and_glob_match():
+    suffix_matcher = FileNameMatcher(['.log', '.out'], FileNameMatcher.MATCH_SUFFIX)
+    assert suffix_matcher.match('a.log')
+    assert not suffix_matcher.match('a.log.20210601')
+
+    glob_matcher = FileNameMatcher(['*.log.2021*', 'nohup.out'], FileNameMatcher.MATCH_GLOB)
+    assert glob_matcher.match('a.log.20210601')
+    assert glob_matcher.match('nohup.out')
+    assert not glob_matcher.match('a.log')
+    assert not glob_matcher.match('x.nohup.out')
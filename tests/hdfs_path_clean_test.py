@@ -0,0 +1,515 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: hdfs_path_clean_test
+:Author: xufeng
+:Date: 2021-08-20 4:50 PM
+:Version: v.1.0
+:Description:
+"""
+import json
+import os
+import posixpath
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+
+import pytest
+
+from cleaner import ProjectCleanerBuilder
+from common.fsimage import FsImageIndex
+from common.hdfs_fs import CachedHdfsFileSystem, ShellHdfsFileSystem, WebHdfsFileSystem
+from common.listing_cache import HdfsListingCache
+from common.logger_adaptor import LogAdaptor
+from common.rate_limiter import RateLimiter
+from common.utils import ExpireTimeDesc, HdfsQuotaDesc, HdfsTieringDesc
+from component.hdfs_path_cleaner import HDFSPathCleaner
+
+FAKE_HADOOP = '''#!{python}
+import glob, os, shutil, sys, time
+root = os.environ['FAKE_HDFS_ROOT']
+with open(os.environ['FAKE_HADOOP_CALLS'], 'a') as f:
+    f.write(' '.join(sys.argv[1:]) + '\\n')
+
+def size_of(path):
+    return sum(os.path.getsize(os.path.join(d, name)) for d, _, names in os.walk(path) for name in names)
+
+args = sys.argv[2:]
+if args[0] == '-ls':
+    for matched in sorted(glob.glob(root + args[1])):
+        for name in sorted(os.listdir(matched)):
+            mtime = time.strftime('%Y-%m-%d %H:%M', time.localtime(os.path.getmtime(os.path.join(matched, name))))
+            print(f'drwxr-xr-x   - p hive          0 {{mtime}} {{matched[len(root):]}}/{{name}}')
+elif args[0] == '-du':
+    for matched in sorted(glob.glob(root + args[1])):
+        for name in sorted(os.listdir(matched)):
+            size = size_of(os.path.join(matched, name))
+            print(f'{{size}}  {{size * 3}}  {{matched[len(root):]}}/{{name}}')
+elif args[0] == '-count':
+    size, quota = size_of(root + args[2]), int(os.environ['FAKE_SPACE_QUOTA'])
+    print(f'none inf {{quota}} {{quota - size * 3}} 1 1 {{size}} {{args[2]}}')
+elif args[0] == '-rm':
+    code = 0
+    for path in [arg for arg in args[1:] if not arg.startswith('-')]:
+        if not os.path.exists(root + path) or path.endswith('locked'):
+            print(f"rm: `{{path}}': Permission denied", file=sys.stderr)
+            code = 1
+        else:
+            shutil.rmtree(root + path)
+            print(f'Deleted {{path}}')
+    sys.exit(code)
+elif args[0] == '-setrep':
+    for path in args[2:]:
+        if not os.path.exists(root + path):
+            print(f"setrep: `{{path}}': No such file or directory", file=sys.stderr)
+            sys.exit(1)
+'''
+
+
+class FakeWebHdfsHandler(BaseHTTPRequestHandler):
+    """
+    in memory namenode, fs is {path: (is_dir, modification_time_ms, length)}
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self._handle()
+
+    def do_PUT(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def log_message(self, *args):
+        pass
+
+    def _handle(self):
+        self.server.client_ports.add(self.client_address[1])
+        url = urlparse(self.path)
+        path = unquote(url.path[len('/webhdfs/v1'):]).rstrip('/') or '/'
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        fs = self.server.fs
+        op = params['op']
+
+        if op in ('LISTSTATUS', 'GETFILESTATUS', 'GETCONTENTSUMMARY', 'DELETE', 'RENAME') and path not in fs:
+            return self._reply(404, {'RemoteException': {'exception': 'FileNotFoundException',
+                                                         'message': f'File does not exist: {path}'}})
+
+        if op == 'GETFILESTATUS':
+            return self._reply(200, {'FileStatus': self._status(path, '')})
+
+        if op == 'LISTSTATUS':
+            children = [p for p in fs if posixpath.dirname(p) == path and p != path] if fs[path][0] else [path]
+            statuses = [self._status(p, posixpath.basename(p) if p != path else '') for p in sorted(children)]
+            return self._reply(200, {'FileStatuses': {'FileStatus': statuses}})
+
+        if op == 'GETCONTENTSUMMARY':
+            length = sum(fs[p][2] for p in self._sub_paths(path))
+            return self._reply(200, {'ContentSummary': {'length': length}})
+
+        if op == 'DELETE':
+            for p in self._sub_paths(path):
+                del fs[p]
+            return self._reply(200, {'boolean': True})
+
+        if op == 'GETHOMEDIRECTORY':
+            return self._reply(200, {'Path': f"/user/{params.get('user.name', 'dr.who')}"})
+
+        if op == 'MKDIRS':
+            while path not in fs:
+                fs[path] = (True, 0, 0)
+                path = posixpath.dirname(path)
+            return self._reply(200, {'boolean': True})
+
+        if op == 'RENAME':
+            destination = params['destination']
+            if destination in fs:
+                return self._reply(200, {'boolean': False})
+            for p in self._sub_paths(path):
+                fs[destination + p[len(path):]] = fs.pop(p)
+            return self._reply(200, {'boolean': True})
+
+    def _status(self, path, path_suffix):
+        is_dir, modification_time, length = self.server.fs[path]
+        return {'pathSuffix': path_suffix, 'type': 'DIRECTORY' if is_dir else 'FILE',
+                'modificationTime': modification_time, 'length': length}
+
+    def _sub_paths(self, path):
+        return [p for p in list(self.server.fs) if p == path or p.startswith(path + '/')]
+
+    def _reply(self, status, result):
+        body = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _serve_webhdfs():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeWebHdfsHandler)
+    server.client_ports = set()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@pytest.fixture
+def webhdfs_server():
+    yield from _serve_webhdfs()
+
+
+@pytest.fixture
+def other_webhdfs_server():
+    yield from _serve_webhdfs()
+
+
+def test_delete_hdfs_path_with_webhdfs(webhdfs_server):
+    old_ms = int((time.time() - 200 * 24 * 3600) * 1000)
+    new_ms = int(time.time() * 1000)
+    webhdfs_server.fs = {
+        '/': (True, 0, 0),
+        '/user': (True, 0, 0),
+        '/user/p': (True, old_ms, 0),
+        '/user/p/old': (True, old_ms, 0),
+        '/user/p/old/part-0': (False, old_ms, 100),
+        '/user/p/new': (True, new_ms, 0),
+        '/user/p/new/part-0': (False, new_ms, 10),
+        '/user/p/tmp': (True, old_ms, 0),
+        '/user/p/tmp/a': (True, old_ms, 0),
+        '/user/p/tmp/a/part-0': (False, old_ms, 7),
+        '/user/p/tmp/b': (True, new_ms, 0),
+    }
+    url = f'http://127.0.0.1:{webhdfs_server.server_address[1]}'
+
+    summaries = ProjectCleanerBuilder() \
+        .with_hdfs_dirs(['/user/p/old', '/user/p/new'], skip_trash=True, webhdfs_url=url) \
+        .with_hdfs_dirs('hdfs://nameservice1/user/p/tmp/*', webhdfs_url=url, webhdfs_user='p') \
+        .build() \
+        .clean()
+
+    fs = webhdfs_server.fs
+    assert '/user/p/old' not in fs
+    assert '/user/p/new/part-0' in fs
+    assert [(summary.count, summary.bytes) for summary in summaries] == [(1, 100), (1, 7)]
+
+    # matched dir is replaced by its children as `hadoop fs -ls`, and moved to trash of user
+    assert '/user/p/tmp/a/part-0' not in fs
+    assert '/user/p/.Trash/Current/user/p/tmp/a/part-0' in fs
+    assert '/user/p/tmp/b' in fs
+
+    # every cleaner keeps one connection alive
+    assert len(webhdfs_server.client_ports) == 2
+
+
+def test_close_webhdfs_connections_after_clean(webhdfs_server):
+    ms = int((time.time() - 200 * 24 * 3600) * 1000)
+    webhdfs_server.fs = {'/': (True, 0, 0), '/user': (True, 0, 0), '/user/p': (True, ms, 0),
+                         '/user/p/old': (True, ms, 0)}
+    hdfs_fs = WebHdfsFileSystem(LogAdaptor(), f'http://127.0.0.1:{webhdfs_server.server_address[1]}')
+    summary = HDFSPathCleaner(LogAdaptor(), '/user/p/old', skip_trash=True, hdfs_fs=hdfs_fs).clean()
+
+    assert summary.count == 1
+    assert hdfs_fs._pool._idle.empty()
+
+
+def test_relative_path_of_webhdfs_is_under_home_directory(webhdfs_server):
+    webhdfs_server.fs = {'/': (True, 0, 0), '/user': (True, 0, 0), '/user/p': (True, 0, 0),
+                         '/user/p/a': (False, 0, 1), '/user/dr.who': (True, 0, 0), '/user/dr.who/b': (False, 0, 1)}
+    url = f'http://127.0.0.1:{webhdfs_server.server_address[1]}'
+
+    hdfs_fs = WebHdfsFileSystem(LogAdaptor(), url, user='p')
+    assert [status.path for status in hdfs_fs.list_status('a')] == ['/user/p/a']
+    hdfs_fs.close()
+
+    # home directory of request without user is asked from namenode and cached
+    hdfs_fs = WebHdfsFileSystem(LogAdaptor(), url)
+    assert [status.path for status in hdfs_fs.list_status('b')] == ['/user/dr.who/b']
+    assert [status.path for status in hdfs_fs.list_status('b*')] == ['/user/dr.who/b']
+    assert hdfs_fs.home_directory == '/user/dr.who'
+    hdfs_fs.close()
+
+
+def test_share_listing_cache_by_backends_of_different_namenodes(webhdfs_server, other_webhdfs_server):
+    webhdfs_server.fs = {'/': (True, 0, 0), '/user': (True, 0, 0), '/user/p': (True, 0, 0),
+                         '/user/p/a': (True, 0, 0), '/user/q': (True, 0, 0), '/user/q/b': (True, 0, 0)}
+    other_webhdfs_server.fs = {'/': (True, 0, 0), '/user': (True, 0, 0), '/user/p': (True, 0, 0),
+                               '/user/p/c': (True, 0, 0)}
+    url = f'http://127.0.0.1:{webhdfs_server.server_address[1]}'
+    other_url = f'http://127.0.0.1:{other_webhdfs_server.server_address[1]}'
+
+    listing_cache = HdfsListingCache()
+    backends = [WebHdfsFileSystem(LogAdaptor(), url, user='p'),
+                WebHdfsFileSystem(LogAdaptor(), other_url, user='p'),
+                WebHdfsFileSystem(LogAdaptor(), url, user='q')]
+    listings = []
+    for _ in range(2):
+        for backend in backends:
+            hdfs_fs = CachedHdfsFileSystem(backend, listing_cache)
+            listings.append([status.path for status in hdfs_fs.list_status('/user/p')])
+            listings.append([status.path for status in hdfs_fs.list_status(f'/user/{backend._user}')])
+
+    assert listings[:6] == [['/user/p/a'], ['/user/p/a'], ['/user/p/c'], ['/user/p/c'], ['/user/p/a'], ['/user/q/b']]
+    assert listings[6:] == listings[:6]
+    # same namenode and user shares listing
+    assert (listing_cache.hits, listing_cache.misses) == (8, 4)
+    for backend in backends:
+        backend.close()
+
+
+def test_listing_cache_set_again_not_nested():
+    backend = ShellHdfsFileSystem(LogAdaptor())
+    cleaner = HDFSPathCleaner(LogAdaptor(), ['/user/p'], hdfs_fs=backend)
+    listing_cache = HdfsListingCache()
+    cleaner.set_listing_cache(HdfsListingCache())
+    cleaner.set_listing_cache(listing_cache)
+
+    # cleaner is built again with the same builder, its backend is cached by the last cache only
+    assert cleaner._hdfs_fs._hdfs_fs is backend
+    assert cleaner._hdfs_fs._listing_cache is listing_cache
+
+
+@pytest.fixture
+def fake_hadoop(tmp_path, monkeypatch):
+    """
+    `hadoop` command on local dir, yield (local root of hdfs, file of hadoop calls)
+    """
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    hadoop = bin_dir / 'hadoop'
+    hadoop.write_text(FAKE_HADOOP.format(python=sys.executable))
+    hadoop.chmod(0o755)
+
+    root = tmp_path / 'hdfs'
+    calls = tmp_path / 'calls'
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv('FAKE_HDFS_ROOT', str(root))
+    monkeypatch.setenv('FAKE_HADOOP_CALLS', str(calls))
+    yield root, calls
+
+
+def test_delete_hdfs_paths_with_batched_rm(fake_hadoop):
+    root, calls = fake_hadoop
+    names = [f'dir_{i}' for i in range(6)] + ['dir_locked']
+    for name in names:
+        (root / 'user' / 'p' / name).mkdir(parents=True)
+
+    # every command holds at most 3 paths
+    hdfs_fs = ShellHdfsFileSystem(LogAdaptor(), max_command_length=len('hadoop fs -rm -r') + 3 * 17)
+    summary = HDFSPathCleaner(LogAdaptor(), [f'/user/p/{name}' for name in names], ignore_update_time=True,
+                              report_size=False, hdfs_fs=hdfs_fs).clean()
+
+    assert os.listdir(root / 'user' / 'p') == ['dir_locked']
+    assert summary.count == 6
+    rm_calls = [line for line in calls.read_text().splitlines() if line.startswith('fs -rm')]
+    assert len(rm_calls) == 3
+    assert rm_calls[0] == 'fs -rm -r /user/p/dir_0 /user/p/dir_1 /user/p/dir_2'
+
+
+def test_deprecated_hdfs_day_time_pattern_is_ignored():
+    expire_time = ExpireTimeDesc(0, 0, 1)
+    with pytest.warns(DeprecationWarning, match='hdfs_day_time_pattern'):
+        builder = ProjectCleanerBuilder().with_hdfs_dirs(['/user/p'], True, False, r'\d{4}-\d{2}-\d{2}', expire_time)
+    hdfs_cleaner = builder._cleaners[0]
+    assert hdfs_cleaner._skip_trash and hdfs_cleaner._expire_time is expire_time
+
+
+def test_rate_limit_batched_rm(fake_hadoop):
+    root, calls = fake_hadoop
+    names = [f'dir_{i}' for i in range(40)]
+    for name in names:
+        (root / 'user' / 'p' / name).mkdir(parents=True)
+
+    cleaner = HDFSPathCleaner(LogAdaptor(), [f'/user/p/{name}' for name in names], ignore_update_time=True,
+                              report_size=False)
+    cleaner.set_rate_limiter(RateLimiter(ops_per_second=20))
+    begin = time.monotonic()
+    summary = cleaner.clean()
+
+    # a batch holds at most 20 paths, the second one waits for the tokens of its 20 deletes
+    assert summary.count == 40
+    rm_calls = [line for line in calls.read_text().splitlines() if line.startswith('fs -rm')]
+    assert [len(line.split()) - 3 for line in rm_calls] == [20, 20]
+    assert time.monotonic() - begin >= 0.9
+
+
+def test_list_parent_once_and_match_exact_path(fake_hadoop):
+    root, calls = fake_hadoop
+    for name in ['dir_0', 'dir_1', 'dir_10']:
+        (root / 'user' / 'p' / name).mkdir(parents=True)
+
+    summary = HDFSPathCleaner(LogAdaptor(), ['/user/p/dir', '/user/p/dir_1/', '/user/p/dir_0'],
+                              ignore_update_time=True, report_size=False).clean()
+
+    # /user/p/dir does not exist, it does not match /user/p/dir_0 or /user/p/dir_10
+    assert sorted(os.listdir(root / 'user' / 'p')) == ['dir_10']
+    assert summary.count == 2
+    ls_calls = [line for line in calls.read_text().splitlines() if line.startswith('fs -ls')]
+    assert ls_calls == ['fs -ls /user/p']
+
+
+def test_share_listing_in_one_run(fake_hadoop):
+    root, calls = fake_hadoop
+    for name in ['dir_0', 'dir_1']:
+        (root / 'user' / 'p' / name).mkdir(parents=True)
+
+    pc = ProjectCleanerBuilder() \
+        .with_hdfs_dirs('/user/p/dir_0', ignore_update_time=True, report_size=False) \
+        .with_hdfs_dirs('/user/p/dir_1', ignore_update_time=True, report_size=False) \
+        .build()
+    assert len(list(pc.iter_candidates())) == 2
+    pc.clean()
+
+    # clean reuses the listing of iter candidates, until dir_0 deleted under it
+    assert os.listdir(root / 'user' / 'p') == []
+    ls_calls = [line for line in calls.read_text().splitlines() if line.startswith('fs -ls')]
+    assert ls_calls == ['fs -ls /user/p', 'fs -ls /user/p']
+    assert (pc.listing_cache.hits, pc.listing_cache.misses) == (2, 2)
+
+
+def test_list_and_delete_hdfs_paths_in_parallel(fake_hadoop):
+    root, calls = fake_hadoop
+    for parent in ['p', 'q', 'r/x', 'r/y']:
+        for i in range(3):
+            (root / 'user' / parent / f'dir_{i}').mkdir(parents=True)
+    hdfs_paths = ['/user/q/dir_2', '/user/r/*', '/user/p/dir_0', '/user/q/dir_0', '/user/p/dir_1']
+
+    cleaner = HDFSPathCleaner(LogAdaptor(), hdfs_paths, ignore_update_time=True, report_size=False, max_workers=4)
+    candidates = [candidate.target for candidate in cleaner.iter_candidates()]
+    assert candidates == ['/user/q/dir_2'] + [f'/user/r/{parent}/dir_{i}' for parent in 'xy' for i in range(3)] + \
+        ['/user/p/dir_0', '/user/q/dir_0', '/user/p/dir_1']
+
+    hdfs_fs = ShellHdfsFileSystem(LogAdaptor(), max_command_length=len('hadoop fs -rm -r') + 2 * 20)
+    summary = HDFSPathCleaner(LogAdaptor(), hdfs_paths, ignore_update_time=True, report_size=False,
+                              hdfs_fs=hdfs_fs, max_workers=4).clean()
+    assert summary.count == len(candidates)
+    assert list(summary.groups) == hdfs_paths
+    assert sorted(os.listdir(root / 'user' / 'p')) == ['dir_2']
+    assert sorted(os.listdir(root / 'user' / 'q')) == ['dir_1']
+    assert sorted(os.listdir(root / 'user' / 'r' / 'x')) == []
+
+    ls_calls = [line for line in calls.read_text().splitlines() if line.startswith('fs -ls')]
+    assert sorted(ls_calls) == sorted(['fs -ls /user/q', 'fs -ls /user/r/*', 'fs -ls /user/p'] * 2)
+
+
+def test_check_expire_offline_with_fsimage(fake_hadoop, tmp_path):
+    root, calls = fake_hadoop
+    for name in ['old', 'new', 'tmp/a/part-0', 'tmp/b']:
+        (root / 'user' / 'p' / name).mkdir(parents=True)
+
+    old_day = time.strftime('%Y-%m-%d %H:%M', time.localtime(time.time() - 200 * 24 * 3600))
+    new_day = time.strftime('%Y-%m-%d %H:%M')
+    rows = [
+        ('/user/p', 'd', new_day, 0),
+        ('/user/p/old', 'd', old_day, 0),
+        ('/user/p/old/part-0', '-', old_day, 100),
+        ('/user/p/old/sub/part-0', '-', old_day, 20),
+        ('/user/p/new', 'd', new_day, 0),
+        ('/user/p/new/part-0', '-', new_day, 10),
+        ('/user/p/tmp', 'd', new_day, 0),
+        ('/user/p/tmp/a', 'd', old_day, 0),
+        ('/user/p/tmp/a/part-0', '-', old_day, 7),
+        ('/user/p/tmp/b', 'd', new_day, 0),
+        ('/user/q/old', 'd', old_day, 0),
+    ]
+    fsimage = tmp_path / 'fsimage.txt'
+    lines = ['\t'.join(FsImageIndex.DEFAULT_COLUMNS)]
+    lines += [f'{path}\t3\t{day}\t{day}\t134217728\t1\t{size}\t0\t0\t{kind}rwxr-xr-x\tp\thive'
+              for path, kind, day, size in rows]
+    fsimage.write_text('\n'.join(lines) + '\n')
+
+    summaries = ProjectCleanerBuilder() \
+        .with_hdfs_dirs(['/user/p/old', '/user/p/new', '/user/p/tmp/*'], skip_trash=True,
+                        fsimage_path=str(fsimage)) \
+        .build() \
+        .clean()
+
+    assert [summary.groups for summary in summaries] == [{'/user/p/old': (1, 120), '/user/p/tmp/*': (1, 7)}]
+    # matched dir of wildcard path is replaced by its children as `hadoop fs -ls`
+    assert sorted(os.listdir(root / 'user' / 'p')) == ['new', 'tmp']
+    assert os.listdir(root / 'user' / 'p' / 'tmp' / 'a') == []
+
+    # only the delete goes to cluster
+    assert calls.read_text().splitlines() == ['fs -rm -r -skipTrash /user/p/old /user/p/tmp/a/part-0']
+
+
+def test_delete_oldest_paths_for_quota(fake_hadoop, monkeypatch):
+    root, calls = fake_hadoop
+    for name, days in [('d1', 200), ('d2', 50), ('d3', 20), ('d4', 1)]:
+        path = root / 'user' / 'p' / name
+        path.mkdir(parents=True)
+        (path / 'part-0').write_bytes(b'x' * 100)
+        os.utime(path, (time.time() - days * 24 * 3600,) * 2)
+
+    # 1200 space consumed with 3 replicas, target 750 need free 150 bytes of files
+    monkeypatch.setenv('FAKE_SPACE_QUOTA', '1500')
+    summaries = ProjectCleanerBuilder() \
+        .with_hdfs_dirs('/user/*', skip_trash=True, quota=HdfsQuotaDesc('/user/p', 0.5)) \
+        .build() \
+        .clean()
+
+    # d1 is expired, d2 is the oldest not expired
+    assert sorted(os.listdir(root / 'user' / 'p')) == ['d3', 'd4']
+    assert summaries[0].groups == {'/user/*': (2, 200)}
+    assert 'fs -count -q /user/p' in calls.read_text().splitlines()
+
+
+def test_lower_replication_of_aging_paths(fake_hadoop):
+    root, calls = fake_hadoop
+    for name, days in [('d1', 200), ('d2', 50), ('d3', 20), ('d4', 1)]:
+        path = root / 'user' / 'p' / name
+        path.mkdir(parents=True)
+        os.utime(path, (time.time() - days * 24 * 3600,) * 2)
+
+    # d1 is expired, d2 and d3 are not updated in 10 days
+    def build(replication=2):
+        return ProjectCleanerBuilder() \
+            .with_hdfs_dirs('/user/*', skip_trash=True, report_size=False,
+                            tiering=HdfsTieringDesc(ExpireTimeDesc(0, 0, 10), replication, None),
+                            tiering_index_path=str(root.parent / 'tiering.db')) \
+            .build()
+
+    build().test_clean()
+    assert not [line for line in calls.read_text().splitlines() if 'setrep' in line]
+
+    build().clean()
+    assert sorted(os.listdir(root / 'user' / 'p')) == ['d2', 'd3', 'd4']
+    assert [line for line in calls.read_text().splitlines() if 'setrep' in line] == \
+        ['fs -setrep 2 /user/p/d2 /user/p/d3']
+
+    # tiered paths not updated since are skipped, updated path or other replication is tiered again
+    build().clean()
+    os.utime(root / 'user' / 'p' / 'd3', (time.time() - 15 * 24 * 3600,) * 2)
+    build().clean()
+    build(1).clean()
+    assert [line for line in calls.read_text().splitlines() if 'setrep' in line] == \
+        ['fs -setrep 2 /user/p/d2 /user/p/d3', 'fs -setrep 2 /user/p/d3', 'fs -setrep 1 /user/p/d2 /user/p/d3']
+
+
+def test_delete_only_paths_under_quota_dir(fake_hadoop, monkeypatch):
+    root, calls = fake_hadoop
+    for name, days in [('p/d2', 50), ('p/d3', 20), ('q/e1', 60)]:
+        path = root / 'user' / name
+        path.mkdir(parents=True)
+        (path / 'part-0').write_bytes(b'x' * 100)
+        os.utime(path, (time.time() - days * 24 * 3600,) * 2)
+
+    # 600 space consumed of /user/p, target 500 need free 33 bytes of files
+    monkeypatch.setenv('FAKE_SPACE_QUOTA', '1000')
+    summaries = ProjectCleanerBuilder() \
+        .with_hdfs_dirs('/user/*', skip_trash=True, quota=HdfsQuotaDesc('/user/p', 0.5)) \
+        .build() \
+        .clean()
+
+    # q/e1 is the oldest, but it frees nothing of the quota of /user/p
+    assert os.listdir(root / 'user' / 'p') == ['d3']
+    assert os.listdir(root / 'user' / 'q') == ['e1']
+    assert summaries[0].groups == {'/user/*': (1, 100)}
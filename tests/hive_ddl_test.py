@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: hive_ddl_test
+:Author: xufeng
+:Date: 2021-08-26 5:10 PM
+:Version: v.1.0
+:Description:
+"""
+import os
+import sys
+
+import pytest
+
+from common.hdfs_fs import HdfsFileSystem
+from common.hive_ddl import HiveDdlExecutor, HiveServer2DdlExecutor, HiveScriptDdlExecutor
+from common.logger_adaptor import LogAdaptor
+from component.base_cleaner import CleanCandidate, CleanSummary
+from component.hive_table_cleaner import HiveTableCleaner, _HiveCandidate
+
+
+class StubHiveServer2:
+    """
+    in memory HiveServer2, records executed statements, connection closed by server fails its next statement
+    """
+
+    def __init__(self):
+        self.statements = []
+        self.connections = []
+
+    def connect(self):
+        conn = StubConnection(self)
+        self.connections.append(conn)
+        return conn
+
+
+class StubConnection:
+
+    def __init__(self, server: StubHiveServer2):
+        self.server = server
+        self.closed = False
+        self.closed_by_server = False
+
+    def cursor(self):
+        return StubCursor(self)
+
+    def close(self):
+        self.closed = True
+
+
+class StubCursor:
+
+    def __init__(self, conn: StubConnection):
+        self.conn = conn
+
+    def execute(self, statement):
+        if self.conn.closed_by_server:
+            raise Exception("connection reset")
+        if 'no_such_table' in statement:
+            raise Exception(f"Table not found: {statement}")
+        self.conn.server.statements.append(statement)
+
+    def close(self):
+        pass
+
+
+def test_execute_with_pooled_hive_server2_connections():
+    server = StubHiveServer2()
+    executor = HiveServer2DdlExecutor(LogAdaptor(), server.connect, pool_size=2)
+
+    executor.execute('drop table if exists db.t1')
+    executor.execute('drop table if exists db.t2')
+    assert len(server.connections) == 1
+
+    # idle connection closed by server is replaced
+    server.connections[0].closed_by_server = True
+    executor.execute('drop table if exists db.t3')
+    assert len(server.connections) == 2 and server.connections[0].closed
+
+    with pytest.raises(Exception):
+        executor.execute('drop table db.no_such_table')
+    assert server.connections[1].closed
+
+    executor.close()
+    assert server.statements == ['drop table if exists db.t1', 'drop table if exists db.t2',
+                                 'drop table if exists db.t3']
+    assert all(conn.closed for conn in server.connections)
+
+
+FAKE_HIVE = '''#!{python}
+import os, sys
+script = open(sys.argv[-1]).read()
+with open(os.environ['FAKE_HIVE_CALLS'], 'a') as f:
+    f.write(' '.join(sys.argv[1:-1]) + '\\n' + script)
+for statement in script.splitlines():
+    if 'no_such_table' in statement:
+        print('FAILED: SemanticException [Error 10001]: Table not found no_such_table', file=sys.stderr)
+        sys.exit(64)
+    print('OK', file=sys.stderr)
+    print('Time taken: 0.1 seconds', file=sys.stderr)
+'''
+
+
+@pytest.fixture
+def fake_hive(tmp_path, monkeypatch):
+    """
+    `hive -f` prints OK for every statement, fails at statement of no_such_table, yield file of hive calls
+    """
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+    hive = bin_dir / 'hive'
+    hive.write_text(FAKE_HIVE.format(python=sys.executable))
+    hive.chmod(0o755)
+    calls = tmp_path / 'calls'
+    monkeypatch.setenv('PATH', f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv('FAKE_HIVE_CALLS', str(calls))
+    yield calls
+
+
+def test_close_hive_server2_connections_with_cleaner():
+    server = StubHiveServer2()
+    cleaner = HiveTableCleaner(LogAdaptor(), None, 'db', '/warehouse/db.db', clear_tables='t',
+                               ddl_executor=HiveServer2DdlExecutor(LogAdaptor(), server.connect))
+    assert cleaner._exec_del('t', HiveTableCleaner.DELETE_TYPE_TABLE)
+    assert not server.connections[0].closed
+
+    cleaner.close()
+    assert server.statements == ['drop table if exists db.t']
+    assert server.connections[0].closed
+
+
+def test_execute_statements_with_one_hive_script(fake_hive, tmp_path):
+    calls = fake_hive
+    executor = HiveScriptDdlExecutor(LogAdaptor(), script_dir=str(tmp_path))
+    assert executor.flush() == {}
+    executor.execute('drop table if exists db.t1')
+    executor.execute("alter table db.t2 drop partition (dt='20210101')")
+    assert not calls.exists()
+
+    assert executor.flush() == {}
+    assert calls.read_text().splitlines() == [
+        '-f',
+        'drop table if exists db.t1;',
+        "alter table db.t2 drop partition (dt='20210101');"]
+    # script is removed after executed
+    assert [path.name for path in tmp_path.iterdir() if path.suffix == '.sql'] == []
+
+
+def test_report_failed_and_not_executed_statements_of_hive_script(fake_hive, tmp_path):
+    executor = HiveScriptDdlExecutor(LogAdaptor(), script_dir=str(tmp_path))
+    for table_name in ['t1', 'no_such_table', 't3']:
+        executor.execute(f'drop table db.{table_name}')
+
+    errors = executor.flush()
+    assert list(errors) == ['drop table db.no_such_table', 'drop table db.t3']
+    assert errors['drop table db.no_such_table'].startswith('FAILED: SemanticException')
+
+
+class RecordingHdfsFileSystem(HdfsFileSystem):
+    """
+    records deleted paths
+    """
+
+    def __init__(self):
+        self.deleted_paths = []
+
+    def list_status(self, hdfs_path) -> list:
+        return []
+
+    def delete(self, hdfs_path, skip_trash=False):
+        self.deleted_paths.append(hdfs_path)
+
+    def du(self, hdfs_path, summarize=False) -> dict:
+        return {}
+
+
+def test_remove_outer_table_dirs_after_deferred_drop_success(fake_hive, tmp_path):
+    hdfs_fs = RecordingHdfsFileSystem()
+    cleaner = HiveTableCleaner(LogAdaptor(), None, 'db', '/warehouse/db.db', is_inner_table=False, skip_trash=True,
+                               clear_tables='*', ddl_executor=HiveScriptDdlExecutor(LogAdaptor()))
+    cleaner._hdfs_fs = hdfs_fs
+
+    candidates = {}
+    for table_name in ['t1', 'no_such_table']:
+        candidates[table_name] = [_HiveCandidate(f'db.{table_name}', CleanCandidate.KIND_HIVE_TABLE,
+                                                 root=f'db.{table_name}', table_name=table_name)]
+        assert cleaner._exec_del_candidates(table_name, candidates[table_name])
+    # nothing removed before the drop statements executed
+    assert hdfs_fs.deleted_paths == []
+
+    summary = CleanSummary(cleaner)
+    cleaner._flush_deferred(candidates, summary)
+    assert hdfs_fs.deleted_paths == ['/warehouse/db.db/t1']
+    assert summary.count == 1
+
+
+class RecordingDdlExecutor(HiveDdlExecutor):
+    """
+    records statements, statement contains a failed partition raises
+    """
+
+    def __init__(self, failed_partition):
+        self.failed_partition = failed_partition
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(statement)
+        if self.failed_partition in statement:
+            raise Exception(f"drop partition {self.failed_partition} failed")
+
+
+class RecordingLogAdaptor(LogAdaptor):
+    """
+    records error messages
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.errors = []
+
+    def error(self, msg):
+        self.errors.append(msg)
+        super().error(msg)
+
+
+def test_drop_partitions_in_chunks_and_retry_failed_chunk():
+    executor = RecordingDdlExecutor("hour='02'")
+    logger = RecordingLogAdaptor()
+    cleaner = HiveTableCleaner(logger, None, 'db', '/warehouse/db.db', clear_tables='t', skip_trash=True,
+                               ddl_executor=executor, partition_chunk_size=2)
+
+    partitions = [f'dt=20210721/hour=0{i}' for i in range(5)]
+    assert not cleaner._exec_del('t', HiveTableCleaner.DELETE_TYPE_PARTITION, is_time_sorted_partition=False,
+                                 delete_partitions=partitions)
+    assert executor.statements == [
+        "alter table db.t drop partition (dt='20210721', hour='00'), partition (dt='20210721', hour='01') purge",
+        "alter table db.t drop partition (dt='20210721', hour='02'), partition (dt='20210721', hour='03') purge",
+        "alter table db.t drop partition (dt='20210721', hour='02') purge",
+        "alter table db.t drop partition (dt='20210721', hour='03') purge",
+        "alter table db.t drop partition (dt='20210721', hour='04') purge"]
+
+    # failed partition is logged with its traceback
+    errors = [msg for msg in logger.errors if 'drop partition dt=20210721/hour=02 of db.t failed' in msg]
+    assert len(errors) == 1 and 'Traceback' in errors[0]
+
+
+def test_drop_partitions_of_failed_chunk_one_by_one_after_hive_script(fake_hive, tmp_path):
+    calls = fake_hive
+    cleaner = HiveTableCleaner(LogAdaptor(), None, 'db', '/warehouse/db.db', clear_tables='*', skip_trash=True,
+                               ddl_executor=HiveScriptDdlExecutor(LogAdaptor()), partition_chunk_size=2)
+
+    candidates = {}
+    for table_name, partitions in [('t1', ['dt=a', 'dt=no_such_table']), ('t2', ['dt=b', 'dt=c'])]:
+        candidates[table_name] = [_HiveCandidate(f'db.{table_name}/{partition}', CleanCandidate.KIND_HIVE_PARTITION,
+                                                 root=f'db.{table_name}', table_name=table_name)
+                                  for partition in partitions]
+        assert cleaner._exec_del(table_name, HiveTableCleaner.DELETE_TYPE_PARTITION, is_time_sorted_partition=False,
+                                 delete_partitions=partitions)
+
+    summary = CleanSummary(cleaner)
+    cleaner._flush_deferred(candidates, summary)
+    # statement not executed runs before the partitions of failed chunk, only t1 failed
+    assert [line for line in calls.read_text().splitlines() if line != '-f'] == [
+        "alter table db.t1 drop partition (dt='a'), partition (dt='no_such_table') purge;",
+        "alter table db.t2 drop partition (dt='b'), partition (dt='c') purge;",
+        "alter table db.t2 drop partition (dt='b'), partition (dt='c') purge;",
+        "alter table db.t1 drop partition (dt='a') purge;",
+        "alter table db.t1 drop partition (dt='no_such_table') purge;"]
+    assert summary.count == 2 and list(summary.groups) == ['db.t2']
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: hive_metastore_test
+:Author: xufeng
+:Date: 2021-08-27 2:10 PM
+:Version: v.1.0
+:Description:
+"""
+import posixpath
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+from common.hdfs_fs import HdfsFileStatus, HdfsFileSystem
+from common.hive_ddl import HiveDdlExecutor
+from common.hive_metastore import SparkHiveMetastore
+from common.logger_adaptor import LogAdaptor
+from common.utils import ExpireTimeDesc
+from component.hive_table_cleaner import HiveTableCleaner
+
+
+class StubSeq(list):
+    """
+    java list and scala seq
+    """
+
+    def add(self, item):
+        self.append(item)
+
+    def iterator(self):
+        items = iter(self)
+        sentinel = object()
+        state = {'next': next(items, sentinel)}
+
+        def has_next():
+            return state['next'] is not sentinel
+
+        def next_item():
+            item, state['next'] = state['next'], next(items, sentinel)
+            return item
+        return SimpleNamespace(hasNext=has_next, next=next_item)
+
+
+class StubCatalog:
+    """
+    external catalog of tables {name: (partition columns, [{column: value}])},
+    filter of listPartitionsByFilter is a function of partition spec
+    """
+
+    def __init__(self, tables, batch=True):
+        self.tables = tables
+        self.batch = batch
+        self.filters = []
+
+    def listTables(self, db_name):
+        return StubSeq(self.tables)
+
+    def getTablesByName(self, db_name, table_names):
+        if not self.batch:
+            raise Exception("getTablesByName is not a member of ExternalCatalog")
+        return StubSeq(self.getTable(db_name, table_name) for table_name in table_names)
+
+    def getTable(self, db_name, table_name):
+        return SimpleNamespace(identifier=lambda: SimpleNamespace(table=lambda: table_name),
+                               partitionColumnNames=lambda: StubSeq(self.tables[table_name][0]))
+
+    def listPartitionsByFilter(self, db_name, table_name, predicates, time_zone):
+        self.filters.append((f'{db_name}.{table_name}', [predicate.sql for predicate in predicates], time_zone))
+        return StubSeq(SimpleNamespace(spec=lambda spec=spec: SimpleNamespace(apply=spec.get))
+                       for spec in self.tables[table_name][1] if all(predicate(spec) for predicate in predicates))
+
+
+class StubSparkContext:
+    """
+    fair scheduler, local properties are of current thread
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def setLocalProperty(self, key, value):
+        self._local.__dict__[key] = value
+
+    def getLocalProperty(self, key):
+        return self._local.__dict__.get(key)
+
+    @staticmethod
+    def getConf():
+        return {'spark.scheduler.mode': 'FAIR'}
+
+
+class StubSpark:
+    """
+    SparkSession with stub jvm, predicate is resolved by `spark.table(...).filter(...)` to a function of spec,
+    only `column < 'value'` is supported
+    """
+
+    def __init__(self, catalog):
+        self._jvm = SimpleNamespace(
+            java=SimpleNamespace(util=SimpleNamespace(ArrayList=StubSeq)),
+            scala=SimpleNamespace(collection=SimpleNamespace(JavaConverters=SimpleNamespace(
+                asScalaBufferConverter=lambda j_list: SimpleNamespace(
+                    asScala=lambda: SimpleNamespace(toSeq=lambda: j_list))))))
+        self._jsparkSession = SimpleNamespace(
+            sharedState=lambda: SimpleNamespace(externalCatalog=lambda: catalog))
+        self._jsc = SimpleNamespace(hadoopConfiguration=lambda: None)
+        self.conf = SimpleNamespace(get=lambda key: 'Asia/Shanghai')
+        self.sparkContext = StubSparkContext()
+
+    def table(self, table_name):
+        return SimpleNamespace(filter=self._filter)
+
+    @staticmethod
+    def _filter(predicate):
+        column, value = [item.strip(" `'") for item in predicate.split('<')]
+
+        class Condition:
+            sql = predicate
+
+            def __call__(self, spec):
+                return spec[column] < value
+
+        analyzed = SimpleNamespace(condition=Condition)
+        return SimpleNamespace(_jdf=SimpleNamespace(queryExecution=lambda: SimpleNamespace(analyzed=lambda: analyzed)))
+
+
+def test_list_tables_and_partition_columns_from_metastore():
+    tables = {'t1': (['dt'], []), 't2': ([], [])}
+    for batch in (True, False):
+        metastore = SparkHiveMetastore(LogAdaptor(), StubSpark(StubCatalog(tables, batch=batch)))
+        assert metastore.list_tables('db') == ['t1', 't2']
+        assert metastore.get_partition_columns('db', ['t1', 't2']) == {'t1': ['dt'], 't2': []}
+        assert metastore.get_partition_columns('db', []) == {}
+
+
+def test_list_partitions_by_filter_pushed_down():
+    specs = [{'dt': '20210722', 'event': 'a/b'}, {'dt': '20210720', 'event': 'a=b'}, {'dt': '20210721', 'event': 'c'}]
+    catalog = StubCatalog({'t': (['dt', 'event'], specs)})
+    metastore = SparkHiveMetastore(LogAdaptor(), StubSpark(catalog))
+
+    # partition dir names are escaped as spark
+    assert metastore.list_partitions('db', 't', ['dt', 'event']) == [
+        'dt=20210720/event=a%3Db', 'dt=20210721/event=c', 'dt=20210722/event=a%2Fb']
+    assert metastore.list_partitions('db', 't', ['dt', 'event'], "`dt` < '20210722'") == [
+        'dt=20210720/event=a%3Db', 'dt=20210721/event=c']
+    assert catalog.filters == [('db.t', [], 'Asia/Shanghai'), ('db.t', ["`dt` < '20210722'"], 'Asia/Shanghai')]
+    assert list(metastore.timings) == ['db.t']
+
+
+def _get_expire_predicate(partition_columns, partition_field_format='%Y%m%d',
+                          check_time_type=HiveTableCleaner.CHECK_TIME_PARTITION_FIELD):
+    cleaner = HiveTableCleaner(LogAdaptor(), None, 'db', '/warehouse/db.db', clear_tables='t',
+                               check_time_type=check_time_type, partition_field_format=partition_field_format,
+                               expire_time=ExpireTimeDesc(0, 0, 30))
+    cleaner.expire_time = datetime(2021, 7, 1, 8, 30)
+    return cleaner._get_expire_predicate(partition_columns)
+
+
+def test_expire_predicate_of_time_sorted_partition_field():
+    assert _get_expire_predicate(['dt']) == "`dt` < '20210701'"
+    assert _get_expire_predicate(['dt'], '%Y-%m-%d %H') == "`dt` < '2021-07-01 08'"
+    assert _get_expire_predicate(['p_date'], 'day_%Y%m%d') == "`p_date` < 'day_20210701'"
+
+
+def test_no_expire_predicate_of_not_sorted_format_or_many_columns():
+    # partitions of these tables are listed all and checked one by one
+    assert _get_expire_predicate(['dt'], '%d%m%Y') is None
+    assert _get_expire_predicate(['dt'], '%Y%d') is None
+    assert _get_expire_predicate(['dt'], 'latest') is None
+    assert _get_expire_predicate(['dt', 'hour']) is None
+    assert _get_expire_predicate(['dt'], check_time_type=HiveTableCleaner.CHECK_TIME_HDFS_UPDATE_TIME) is None
+
+
+def test_quote_column_and_value_of_expire_predicate():
+    assert _get_expire_predicate(['d`t']) == "`d``t` < '20210701'"
+    assert _get_expire_predicate(['dt'], "%Y'%m\\%d") == "`dt` < '2021\\'07\\\\01'"
+
+
+class RecordingDdlExecutor(HiveDdlExecutor):
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+
+class RecordingHdfsFileSystem(HdfsFileSystem):
+    """
+    dirs updated 400 days ago, records deleted paths and the scheduler pool of every call
+    """
+
+    def __init__(self, spark: StubSpark, dirs):
+        self.spark = spark
+        self.dirs = dirs
+        self.calls = []
+        self.deleted_paths = []
+
+    def _record(self, op, hdfs_path):
+        self.calls.append((op, hdfs_path, self.spark.sparkContext.getLocalProperty('spark.scheduler.pool')))
+        # let other workers start
+        time.sleep(0.01)
+
+    def list_status(self, hdfs_path) -> list:
+        self._record('ls', hdfs_path)
+        return [HdfsFileStatus(path, True, time.time() - 400 * 24 * 3600)
+                for path in self.dirs if posixpath.dirname(path) == hdfs_path.rstrip('/')]
+
+    def delete(self, hdfs_path, skip_trash=False):
+        self.deleted_paths.append(hdfs_path)
+
+    def du(self, hdfs_path, summarize=False) -> dict:
+        self._record('du', hdfs_path)
+        return {}
+
+
+def test_check_tables_concurrently_in_own_scheduler_pools():
+    partitioned = {f'p{i}': (['dt'], [{'dt': '20210101'}, {'dt': '29990101'}]) for i in range(4)}
+    not_partitioned = {f't{i}': ([], []) for i in range(2)}
+    tables = {**partitioned, **not_partitioned}
+    spark = StubSpark(StubCatalog(tables))
+    cleaner = HiveTableCleaner(LogAdaptor(), spark, 'db', '/warehouse/db.db', clear_tables='*', max_workers=3)
+    hdfs_fs = RecordingHdfsFileSystem(spark, [f'/warehouse/db.db/{table_name}' for table_name in tables])
+    cleaner._hdfs_fs = hdfs_fs
+
+    assert [c.target for c in cleaner.iter_candidates()] == \
+        [f'db.p{i}/dt=20210101' for i in range(4)] + ['db.t0', 'db.t1']
+
+    # warehouse is listed and du once before workers start, out of any pool
+    assert [call for call in hdfs_fs.calls if call[2] is None] == [('du', '/warehouse/db.db/', None),
+                                                                   ('ls', '/warehouse/db.db/', None)]
+    worker_calls = [call for call in hdfs_fs.calls if call[2] is not None]
+    assert sorted(path for _, path, _ in worker_calls) == [f'/warehouse/db.db/p{i}' for i in range(4)]
+    pools = {pool for _, _, pool in worker_calls}
+    assert len(pools) > 1 and pools <= {'hive_cleaner_0', 'hive_cleaner_1', 'hive_cleaner_2'}
+
+
+def test_count_dirs_match_no_partition_only_when_removed():
+    tables = {'t': (['dt'], [{'dt': 'a'}])}
+    dirs = ['/warehouse/db.db/t', '/warehouse/db.db/t/dt=a', '/warehouse/db.db/t/_tmp']
+
+    def clean(is_inner_table):
+        spark = StubSpark(StubCatalog(tables))
+        executor = RecordingDdlExecutor()
+        cleaner = HiveTableCleaner(LogAdaptor(), spark, 'db', '/warehouse/db.db', clear_tables='t', skip_trash=True,
+                                   is_inner_table=is_inner_table, report_size=False, ddl_executor=executor,
+                                   check_time_type=HiveTableCleaner.CHECK_TIME_HDFS_UPDATE_TIME)
+        hdfs_fs = RecordingHdfsFileSystem(spark, dirs)
+        cleaner._hdfs_fs = hdfs_fs
+        return cleaner.clean(), executor, hdfs_fs
+
+    # drop partition of inner table never removes the dir of no partition
+    summary, executor, hdfs_fs = clean(is_inner_table=True)
+    assert summary.count == 1
+    assert executor.statements == ["alter table db.t drop partition (dt='a') purge"]
+    assert hdfs_fs.deleted_paths == []
+
+    summary, executor, hdfs_fs = clean(is_inner_table=False)
+    assert summary.count == 2
+    assert executor.statements == ["alter table db.t drop partition (dt='a')"]
+    assert hdfs_fs.deleted_paths == ['/warehouse/db.db/t/dt=a', '/warehouse/db.db/t/_tmp']
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: listing_cache_test
+:Author: xufeng
+:Date: 2021-08-23 4:30 PM
+:Version: v.1.0
+:Description:
+"""
+import time
+
+from common.hdfs_fs import HdfsFileStatus
+from common.listing_cache import HdfsListingCache
+
+
+def test_listing_cache_ttl_lru_and_invalidate(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+
+    statuses = [HdfsFileStatus('/user/p/a', True, 0), HdfsFileStatus('/user/p/b', True, 0)]
+    cache = HdfsListingCache(ttl_seconds=10, max_bytes=3 * HdfsListingCache.STATUS_BYTES + 40)
+
+    assert cache.get('fs', '/user/p') is None
+    cache.put('fs', '/user/p/', statuses)
+    assert [status.path for status in cache.get('fs', '//user/p')] == ['/user/p/a', '/user/p/b']
+    assert cache.get('other', '/user/p') is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # ttl
+    now[0] += 11
+    assert cache.get('fs', '/user/p') is None
+
+    # least recently used is evicted when memory exceeds
+    cache.put('fs', '/user/p', statuses[:1])
+    cache.put('fs', '/user/q', statuses[1:])
+    assert cache.evictions == 1
+    assert cache.get('fs', '/user/p') is None
+    assert cache.get('fs', '/user/q') is not None
+
+    # path, its ancestors, descendants and matched wildcard paths are invalidated
+    cache = HdfsListingCache()
+    for path in ['/user', '/user/p', '/user/p/a/x', '/user/*/a', '/user/pp', 'hdfs://ns1/user/p']:
+        cache.put('fs', path, statuses)
+    cache.invalidate('/user/p/a')
+    assert [path for path in ['/user', '/user/p', '/user/p/a/x', '/user/*/a', '/user/pp', 'hdfs://ns1/user/p']
+            if cache.get('fs', path) is not None] == ['/user/pp']
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: local_clean_daemon_test
+:Author: xufeng
+:Date: 2021-08-18 4:30 PM
+:Version: v.1.0
+:Description:
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from common.inotify import Inotify
+from common.logger_adaptor import LogAdaptor
+from component.local_clean_daemon import LocalCleanDaemon
+
+
+def wait_until(check, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if check():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.mark.skipif(not Inotify.is_supported(), reason="inotify not supported")
+def test_delete_expired_file_with_inotify(tmp_path):
+    old_time = time.time() - 30 * 24 * 3600
+    old_log = tmp_path / 'old.log'
+    old_log.write_text('test')
+    os.utime(old_log, (old_time, old_time))
+    (tmp_path / 'keep.text').write_text('test')
+
+    daemon = LocalCleanDaemon(LogAdaptor(), str(tmp_path))
+    stop_event = threading.Event()
+    thread = threading.Thread(target=daemon.run, args=(stop_event,))
+    thread.start()
+    try:
+        # deleted by initial scan
+        assert wait_until(lambda: not old_log.exists())
+
+        new_log = tmp_path / 'new.log'
+        new_log.write_text('test')
+        nested_log = tmp_path / 'a' / 'b' / 'nested.log'
+        nested_log.parent.mkdir(parents=True)
+        nested_log.write_text('test')
+        os.utime(nested_log, (old_time, old_time))
+        moved_log = tmp_path / 'a' / 'moved.log'
+        (tmp_path / 'tmp.text').write_text('test')
+        os.utime(tmp_path / 'tmp.text', (old_time, old_time))
+        os.rename(tmp_path / 'tmp.text', moved_log)
+
+        assert wait_until(lambda: not nested_log.exists() and not moved_log.exists())
+        assert new_log.exists()
+    finally:
+        stop_event.set()
+        thread.join()
+
+    assert not thread.is_alive()
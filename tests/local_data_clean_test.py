@@ -7,10 +7,18 @@
 :Version: v.1.0
 :Description:
 """
+import gzip
+import heapq
 import os
+import time
+
+import pytest
 
 from cleaner import ProjectCleanerBuilder
-from common.utils import ShellUtil, LogAdaptor
+from common.file_matcher import FileNameMatcher
+from common.utils import ShellUtil, LogAdaptor, DiskBudgetDesc, ExpireTimeDesc
+from component.base_cleaner import CleanCandidate
+from component.local_data_cleaner import LocalDataCleaner, _compress_file
 
 
 def test_delete_local_path():
@@ -52,5 +60,280 @@ def test_delete_local_path():
     os.rmdir(test_dir)
 
 
+def test_delete_expire_file_in_nested_dir(tmp_path, monkeypatch):
+    old_time = time.time() - 30 * 24 * 3600
+    nested_dir = tmp_path / 'a' / 'b' / 'c'
+    keep_dir = tmp_path / 'a' / 'keep'
+    nested_dir.mkdir(parents=True)
+    keep_dir.mkdir()
+
+    old_log = nested_dir / 'old.log'
+    new_log = keep_dir / 'new.log'
+    old_text = keep_dir / 'old.text'
+    for f in (old_log, new_log, old_text):
+        f.write_text('test')
+    for f in (old_log, old_text):
+        os.utime(f, (old_time, old_time))
+
+    scan_dirs = []
+    scandir = os.scandir
+
+    def count_scandir(path):
+        scan_dirs.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', count_scandir)
+    ProjectCleanerBuilder() \
+        .with_log_paths(local_paths=str(tmp_path)) \
+        .build() \
+        .clean()
+    monkeypatch.undo()
+
+    # every directory is listed only once
+    assert len(scan_dirs) == 5
+
+    # empty dirs removed bottom-up, dir with remain file kept
+    assert not (tmp_path / 'a' / 'b').exists()
+    assert new_log.exists()
+    assert old_text.exists()
+
+
+def test_parallel_delete_local_path(tmp_path):
+    old_time = time.time() - 30 * 24 * 3600
+    for root in ('r1', 'r2'):
+        for sub in ('a', 'b', 'c'):
+            sub_dir = tmp_path / root / sub / 'd'
+            sub_dir.mkdir(parents=True)
+            for i in range(10):
+                log_file = sub_dir / f'{i}.log'
+                log_file.write_text('test')
+                os.utime(log_file, (old_time, old_time))
+    keep_file = tmp_path / 'r2' / 'c' / 'keep.text'
+    keep_file.write_text('test')
+
+    ProjectCleanerBuilder() \
+        .with_log_paths(local_paths=[str(tmp_path / 'r1'), str(tmp_path / 'r2')], max_workers=4) \
+        .build() \
+        .clean()
+
+    assert not (tmp_path / 'r1').exists()
+    assert os.listdir(tmp_path / 'r2') == ['c']
+    assert os.listdir(tmp_path / 'r2' / 'c') == ['keep.text']
+
+
+def test_skip_unchanged_dir_with_index(tmp_path, monkeypatch):
+    log_dir = tmp_path / 'logs'
+    (log_dir / 'a').mkdir(parents=True)
+    (log_dir / 'b').mkdir()
+    (log_dir / 'a' / 'new.log').write_text('test')
+    (log_dir / 'b' / 'new.log').write_text('test')
+    index_path = str(tmp_path / 'index' / 'dir_index.db')
+
+    def clean():
+        ProjectCleanerBuilder() \
+            .with_log_paths(local_paths=str(log_dir), index_path=index_path) \
+            .build() \
+            .clean()
+
+    clean()
+
+    scan_dirs = []
+    scandir = os.scandir
+
+    def count_scandir(path):
+        scan_dirs.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', count_scandir)
+    clean()
+    assert not scan_dirs
+
+    old_time = time.time() - 30 * 24 * 3600
+    old_log = log_dir / 'b' / 'old.log'
+    old_log.write_text('test')
+    os.utime(old_log, (old_time, old_time))
+    clean()
+    monkeypatch.undo()
+
+    assert len(scan_dirs) == 1
+    assert not old_log.exists()
+    assert (log_dir / 'a' / 'new.log').exists()
+
+
+def test_delete_oldest_file_for_disk_budget(tmp_path):
+    now = time.time()
+    for i in range(5):
+        log_file = tmp_path / f'{i}.log'
+        log_file.write_text('x' * 100)
+        os.utime(log_file, (now - (5 - i) * 3600, now - (5 - i) * 3600))
+    (tmp_path / 'big.text').write_text('x' * 1000)
+
+    ProjectCleanerBuilder() \
+        .with_log_paths(local_paths=str(tmp_path), disk_budget=DiskBudgetDesc(max_bytes=250, min_free_percent=None)) \
+        .build() \
+        .clean()
+
+    assert sorted(os.listdir(tmp_path)) == ['3.log', '4.log', 'big.text']
+
+
+def test_disk_budget_candidates_exclude_expired_files(tmp_path, monkeypatch):
+    now = time.time()
+    for i, days in enumerate([40, 3, 2, 1]):
+        log_file = tmp_path / f'{i}.log'
+        log_file.write_text('x' * 100)
+        os.utime(log_file, (now - days * 24 * 3600, now - days * 24 * 3600))
+
+    heap_sizes = []
+    heappush = heapq.heappush
+    monkeypatch.setattr(heapq, 'heappush', lambda heap, item: heappush(heap, item) or heap_sizes.append(len(heap)))
+
+    # 0.log is expired, only 100 bytes of the other files need free
+    pc = ProjectCleanerBuilder() \
+        .with_log_paths(local_paths=str(tmp_path), expire_time=ExpireTimeDesc(0, 0, 30),
+                        disk_budget=DiskBudgetDesc(max_bytes=200, min_free_percent=None)) \
+        .build()
+    assert [os.path.basename(c.target) for _, c in pc.iter_candidates()] == ['0.log', '1.log']
+    # bytes need to free is known before walk, heap keeps only the oldest file enough to free
+    assert max(heap_sizes) == 2
+
+    pc.clean()
+    assert sorted(os.listdir(tmp_path)) == ['2.log', '3.log']
+
+
+def test_iter_local_candidates(tmp_path):
+    old_time = time.time() - 30 * 24 * 3600
+    sub_dir = tmp_path / 'sub'
+    sub_dir.mkdir()
+    old_log = sub_dir / 'old.log'
+    old_log.write_text('x' * 10)
+    os.utime(old_log, (old_time, old_time))
+    (tmp_path / 'new.log').write_text('test')
+
+    cleaner = LocalDataCleaner(LogAdaptor(), str(tmp_path))
+    candidates = list(cleaner.iter_candidates())
+
+    assert [(c.target, c.kind) for c in candidates] == [
+        (str(old_log), CleanCandidate.KIND_FILE), (str(sub_dir), CleanCandidate.KIND_DIR)]
+    assert candidates[0].size == 10
+    assert int(candidates[0].timestamp) == int(old_time)
+
+    # nothing deleted by iteration
+    assert old_log.exists()
+
+
+def test_report_cleaned_count_and_bytes(tmp_path):
+    old_time = time.time() - 30 * 24 * 3600
+    for root in ('r1', 'r2'):
+        (tmp_path / root).mkdir()
+        for i in range(3):
+            log_file = tmp_path / root / f'{i}.log'
+            log_file.write_text('x' * 10)
+            os.utime(log_file, (old_time, old_time))
+    (tmp_path / 'r2' / 'new.log').write_text('test')
+
+    def build():
+        return ProjectCleanerBuilder() \
+            .with_log_paths(local_paths=[str(tmp_path / 'r1'), str(tmp_path / 'r2')]) \
+            .build()
+
+    summary, = build().test_clean()
+    assert (summary.count, summary.bytes) == (6, 60)
+    assert (tmp_path / 'r1' / '0.log').exists()
+
+    summary, = build().clean()
+    assert (summary.count, summary.bytes) == (6, 60)
+    assert summary.groups[str(tmp_path / 'r2')] == (3, 30)
+
+
+def test_compress_then_expire_log(tmp_path):
+    now = time.time()
+    ages = {'new.log': 0, 'warm.log': 5, 'old.log': 40}
+    for name, days in ages.items():
+        log_file = tmp_path / name
+        log_file.write_text(name * 100)
+        os.utime(log_file, (now - days * 24 * 3600, now - days * 24 * 3600))
+    warm_mtime = os.stat(tmp_path / 'warm.log').st_mtime
+
+    ProjectCleanerBuilder() \
+        .with_log_paths(local_paths=str(tmp_path),
+                        expire_time=ExpireTimeDesc(0, 0, 30),
+                        default_suffix=['.log'],
+                        suffix_match_mode=FileNameMatcher.MATCH_SUFFIX,
+                        compress_after_days=2,
+                        compress_workers=2) \
+        .build() \
+        .clean()
+
+    assert sorted(os.listdir(tmp_path)) == ['new.log', 'warm.log.gz']
+    with gzip.open(tmp_path / 'warm.log.gz', 'rt') as f:
+        assert f.read() == 'warm.log' * 100
+    assert os.stat(tmp_path / 'warm.log.gz').st_mtime == warm_mtime
+
+    # compressed file is expired by the mtime of original
+    ProjectCleanerBuilder() \
+        .with_log_paths(local_paths=str(tmp_path),
+                        expire_time=ExpireTimeDesc(0, 0, 3),
+                        default_suffix=['.log'],
+                        suffix_match_mode=FileNameMatcher.MATCH_SUFFIX,
+                        compress_after_days=2) \
+        .build() \
+        .clean()
+
+    assert os.listdir(tmp_path) == ['new.log']
+
+
+def test_keep_existing_compressed_file(tmp_path):
+    days_ago = time.time() - 5 * 24 * 3600
+    for name in ['a.log', 'b.log']:
+        (tmp_path / name).write_text(name * 100)
+        os.utime(tmp_path / name, (days_ago, days_ago))
+    with gzip.open(tmp_path / 'a.log.gz', 'wt') as f:
+        f.write('rotated')
+
+    ProjectCleanerBuilder() \
+        .with_log_paths(local_paths=str(tmp_path),
+                        expire_time=ExpireTimeDesc(0, 0, 30),
+                        default_suffix=['.log'],
+                        suffix_match_mode=FileNameMatcher.MATCH_SUFFIX,
+                        compress_after_days=2) \
+        .build() \
+        .clean()
+
+    assert sorted(os.listdir(tmp_path)) == ['a.log', 'a.log.gz', 'b.log.gz']
+    with gzip.open(tmp_path / 'a.log.gz', 'rt') as f:
+        assert f.read() == 'rotated'
+
+    # compressed file created after files checked is not overwritten either
+    with pytest.raises(Exception, match='already exists'):
+        _compress_file(str(tmp_path / 'a.log'), LocalDataCleaner.COMPRESS_GZIP, str(tmp_path / 'a.log.gz'))
+    assert sorted(os.listdir(tmp_path)) == ['a.log', 'a.log.gz', 'b.log.gz']
+
+
+def test_truncate_large_file_in_chunks_with_rate_limit(tmp_path, monkeypatch):
+    big_log = tmp_path / 'big.log'
+    big_log.write_bytes(b'x' * 10 * 1024)
+    linked_log = tmp_path / 'linked.log'
+    linked_log.write_bytes(b'x' * 10 * 1024)
+    os.link(linked_log, tmp_path / 'linked.text')
+
+    truncate_sizes = []
+    ftruncate = os.ftruncate
+
+    def record_ftruncate(fd, length):
+        truncate_sizes.append(length)
+        ftruncate(fd, length)
+
+    monkeypatch.setattr(os, 'ftruncate', record_ftruncate)
+    ProjectCleanerBuilder() \
+        .with_log_paths(local_paths=str(tmp_path), ignore_update_time=True) \
+        .with_rate_limit(ops_per_second=100, bytes_per_second=1024 * 1024, truncate_chunk_bytes=4 * 1024) \
+        .build() \
+        .clean()
+
+    assert truncate_sizes == [6 * 1024, 2 * 1024, 0]
+    assert os.listdir(tmp_path) == ['linked.text']
+    assert os.path.getsize(tmp_path / 'linked.text') == 10 * 1024
+
+
 if __name__ == "__main__":
     test_delete_local_path()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: ls_parser_test
+:Author: xufeng
+:Date: 2021-08-24 11:00 AM
+:Version: v.1.0
+:Description:
+"""
+from datetime import datetime
+
+from common.ls_parser import parse_ls_lines
+
+
+def test_parse_ls_lines():
+    lines = [
+        'Found 3 items',
+        'drwxr-xr-x   - proj hive          0 2021-07-21 18:29 /user/hive/warehouse/proj.db/tb1',
+        '-rw-r--r--+  3 proj hive    1048576 2021-07-22 08:05 /user/proj/tmp/my file.txt',
+        'drwxr-xr-x   - proj hive          0 2021-07-21 18:29 hdfs://ns1/user/proj/2021  07',
+        'ls: `/user/none\': No such file or directory',
+    ]
+
+    entries = parse_ls_lines(lines)
+
+    assert [entry.path for entry in entries] == [
+        '/user/hive/warehouse/proj.db/tb1', '/user/proj/tmp/my file.txt', 'hdfs://ns1/user/proj/2021  07']
+    assert [entry.is_dir for entry in entries] == [True, False, True]
+
+    entry = entries[1]
+    assert (entry.permission, entry.replication, entry.owner, entry.group, entry.size) == \
+        ('-rw-r--r--+', 3, 'proj', 'hive', 1048576)
+    assert entry.mtime == datetime(2021, 7, 22, 8, 5).timestamp()
+    assert entries[0].replication is None
+
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: rate_limiter_test
+:Author: xufeng
+:Date: 2021-08-19 11:40 AM
+:Version: v.1.0
+:Description:
+"""
+import time
+
+from common.rate_limiter import RateLimiter
+
+
+def test_rate_limiter_limit_ops_and_bytes():
+    limiter = RateLimiter(ops_per_second=50)
+    begin = time.monotonic()
+    for _ in range(60):
+        limiter.acquire()
+    # 50 ops burst, the other 10 ops wait 0.2s
+    assert 0.15 <= time.monotonic() - begin < 1
+
+    limiter = RateLimiter(ops_per_second=1000, bytes_per_second=1000)
+    begin = time.monotonic()
+    limiter.acquire(1, 1000)
+    limiter.acquire(1, 200)
+    assert 0.15 <= time.monotonic() - begin < 1
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding-utf8 -*-
+"""
+:File Name: spark_hdfs_fs_test
+:Author: xufeng
+:Date: 2021-08-27 4:20 PM
+:Version: v.1.0
+:Description:
+"""
+import fnmatch
+import posixpath
+from types import SimpleNamespace
+
+from common.hdfs_fs import SparkHdfsFileSystem
+from common.logger_adaptor import LogAdaptor
+
+
+class StubPath:
+    """
+    org.apache.hadoop.fs.Path, path with scheme keeps it in toString
+    """
+
+    def __init__(self, path, fs=None):
+        self.path = path
+        self.fs = fs
+
+    def getFileSystem(self, conf):
+        return self.fs
+
+    def toString(self):
+        return f'hdfs://nameservice1{self.path}' if self.fs.scheme else self.path
+
+    def toUri(self):
+        return SimpleNamespace(getPath=lambda: self.path)
+
+
+class StubFileSystem:
+    """
+    in memory org.apache.hadoop.fs.FileSystem of {path: (is_dir, modification_time_ms, length)},
+    paths end with `locked` can not be deleted, quota is {dir: space quota}
+    """
+
+    def __init__(self, files, quotas=None):
+        self.files = files
+        self.quotas = quotas or {}
+        self.trash = []
+        self.scheme = False
+
+    def _status(self, path):
+        is_dir, modification_time, length = self.files[path]
+        return SimpleNamespace(getPath=lambda: StubPath(path, self), isDirectory=lambda: is_dir,
+                               getModificationTime=lambda: modification_time, getLen=lambda: length)
+
+    def globStatus(self, j_path):
+        matched = [path for path in sorted(self.files)
+                   if path.count('/') == j_path.path.count('/') and fnmatch.fnmatchcase(path, j_path.path)]
+        # null when path without wildcard not exists
+        return [self._status(path) for path in matched] if matched else None
+
+    def listStatus(self, j_path):
+        return [self._status(path) for path in sorted(self.files) if posixpath.dirname(path) == j_path.path]
+
+    def _sub_paths(self, path):
+        return [p for p in list(self.files) if p == path or p.startswith(path + '/')]
+
+    def delete(self, j_path, recursive):
+        if j_path.path.endswith('locked'):
+            return False
+        for path in self._sub_paths(j_path.path):
+            del self.files[path]
+        return True
+
+    def getContentSummary(self, j_path):
+        length = sum(self.files[path][2] for path in self._sub_paths(j_path.path))
+        quota = self.quotas.get(j_path.path, -1)
+        return SimpleNamespace(getLength=lambda: length, getSpaceQuota=lambda: quota,
+                               getSpaceConsumed=lambda: length * 3)
+
+
+class StubSpark:
+    """
+    SparkSession with stub jvm of one FileSystem, path moved to trash is recorded and removed
+    """
+
+    def __init__(self, fs: StubFileSystem, trash_enabled=True):
+        def move_to_trash(j_fs, j_path, conf):
+            if not trash_enabled:
+                return False
+            if not j_fs.delete(j_path, True):
+                return False
+            j_fs.trash.append(j_path.path)
+            return True
+
+        hadoop_fs = SimpleNamespace(Path=lambda path: StubPath(path.replace('hdfs://nameservice1', ''), fs),
+                                    Trash=SimpleNamespace(moveToAppropriateTrash=move_to_trash))
+        self._jvm = SimpleNamespace(org=SimpleNamespace(apache=SimpleNamespace(hadoop=SimpleNamespace(fs=hadoop_fs))))
+        self._jsc = SimpleNamespace(hadoopConfiguration=lambda: {'fs.defaultFS': 'hdfs://nameservice1'})
+
+
+def _files():
+    return {
+        '/user': (True, 0, 0),
+        '/user/p': (True, 1000, 0),
+        '/user/p/a': (True, 2000, 0),
+        '/user/p/a/part-0': (False, 3000, 10),
+        '/user/p/b': (True, 4000, 0),
+        '/user/p/b_locked': (True, 5000, 0),
+        '/user/p/c.log': (False, 6000, 7),
+    }
+
+
+def test_list_status_of_spark_hdfs_fs():
+    fs = StubFileSystem(_files())
+    hdfs_fs = SparkHdfsFileSystem(LogAdaptor(), StubSpark(fs))
+
+    # matched dir is replaced by its children, matched file is itself
+    statuses = hdfs_fs.list_status('/user/p/[ac]*')
+    assert [(s.path, s.is_dir, s.modification_time, s.length) for s in statuses] == [
+        ('/user/p/a/part-0', False, 3, 10), ('/user/p/c.log', False, 6, 7)]
+    assert hdfs_fs.list_status('/user/p/not_exists') == []
+
+    # path is returned with scheme if requested with scheme
+    fs.scheme = True
+    assert [s.path for s in hdfs_fs.list_status('hdfs://nameservice1/user/p/a')] == [
+        'hdfs://nameservice1/user/p/a/part-0']
+    assert hdfs_fs.get_namespace() == 'spark:hdfs://nameservice1'
+
+
+def test_delete_many_collects_errors_of_spark_hdfs_fs():
+    fs = StubFileSystem(_files())
+    hdfs_fs = SparkHdfsFileSystem(LogAdaptor(), StubSpark(fs))
+
+    acquired = []
+    errors = hdfs_fs.delete_many(['/user/p/a', '/user/p/not_exists', '/user/p/b*', '/user/p/c.log'],
+                                 max_workers=2, acquire=acquired.extend)
+    assert list(errors) == ['/user/p/not_exists', '/user/p/b*']
+    assert 'No such file or directory' in errors['/user/p/not_exists']
+    assert 'delete hdfs path: /user/p/b_locked failed' in errors['/user/p/b*']
+    assert sorted(acquired) == ['/user/p/a', '/user/p/b*', '/user/p/c.log', '/user/p/not_exists']
+
+    # /user/p/b is moved to trash before /user/p/b_locked failed
+    assert sorted(fs.trash) == ['/user/p/a', '/user/p/b', '/user/p/c.log']
+    assert sorted(fs.files) == ['/user', '/user/p', '/user/p/b_locked']
+
+    # trash disabled, path is deleted directly
+    fs = StubFileSystem(_files())
+    hdfs_fs = SparkHdfsFileSystem(LogAdaptor(), StubSpark(fs, trash_enabled=False))
+    assert hdfs_fs.delete_many(['/user/p/a']) == {}
+    assert fs.trash == [] and '/user/p/a' not in fs.files
+
+
+def test_get_space_quota_of_spark_hdfs_fs():
+    fs = StubFileSystem(_files(), quotas={'/user/p': 1000})
+    hdfs_fs = SparkHdfsFileSystem(LogAdaptor(), StubSpark(fs))
+
+    assert hdfs_fs.get_space_quota('/user/p') == (1000, 51, 17)
+    assert hdfs_fs.get_space_quota('/user/p/a') == (None, None, 10)